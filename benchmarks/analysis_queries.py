@@ -0,0 +1,234 @@
+'''
+Generate a large synthetic Cyclus output database with DepleteReactor
+agents and time the queries in openmcyclus.analysis against reading
+the same tables row by row in Python.
+
+Example:
+
+    $ python benchmarks/analysis_queries.py --n-reactors 500 \\
+        --n-steps 1200 --n-nuclides 300 --db large_output.sqlite
+'''
+import argparse
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from openmcyclus import analysis
+
+
+def write_output(filename, n_reactors, n_steps, n_nuclides,
+                 cycle_time=18, n_assem_batch=1, seed=1):
+    '''
+    Write a synthetic Cyclus output database. Each reactor sends one
+    batch of spent fuel to a sink at the end of each cycle, records
+    its power each time step, and records its cycle events.
+
+    Parameters:
+    -----------
+    filename: str
+        name of the database
+    n_reactors: int
+        number of reactors
+    n_steps: int
+        number of time steps
+    n_nuclides: int
+        number of nuclides in each spent fuel composition
+    cycle_time: int
+        cycle length in time steps
+    n_assem_batch: int
+        number of assemblies sent at the end of each cycle
+    seed: int
+        seed of the random compositions
+    '''
+    if os.path.exists(filename):
+        os.remove(filename)
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(filename)
+    conn.executescript(
+        "CREATE TABLE AgentEntry (SimId BLOB, AgentId INTEGER, "
+        "Kind TEXT, Spec TEXT, Prototype TEXT, ParentId INTEGER, "
+        "Lifetime INTEGER, EnterTime INTEGER);"
+        "CREATE TABLE AgentExit (SimId BLOB, AgentId INTEGER, "
+        "ExitTime INTEGER);"
+        "CREATE TABLE Transactions (SimId BLOB, TransactionId INTEGER, "
+        "SenderId INTEGER, ReceiverId INTEGER, ResourceId INTEGER, "
+        "Commodity TEXT, Time INTEGER);"
+        "CREATE TABLE Resources (SimId BLOB, ResourceId INTEGER, "
+        "ObjId INTEGER, Type TEXT, TimeCreated INTEGER, Quantity REAL, "
+        "Units TEXT, QualId INTEGER, Parent1 INTEGER, Parent2 INTEGER);"
+        "CREATE TABLE Compositions (SimId BLOB, QualId INTEGER, "
+        "NucId INTEGER, MassFrac REAL);"
+        "CREATE TABLE TimeSeriesPower (SimId BLOB, AgentId INTEGER, "
+        "Time INTEGER, Value REAL);"
+        "CREATE TABLE ReactorEvents (SimId BLOB, AgentId INTEGER, "
+        "Time INTEGER, Event TEXT, Value TEXT);")
+    sim = b'synthetic'
+    sink = n_reactors + 1
+    agents = [(sim, ii + 1, "Facility", analysis.REACTOR_SPEC,
+               "Reactor_" + str(ii + 1), 0, -1, 0)
+              for ii in range(n_reactors)]
+    agents.append((sim, sink, "Facility", ":cycamore:Sink:Sink", "Sink",
+                   0, -1, 0))
+    conn.executemany("INSERT INTO AgentEntry VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                     agents)
+    nuclides = 10000 * np.arange(n_nuclides) + 922350000
+    resource = 0
+    qual = 0
+    for reactor in range(1, n_reactors + 1):
+        conn.executemany(
+            "INSERT INTO TimeSeriesPower VALUES (?, ?, ?, ?)",
+            [(sim, reactor, tt, 1000.0) for tt in range(n_steps)])
+        events = []
+        transactions = []
+        resources = []
+        compositions = []
+        for start in range(0, n_steps - cycle_time, cycle_time + 1):
+            end = start + cycle_time
+            events += [(sim, reactor, start, "CYCLE_START", ""),
+                       (sim, reactor, end, "TRANSMUTE", ""),
+                       (sim, reactor, end, "CYCLE_END", "")]
+            qual += 1
+            fractions = rng.random(n_nuclides)
+            fractions /= fractions.sum()
+            compositions += [(sim, qual, int(nuc), float(frac))
+                             for nuc, frac in zip(nuclides, fractions)]
+            for ii in range(n_assem_batch):
+                resource += 1
+                resources.append((sim, resource, resource, "Material", end,
+                                  33000.0, "kg", qual, 0, 0))
+                transactions.append((sim, resource, reactor, sink, resource,
+                                     "spent_uox", end + 1))
+        conn.executemany("INSERT INTO ReactorEvents VALUES (?, ?, ?, ?, ?)",
+                         events)
+        conn.executemany(
+            "INSERT INTO Transactions VALUES (?, ?, ?, ?, ?, ?, ?)",
+            transactions)
+        conn.executemany(
+            "INSERT INTO Resources VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            resources)
+        conn.executemany("INSERT INTO Compositions VALUES (?, ?, ?, ?)",
+                         compositions)
+    conn.commit()
+    conn.close()
+
+
+def row_loop_masses(filename, agent_ids):
+    '''
+    Sum the nuclide masses sent by the reactors by looping over the
+    rows of each table in Python, as in the integration test helpers
+
+    Parameters:
+    -----------
+    filename: str
+        output database
+    agent_ids: list of ints
+        ids of the reactors
+
+    Returns:
+    --------
+    dict: mass for each (agent id, time, nuclide id)
+    '''
+    conn = sqlite3.connect(filename)
+    agent_ids = set(agent_ids)
+    sent = {}
+    for row in conn.execute(
+            "SELECT SenderId, ResourceId, Time FROM Transactions"):
+        if row[0] in agent_ids:
+            sent[row[1]] = (row[0], row[2])
+    resources = {}
+    for row in conn.execute(
+            "SELECT ResourceId, Quantity, QualId FROM Resources"):
+        if row[0] in sent:
+            resources[row[0]] = (row[1], row[2])
+    compositions = {}
+    for row in conn.execute(
+            "SELECT QualId, NucId, MassFrac FROM Compositions"):
+        compositions.setdefault(row[0], []).append((row[1], row[2]))
+    masses = {}
+    for resource_id, (agent_id, time_step) in sent.items():
+        quantity, qual_id = resources[resource_id]
+        for nuc, frac in compositions[qual_id]:
+            key = (agent_id, time_step, nuc)
+            masses[key] = masses.get(key, 0.0) + quantity * frac
+    conn.close()
+    return masses
+
+
+def row_loop_find_ids(data, data_table, id_table):
+    '''
+    Find the ids of the rows that match a value by looping over the
+    rows, as ``find_ids`` in the integration test helpers did
+    '''
+    ids = []
+    for i, d in enumerate(data_table):
+        if d == data:
+            ids.append(id_table[i])
+    return ids
+
+
+def timed(function, *args, **kwargs):
+    '''
+    Call a function and measure its wall time
+
+    Returns:
+    --------
+    result: return value of the function
+    wall_time: float
+        time in seconds
+    '''
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument("--n-reactors", type=int, default=100)
+    parser.add_argument("--n-steps", type=int, default=600)
+    parser.add_argument("--n-nuclides", type=int, default=200)
+    parser.add_argument("--chunksize", type=int, default=analysis.CHUNKSIZE)
+    parser.add_argument("--db", default="analysis_benchmark.sqlite")
+    parser.add_argument("--reuse", action="store_true",
+                        help="use an existing database")
+    args = parser.parse_args()
+
+    if not (args.reuse and os.path.exists(args.db)):
+        _, write_time = timed(write_output, args.db, args.n_reactors,
+                              args.n_steps, args.n_nuclides)
+        print("wrote {0} ({1:.1f} MB) in {2:.1f} s".format(
+            args.db, os.path.getsize(args.db) / 1024 ** 2, write_time))
+
+    reactors, reactor_time = timed(analysis.reactors, args.db)
+    agent_ids = reactors["AgentId"].tolist()
+    results = {"reactors": reactor_time}
+    loop, results["masses_row_loop"] = timed(row_loop_masses, args.db,
+                                             agent_ids)
+    masses, results["masses_analysis"] = timed(
+        analysis.discharged_masses, args.db, agent_ids,
+        chunksize=args.chunksize)
+    assert len(masses) == len(loop)
+    transactions = analysis.read_sql(
+        args.db, "SELECT SenderId, ResourceId FROM Transactions")
+    senders = transactions["SenderId"].values
+    resources = transactions["ResourceId"].values
+    _, results["find_ids_row_loop"] = timed(
+        lambda: [row_loop_find_ids(agent_id, senders, resources)
+                 for agent_id in agent_ids])
+    _, results["find_ids_analysis"] = timed(
+        lambda: [analysis.find_ids(agent_id, senders, resources)
+                 for agent_id in agent_ids])
+    _, results["power_series"] = timed(analysis.power_series, args.db,
+                                       agent_ids, pivot=True)
+    _, results["cycle_lengths"] = timed(analysis.cycle_lengths, args.db)
+    for name, wall_time in results.items():
+        print("{0:>18s}: {1:8.3f} s".format(name, wall_time))
+    print("discharged masses speedup: {0:.1f}x".format(
+        results["masses_row_loop"] / results["masses_analysis"]))
+    print("find_ids speedup: {0:.1f}x".format(
+        results["find_ids_row_loop"] / results["find_ids_analysis"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+'''
+Run the same synthetic DepleteReactor fleet with different spent fuel
+composition truncation settings and report the size of the Cyclus
+output database, the number of recorded compositions and nuclide rows,
+and the wall time of each run.
+
+Example:
+
+    $ python benchmarks/db_size.py --max-nuclides 0 100 50 \\
+        --cutoff 0 1e-6 --out db_size.csv
+'''
+import argparse
+import csv
+import itertools
+import os
+import sqlite3
+
+from fleet_scaling import run_cyclus
+from openmcyclus.scenarios import write_fleet
+
+
+def table_counts(output_file):
+    '''
+    Count the compositions and the composition rows in a Cyclus
+    output database
+
+    Parameters:
+    -----------
+    output_file: str
+        Cyclus sqlite output database
+
+    Returns:
+    --------
+    n_compositions: int
+        number of distinct compositions
+    n_rows: int
+        number of rows in the Compositions table
+    '''
+    conn = sqlite3.connect(output_file)
+    try:
+        return conn.execute(
+            "SELECT COUNT(DISTINCT QualId), COUNT(*) FROM Compositions"
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return 0, 0
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument("--max-nuclides", type=int, nargs="+",
+                        default=[0, 100, 50])
+    parser.add_argument("--cutoff", type=float, nargs="+",
+                        default=[0.0, 1e-6])
+    parser.add_argument("--n-reactors", type=int, default=10)
+    parser.add_argument("--duration", type=int, default=60)
+    parser.add_argument("--model-source", default="./examples/")
+    parser.add_argument("--workdir", default="db_size")
+    parser.add_argument("--cyclus", default="cyclus")
+    parser.add_argument("--out", default="db_size.csv")
+    args = parser.parse_args()
+
+    fields = ["max_nuclides", "cutoff", "db_size_mb", "size_ratio",
+              "n_compositions", "n_composition_rows", "wall_time_s",
+              "status"]
+    base_size = None
+    with open(args.out, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for max_nuclides, cutoff in itertools.product(args.max_nuclides,
+                                                      args.cutoff):
+            config = {"comp_max_nuclides": max_nuclides,
+                      "comp_cutoff": cutoff}
+            path = os.path.join(args.workdir,
+                                "n{0}_c{1:g}".format(max_nuclides, cutoff))
+            input_file = write_fleet(
+                path, args.n_reactors, model_source=args.model_source,
+                reactor_config=config, duration=args.duration)
+            output_file = os.path.join(path, "fleet.sqlite")
+            wall_time, _, status = run_cyclus(input_file, output_file,
+                                              args.cyclus)
+            size = os.path.getsize(output_file) / 1024 ** 2
+            if base_size is None:
+                base_size = size
+            n_compositions, n_rows = table_counts(output_file)
+            row = {"max_nuclides": max_nuclides,
+                   "cutoff": cutoff,
+                   "db_size_mb": round(size, 2),
+                   "size_ratio": round(size / base_size, 3),
+                   "n_compositions": n_compositions,
+                   "n_composition_rows": n_rows,
+                   "wall_time_s": round(wall_time, 3),
+                   "status": status}
+            writer.writerow(row)
+            f.flush()
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+'''
+Run synthetic DepleteReactor fleets of increasing size and record
+the wall time, peak memory, and number of depletion solves of
+each Cyclus run.
+
+Example:
+
+    $ python benchmarks/fleet_scaling.py --sizes 1 10 100 500 \\
+        --out fleet_scaling.csv
+'''
+import argparse
+import csv
+import os
+import sqlite3
+import subprocess
+import time
+
+from openmcyclus.scenarios import write_fleet
+
+
+def count_transmutes(output_file):
+    '''
+    Count the TRANSMUTE events recorded by DepleteReactor agents
+
+    Parameters:
+    -----------
+    output_file: str
+        Cyclus sqlite output database
+
+    Returns:
+    --------
+    int: number of calls to DepleteReactor.transmute
+    '''
+    conn = sqlite3.connect(output_file)
+    try:
+        return conn.execute(
+            "SELECT COUNT(*) FROM ReactorEvents WHERE Event = 'TRANSMUTE'"
+        ).fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
+    finally:
+        conn.close()
+
+
+def run_cyclus(input_file, output_file, cyclus="cyclus"):
+    '''
+    Run Cyclus and measure the resources used by the run
+
+    Parameters:
+    -----------
+    input_file: str
+        Cyclus input file
+    output_file: str
+        Cyclus output database
+    cyclus: str
+        Cyclus executable
+
+    Returns:
+    --------
+    wall_time: float
+        run time in seconds
+    peak_rss: float
+        peak resident set size of the Cyclus process in MB
+    status: int
+        exit status of Cyclus
+    '''
+    if os.path.exists(output_file):
+        os.remove(output_file)
+    start = time.perf_counter()
+    with open(output_file + ".log", "w") as log:
+        proc = subprocess.Popen([cyclus, "-o", output_file, input_file],
+                                stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+    wall_time = time.perf_counter() - start
+    return wall_time, usage.ru_maxrss / 1024, proc.returncode
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[1, 5, 10, 50, 100, 500])
+    parser.add_argument("--duration", type=int, default=60)
+    parser.add_argument("--cycle-time", type=int, default=18)
+    parser.add_argument("--refuel-time", type=int, default=1)
+    parser.add_argument("--n-assem-core", type=int, default=3)
+    parser.add_argument("--n-assem-batch", type=int, default=1)
+    parser.add_argument("--deploy-interval", type=int, default=1)
+    parser.add_argument("--distinct-models", action="store_true",
+                        help="give each reactor its own model directory")
+    parser.add_argument("--model-source", default="./examples/")
+    parser.add_argument("--workdir", default="fleet_scaling")
+    parser.add_argument("--cyclus", default="cyclus")
+    parser.add_argument("--out", default="fleet_scaling.csv")
+    args = parser.parse_args()
+
+    config = {"cycle_time": args.cycle_time,
+              "refuel_time": args.refuel_time,
+              "n_assem_core": args.n_assem_core,
+              "n_assem_batch": args.n_assem_batch}
+    fields = ["n_reactors", "shared_model", "duration", "wall_time_s",
+              "peak_rss_mb", "n_transmute", "status"]
+    with open(args.out, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for n_reactors in args.sizes:
+            path = os.path.join(args.workdir, "n" + str(n_reactors))
+            input_file = write_fleet(
+                path, n_reactors, model_source=args.model_source,
+                shared_model=not args.distinct_models,
+                reactor_config=config, duration=args.duration,
+                deploy_interval=args.deploy_interval)
+            output_file = os.path.join(path, "fleet.sqlite")
+            wall_time, peak_rss, status = run_cyclus(
+                input_file, output_file, args.cyclus)
+            row = {"n_reactors": n_reactors,
+                   "shared_model": not args.distinct_models,
+                   "duration": args.duration,
+                   "wall_time_s": round(wall_time, 3),
+                   "peak_rss_mb": round(peak_rss, 1),
+                   "n_transmute": count_transmutes(output_file),
+                   "status": status}
+            writer.writerow(row)
+            f.flush()
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
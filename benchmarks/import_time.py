@@ -0,0 +1,64 @@
+'''
+Measure the time to import the DepleteReactor archetype in a fresh
+interpreter, which is paid by every Cyclus run. The import is
+compared against importing the archetype together with the OpenMC
+modules it used to load eagerly.
+
+Example:
+
+    $ python benchmarks/import_time.py --repeat 20
+'''
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+
+CASES = {
+    "lazy": "import openmcyclus.DepleteReactor",
+    "eager": "import openmcyclus.DepleteReactor; import numpy; "
+             "import openmc; import openmc.deplete",
+}
+
+
+def time_import(statement, repeat):
+    '''
+    Time a statement run in a new interpreter
+
+    Parameters:
+    -----------
+    statement: str
+        python code to run
+    repeat: int
+        number of interpreters to start
+
+    Returns:
+    --------
+    times: list of floats
+        wall time in seconds of each interpreter
+    '''
+    times = []
+    for ii in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], check=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    baseline = statistics.median(time_import("pass", args.repeat))
+    results = {}
+    for name, statement in CASES.items():
+        results[name] = statistics.median(
+            time_import(statement, args.repeat)) - baseline
+        print("{0:>6s}: {1:8.3f} s".format(name, results[name]))
+    print("speedup: {0:.1f}x".format(results["eager"] / results["lazy"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+'''
+Run a long synthetic DepleteReactor fleet with memory sampling, with
+and without bounded_memory, and check that the memory profile is flat.
+The resident set size recorded in the ReactorMemory table is fit with
+a line over the time steps after the warm-up, and the growth over the
+run is compared to a tolerance.
+
+Example:
+
+    $ python benchmarks/memory_profile.py --n-reactors 100 \\
+        --duration 1000 --memory-interval 50 --out memory_profile.csv
+'''
+import argparse
+import csv
+import os
+
+import numpy as np
+
+from fleet_scaling import run_cyclus
+from openmcyclus import analysis
+from openmcyclus.scenarios import write_fleet
+
+
+def memory_profile(output_file):
+    '''
+    Get the resident set size of the Cyclus process at each sampled
+    time step
+
+    Parameters:
+    -----------
+    output_file: str
+        Cyclus sqlite output database
+
+    Returns:
+    --------
+    times: numpy.ndarray
+        sampled time steps
+    rss: numpy.ndarray
+        resident set size at each time step (MB)
+    '''
+    memory = analysis.read_sql(
+        output_file, "SELECT Time, MAX(RSS) AS RSS FROM ReactorMemory "
+        "GROUP BY Time ORDER BY Time")
+    if len(memory) == 0:
+        return np.zeros(0), np.zeros(0)
+    return memory["Time"].values, memory["RSS"].values
+
+
+def growth(times, rss, warmup):
+    '''
+    Fit a line to the resident set size after the warm-up
+
+    Parameters:
+    -----------
+    times: numpy.ndarray
+        sampled time steps
+    rss: numpy.ndarray
+        resident set size at each time step (MB)
+    warmup: float
+        fraction of the samples left out at the start
+
+    Returns:
+    --------
+    float: growth of the resident set size over the fitted time steps
+        (MB), from the slope of the line
+    '''
+    start = int(len(times) * warmup)
+    times, rss = times[start:], rss[start:]
+    if len(times) < 2:
+        return 0.0
+    slope = np.polyfit(times, rss, 1)[0]
+    return slope * (times[-1] - times[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument("--n-reactors", type=int, default=100)
+    parser.add_argument("--duration", type=int, default=1000)
+    parser.add_argument("--memory-interval", type=int, default=50)
+    parser.add_argument("--memory-top", type=int, default=5)
+    parser.add_argument("--depletion-mode", default="openmc")
+    parser.add_argument("--warmup", type=float, default=0.2,
+                        help="fraction of the samples before the fit")
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="allowed growth, as a fraction of the mean")
+    parser.add_argument("--model-source", default="./examples/")
+    parser.add_argument("--workdir", default="memory_profile")
+    parser.add_argument("--cyclus", default="cyclus")
+    parser.add_argument("--out", default="memory_profile.csv")
+    args = parser.parse_args()
+
+    fields = ["bounded_memory", "n_reactors", "duration", "wall_time_s",
+              "peak_rss_mb", "mean_rss_mb", "growth_mb", "flat", "status"]
+    with open(args.out, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for bounded in [False, True]:
+            config = {"memory_interval": args.memory_interval,
+                      "memory_top": args.memory_top,
+                      "bounded_memory": str(bounded).lower(),
+                      "depletion_mode": args.depletion_mode}
+            path = os.path.join(args.workdir,
+                                "bounded" if bounded else "unbounded")
+            input_file = write_fleet(
+                path, args.n_reactors, model_source=args.model_source,
+                reactor_config=config, duration=args.duration)
+            output_file = os.path.join(path, "fleet.sqlite")
+            wall_time, peak_rss, status = run_cyclus(
+                input_file, output_file, args.cyclus)
+            times, rss = memory_profile(output_file)
+            mean_rss = float(rss.mean()) if len(rss) else 0.0
+            rss_growth = growth(times, rss, args.warmup)
+            row = {"bounded_memory": bounded,
+                   "n_reactors": args.n_reactors,
+                   "duration": args.duration,
+                   "wall_time_s": round(wall_time, 3),
+                   "peak_rss_mb": round(peak_rss, 1),
+                   "mean_rss_mb": round(mean_rss, 1),
+                   "growth_mb": round(rss_growth, 2),
+                   "flat": abs(rss_growth) <= args.tolerance * mean_rss,
+                   "status": status}
+            writer.writerow(row)
+            f.flush()
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
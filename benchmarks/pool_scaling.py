@@ -0,0 +1,70 @@
+'''
+Run the same synthetic DepleteReactor fleet with an increasing number
+of depletion processes and report the wall time and the speedup over
+a single process. Each worker uses one BLAS thread, so the processes
+do not oversubscribe the CPUs.
+
+Example:
+
+    $ python benchmarks/pool_scaling.py --processes 1 2 4 8 \\
+        --n-reactors 10 --out pool_scaling.csv
+'''
+import argparse
+import csv
+import os
+
+from fleet_scaling import count_transmutes, run_cyclus
+from openmcyclus.scenarios import write_fleet
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument("--processes", type=int, nargs="+",
+                        default=[1, 2, 4, os.cpu_count()])
+    parser.add_argument("--blas-threads", type=int, default=1)
+    parser.add_argument("--n-reactors", type=int, default=10)
+    parser.add_argument("--duration", type=int, default=60)
+    parser.add_argument("--cycle-time", type=int, default=18)
+    parser.add_argument("--n-assem-core", type=int, default=3)
+    parser.add_argument("--n-assem-batch", type=int, default=1)
+    parser.add_argument("--model-source", default="./examples/")
+    parser.add_argument("--workdir", default="pool_scaling")
+    parser.add_argument("--cyclus", default="cyclus")
+    parser.add_argument("--out", default="pool_scaling.csv")
+    args = parser.parse_args()
+
+    fields = ["processes", "blas_threads", "n_reactors", "wall_time_s",
+              "speedup", "n_transmute", "status"]
+    base_time = None
+    with open(args.out, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for processes in args.processes:
+            config = {"cycle_time": args.cycle_time,
+                      "n_assem_core": args.n_assem_core,
+                      "n_assem_batch": args.n_assem_batch,
+                      "depletion_processes": processes,
+                      "blas_threads": args.blas_threads}
+            path = os.path.join(args.workdir, "p" + str(processes))
+            input_file = write_fleet(
+                path, args.n_reactors, model_source=args.model_source,
+                reactor_config=config, duration=args.duration)
+            output_file = os.path.join(path, "fleet.sqlite")
+            wall_time, _, status = run_cyclus(input_file, output_file,
+                                              args.cyclus)
+            if base_time is None:
+                base_time = wall_time
+            row = {"processes": processes,
+                   "blas_threads": args.blas_threads,
+                   "n_reactors": args.n_reactors,
+                   "wall_time_s": round(wall_time, 3),
+                   "speedup": round(base_time / wall_time, 2),
+                   "n_transmute": count_transmutes(output_file),
+                   "status": status}
+            writer.writerow(row)
+            f.flush()
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
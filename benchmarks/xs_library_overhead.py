@@ -0,0 +1,150 @@
+'''
+Measure the overhead of burnup-dependent cross sections from an
+``openmcyclus.xs_library`` library against constant cross sections.
+The interpolation of the cross sections of all assemblies in a step is
+timed for increasing numbers of assemblies, and the same compositions
+are depleted with ``Depletion.run`` with and without a library.
+
+Example:
+
+    $ python benchmarks/xs_library_overhead.py --n-assemblies 1 10 100 \\
+        --steps 6 --model-path ./examples/ --out xs_library_overhead.csv
+'''
+import argparse
+import csv
+import tempfile
+import time
+
+import numpy as np
+
+from openmcyclus.xs_library import XSLibrary
+
+
+def synthetic_library(n_nuclides, n_reactions, burnups, seed=1):
+    '''
+    Create a library with random cross sections that decrease with
+    burnup
+
+    Parameters:
+    -----------
+    n_nuclides: int
+        number of nuclides
+    n_reactions: int
+        number of reactions
+    burnups: list of floats
+        burnup grid (MWd/kgHM)
+
+    Returns:
+    --------
+    XSLibrary
+    '''
+    rng = np.random.default_rng(seed)
+    base = rng.random((n_nuclides, n_reactions))
+    burnups = np.asarray(burnups, dtype=float)
+    data = base * (1 - burnups[:, None, None] / (2 * burnups[-1]))
+    return XSLibrary(burnups,
+                     ["N" + str(ii) for ii in range(n_nuclides)],
+                     ["R" + str(ii) for ii in range(n_reactions)], data)
+
+
+def time_interpolation(library, n_assemblies, repeat=100):
+    '''
+    Time the interpolation of the cross sections of all assemblies in
+    one step
+
+    Returns:
+    --------
+    float: mean time of one interpolation (s)
+    '''
+    burnups = np.linspace(0, library.burnups[-1], n_assemblies)
+    start = time.perf_counter()
+    for ii in range(repeat):
+        library.interpolate(burnups + ii * 1e-3)
+    return (time.perf_counter() - start) / repeat
+
+
+def time_depletion(model_path, chain_file, n_assemblies, steps, flux,
+                   power, dt):
+    '''
+    Deplete the same compositions with constant cross sections and
+    with a library made of the constant cross sections scaled at each
+    burnup
+
+    Returns:
+    --------
+    constant_time: float
+        wall time with constant cross sections (s)
+    library_time: float
+        wall time with the library (s)
+    '''
+    import openmc
+    from openmcyclus.depletion import (Depletion, read_micro_xs,
+                                       read_template_materials)
+
+    materials = read_template_materials(model_path + "materials.xml",
+                                        "assembly_1", n_assemblies)
+    micro_xs = read_micro_xs(model_path + "micro_xs.csv")
+    data = np.asarray(micro_xs.data)[..., 0]
+    library = XSLibrary([0.0, 30.0, 60.0], micro_xs.nuclides,
+                        micro_xs.reactions,
+                        np.stack([data, 0.95 * data, 0.9 * data]))
+    deplete = Depletion(chain_file, steps, power, model_path, processes=1)
+    comps = [{922350000: 0.04, 922380000: 0.96}] * n_assemblies
+    burnups = np.linspace(0, 40, n_assemblies)
+    times = []
+    for xs_library in [None, library]:
+        with tempfile.TemporaryDirectory() as output_dir:
+            start = time.perf_counter()
+            deplete.run(comps, openmc.Materials(materials), micro_xs, flux,
+                        dt, steps, output_dir=output_dir,
+                        xs_library=xs_library, burnups=burnups,
+                        burnup_step=1.0)
+            times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument("--n-assemblies", type=int, nargs="+",
+                        default=[1, 10, 100, 1000])
+    parser.add_argument("--n-nuclides", type=int, default=300)
+    parser.add_argument("--n-reactions", type=int, default=6)
+    parser.add_argument("--n-burnups", type=int, default=10)
+    parser.add_argument("--steps", type=int, default=6)
+    parser.add_argument("--model-path", default=None,
+                        help="also time the depletion with this model")
+    parser.add_argument("--chain-file", default="chain_endfb71_pwr.xml")
+    parser.add_argument("--max-depletion-assemblies", type=int, default=10)
+    parser.add_argument("--flux", type=float, default=10.3)
+    parser.add_argument("--power", type=float, default=100e-6)
+    parser.add_argument("--dt", type=float, default=2629846)
+    parser.add_argument("--out", default="xs_library_overhead.csv")
+    args = parser.parse_args()
+
+    library = synthetic_library(args.n_nuclides, args.n_reactions,
+                                np.linspace(0, 60, args.n_burnups))
+    fields = ["n_assemblies", "interpolate_s", "constant_s", "library_s",
+              "overhead"]
+    with open(args.out, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for n_assemblies in args.n_assemblies:
+            row = {"n_assemblies": n_assemblies,
+                   "interpolate_s": time_interpolation(library,
+                                                       n_assemblies)}
+            if ((args.model_path is not None) and
+                    (n_assemblies <= args.max_depletion_assemblies)):
+                constant_time, library_time = time_depletion(
+                    args.model_path, args.chain_file, n_assemblies,
+                    args.steps, args.flux, args.power, args.dt)
+                row.update({"constant_s": round(constant_time, 3),
+                            "library_s": round(library_time, 3),
+                            "overhead": round(library_time / constant_time,
+                                              3)})
+            writer.writerow(row)
+            f.flush()
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
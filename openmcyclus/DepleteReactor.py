@@ -2,11 +2,10 @@ from cyclus.agents import Facility
 from cyclus import lib
 import cyclus.typesystem as ts
 import math
-import numpy as np
-import openmc
-from openmcyclus.depletion import Depletion
-
-import openmc.deplete as od
+import os
+import time
+import warnings
+from collections import defaultdict
 
 
 class DepleteReactor(Facility):
@@ -133,6 +132,27 @@ class DepleteReactor(Facility):
         units='n/cm2s',
     )
 
+    flux_spectrum = ts.VectorDouble(
+        default=[],
+        doc="Flux in each energy group of the cross sections in "
+        "micro_xs.csv. If given, the cross sections are collapsed to one "
+        "group with this spectrum, and the total of the spectrum is used "
+        "as the flux instead of flux",
+        tooltip="Flux in each energy group",
+        uilabel="Flux spectrum",
+        units='n/cm2s',
+    )
+
+    xs_library = ts.String(
+        default="",
+        doc="Name of a cross section library file in model_path, with "
+        "one-group cross sections tabulated over burnup. If given, the "
+        "cross sections of each assembly are interpolated at its burnup "
+        "in each depletion step. Only used if depletion_mode is 'openmc'",
+        tooltip="Burnup-dependent cross section library",
+        uilabel="Cross section library"
+    )
+
     power_name = ts.String(
         default="power",
         uilabel="Power Commodity Name",
@@ -149,6 +169,260 @@ class DepleteReactor(Facility):
         tooltip="Absolute path to decay chain file"
     )
 
+    assembly_template = ts.String(
+        default="",
+        doc="Name of a single assembly material in materials.xml that is "
+        "cloned for each assembly in the core. If not given, "
+        "materials.xml must have one assembly_# material for each "
+        "assembly",
+        tooltip="Name of the assembly template material",
+        uilabel="Assembly template material"
+    )
+
+    depletion_mode = ts.String(
+        default="openmc",
+        doc="Method to get the spent fuel compositions: 'openmc' runs "
+        "the OpenMC depletion solver, 'table' interpolates in the "
+        "burnup table in table_file",
+        tooltip="Method to get the spent fuel compositions",
+        uilabel="Depletion mode"
+    )
+
+    table_file = ts.String(
+        default="",
+        doc="Burnup table file, relative to model_path, used if "
+        "depletion_mode is 'table'. See openmcyclus.table",
+        tooltip="Burnup table file",
+        uilabel="Burnup table file"
+    )
+
+    async_depletion = ts.Bool(
+        default=False,
+        doc="If True, the depletion of the core is started in a "
+        "background process as soon as the core is loaded for a cycle, "
+        "and the result is collected at the end of the cycle",
+        tooltip="Run depletion in the background during the cycle",
+        uilabel="Asynchronous depletion"
+    )
+
+    incremental_depletion = ts.Bool(
+        default=False,
+        doc="If True, the core is depleted by one time step at each time "
+        "step of the cycle, and the spent compositions are ready at the "
+        "end of the cycle. The compositions of the core during the cycle "
+        "are then available. Only used if depletion_mode is 'openmc', "
+        "and async_depletion is not used if this is True",
+        tooltip="Deplete the core at each time step of the cycle",
+        uilabel="Incremental depletion"
+    )
+
+    transmute_budget = ts.Double(
+        default=0.0,
+        doc="Wall time (s) that the depletion of a full cycle may take. "
+        "The depletion is run in a background process, and if it is not "
+        "done in time, the spent compositions are estimated with "
+        "budget_fallback and the substitution is recorded in the "
+        "TransmuteBudget table. If 0, there is no limit. Only used if "
+        "depletion_mode is 'openmc'",
+        tooltip="Time limit of the depletion at the end of a cycle",
+        uilabel="Transmute time budget"
+    )
+
+    budget_fallback = ts.String(
+        default="scaled",
+        doc="Estimate used when the depletion does not finish within "
+        "transmute_budget. 'scaled' adds the change of the compositions "
+        "in the last cycle that was depleted, scaled by burnup, and "
+        "'coarse' depletes the cycle in a single time step. 'coarse' is "
+        "used if no cycle has been depleted yet. The coarse estimate is "
+        "waited for at most transmute_budget, and the fresh compositions "
+        "are kept if it is late and no cycle has been depleted",
+        tooltip="Estimate used when the budget is exceeded",
+        uilabel="Budget fallback"
+    )
+
+    depletion_processes = ts.Int(
+        default=0,
+        doc="Number of processes used by OpenMC for the matrix "
+        "exponentials of the depletion. The processes are kept between "
+        "depletions. If 0, one process per CPU is used, and if 1, no "
+        "extra processes are started. Depletions run in the background "
+        "use 1 process if this is 0",
+        tooltip="Number of processes for the depletion solver",
+        uilabel="Depletion processes"
+    )
+
+    blas_threads = ts.Int(
+        default=0,
+        doc="Number of BLAS threads in each depletion process. If 0, "
+        "the number of threads is not changed",
+        tooltip="Number of BLAS threads per depletion process",
+        uilabel="BLAS threads"
+    )
+
+    depletion_workers = ts.VectorString(
+        default=[],
+        doc="Addresses of openmcyclus-worker services that run the "
+        "OpenMC depletion, as host:port or local socket paths. Jobs are "
+        "sent to the workers in turn. If empty, the depletion is run "
+        "in this process",
+        tooltip="Addresses of the depletion workers",
+        uilabel="Depletion workers"
+    )
+
+    worker_timeout = ts.Double(
+        default=600.0,
+        doc="Time in seconds to wait for a depletion worker before the "
+        "job is sent to the next worker",
+        tooltip="Timeout of a depletion job on a worker (s)",
+        uilabel="Worker timeout"
+    )
+
+    worker_retries = ts.Int(
+        default=2,
+        doc="Number of times a depletion job is sent to another worker "
+        "after a failure. If all attempts fail, the depletion is run "
+        "in this process",
+        tooltip="Number of retries of a depletion job",
+        uilabel="Worker retries"
+    )
+
+    homogenize_batches = ts.Bool(
+        default=False,
+        doc="If True, the assemblies in the core that were loaded at the "
+        "same time with the same recipe are depleted as a single "
+        "homogenized material, and the result is split back onto each "
+        "assembly by mass. Only used if depletion_mode is 'openmc'",
+        tooltip="Deplete one material per batch of assemblies",
+        uilabel="Homogenize batches"
+    )
+
+    equilibrium_rtol = ts.Double(
+        default=0.0,
+        doc="Relative tolerance to detect an equilibrium cycle, in which "
+        "every batch in the core has the same fresh and spent "
+        "compositions as in the previous cycle. At equilibrium the "
+        "spent compositions are reused without running the depletion. "
+        "Not used if 0",
+        tooltip="Relative tolerance for equilibrium cycle detection",
+        uilabel="Equilibrium tolerance"
+    )
+
+    equilibrium_interval = ts.Int(
+        default=5,
+        doc="Number of cycles the spent compositions are reused at "
+        "equilibrium before the depletion is run again to check the "
+        "equilibrium. If 0, the depletion is only run again if the "
+        "fresh compositions or recipes change",
+        tooltip="Cycles between checks of the equilibrium",
+        uilabel="Equilibrium check interval",
+        units="cycles"
+    )
+
+    comp_max_nuclides = ts.Int(
+        default=0,
+        doc="Maximum number of nuclides kept in the spent fuel "
+        "compositions. The nuclides with the smallest masses are "
+        "removed and the rest are scaled to keep the assembly mass. "
+        "All nuclides are kept if 0",
+        tooltip="Maximum number of nuclides in spent fuel",
+        uilabel="Maximum spent fuel nuclides"
+    )
+
+    comp_cutoff = ts.Double(
+        default=0.0,
+        doc="Largest fraction of the mass of a spent fuel composition "
+        "that is removed by dropping the nuclides with the smallest "
+        "masses. The rest are scaled to keep the assembly mass. No "
+        "nuclides are removed if 0",
+        tooltip="Mass fraction of spent fuel that can be truncated",
+        uilabel="Spent fuel truncation cutoff"
+    )
+
+    decay_spent = ts.Bool(
+        default=False,
+        doc="If True, spent fuel assemblies decay while they are stored "
+        "at the reactor. Assemblies are decayed every decay_interval "
+        "time steps, and when they are traded away",
+        tooltip="Decay spent fuel in storage",
+        uilabel="Decay spent fuel"
+    )
+
+    decay_interval = ts.Int(
+        default=0,
+        doc="Number of time steps between decaying all of the stored "
+        "spent fuel, if decay_spent is True. If 0, spent fuel is only "
+        "decayed when it is traded away",
+        tooltip="Time steps between decaying the stored spent fuel",
+        uilabel="Spent fuel decay interval",
+        units="time steps"
+    )
+
+    checkpoint_interval = ts.Int(
+        default=0,
+        doc="Number of time steps between checkpoints of the depletion "
+        "state. No checkpoints are written if 0.",
+        tooltip="Time steps between checkpoints of the depletion state",
+        uilabel="Checkpoint interval",
+        units="time steps"
+    )
+
+    checkpoint_path = ts.String(
+        default="",
+        doc="Directory for checkpoints of the depletion state. The "
+        "model_path is used if not given.",
+        tooltip="Directory for checkpoints of the depletion state",
+        uilabel="Checkpoint directory"
+    )
+
+    memory_interval = ts.Int(
+        default=0,
+        doc="Number of time steps between samples of the memory use, "
+        "written to the ReactorMemory and ReactorAllocations tables. If "
+        "0, the memory use is not sampled",
+        tooltip="Time steps between memory samples",
+        uilabel="Memory sampling interval"
+    )
+
+    memory_top = ts.Int(
+        default=5,
+        doc="Number of the largest Python allocation sites written to the "
+        "ReactorAllocations table with each memory sample. If 0, "
+        "allocations are not traced",
+        tooltip="Number of allocation sites in each memory sample",
+        uilabel="Memory allocation sites"
+    )
+
+    bounded_memory = ts.Bool(
+        default=False,
+        doc="If True, the OpenMC objects of each depletion are freed after "
+        "the depletion, and the composition history is limited to "
+        "history_limit compositions, or n_assem_core compositions if "
+        "history_limit is 0",
+        tooltip="Free depletion objects and limit the history",
+        uilabel="Bounded memory"
+    )
+
+    history_limit = ts.Int(
+        default=0,
+        doc="Number of fresh and spent compositions kept in the history "
+        "of the reactor, which is written to checkpoints. If 0, all "
+        "compositions are kept unless bounded_memory is True",
+        tooltip="Number of compositions kept in the history",
+        uilabel="History limit"
+    )
+
+    export_file = ts.String(
+        default="",
+        doc="Parquet file, or Arrow stream if the name ends in .arrow, "
+        "that the fresh and spent compositions, flux, power, burnup and "
+        "solve time of each assembly are written to at each transmute. "
+        "Reactors with the same export_file write to the same file. "
+        "Needs pyarrow. If not given, nothing is exported",
+        tooltip="File the transmute results are exported to",
+        uilabel="Export file"
+    )
+
     latitude = ts.Double(
         default=0.0,
         uilabel="Geographical latitude in degrees as a double",
@@ -185,32 +459,73 @@ class DepleteReactor(Facility):
         self.core.capacity = self.assem_size * self.n_assem_core
         self.spent_fuel.capacity = self.assem_size * self.n_assem_spent
         self.cycle_step = 0
-        self.deplete = Depletion(self.chain_file,
-                                 self.cycle_time, self.thermal_power,
-                                 self.model_path)
-        self.fresh_fuel.capacity = self.n_assem_fresh * self.assem_size
-        self.core.capacity = self.n_assem_core * self.assem_size
-        self.spent_fuel.capacity = self.n_assem_spent * self.assem_size
-        self.materials = openmc.Materials()
-        self.fresh_comps = np.array([])
-        self.spent_comps = np.array([])
+        self.deplete = None
+        self.materials = None
+        self.micro_xs = None
+        self.table = None
+        self.table_problems = set()
+        self.fresh_comps = []
+        self.spent_comps = []
+        self.decay_times = {}
+        self.load_times = {}
+        self.burnups = {}
+        self.library = None
+        self.core_comps = {}
+        self.incremental_steps = 0
+        self.incremental_active = False
+        self.depletion_future = None
+        self.depletion_ids = []
+        self.depletion_groups = None
+        self.depletion_buffer = None
+        self.depletion_executor = None
+        self.coarse_future = None
+        self.coarse_groups = None
+        self.checkpoint_checked = False
+        self.chain_hash = None
+        self.equilibrium = None
+        self.recipes = None
+        self.workers = None
+        # Imported here because it needs NumPy, which the archetype
+        # does not load at import
+        from openmcyclus.compositions import CoreMirror
+
+        self.mirror = CoreMirror()
+        self.budget_reference = None
 
     def tick(self):
         '''
         Logic to implement at the tick phase of each
         time step.
 
-        If the prototype is retired, then that is recorded,
-        fuel is transmuted, and the prototype is decommissioned.
+        If the prototype is retired, then that is recorded once,
+        fuel is transmuted for the part of the cycle that was
+        completed, and the prototype is decommissioned.
 
         If it's the end of a cycle, that is recorded. If it is
         after a cycle ends, and fuel has not been discharged,
         then the fuel is discharged. If it's after a cycle ends, then
         fuel is loaded
+
+        On the first tick of a restarted simulation, the depletion
+        state is restored from the checkpoint file, if checkpoints
+        are used. Every decay_interval time steps, the spent fuel
+        is decayed, if decay_spent is True.
         '''
+        if not self.checkpoint_checked:
+            self.checkpoint_checked = True
+            if (self.checkpoint_interval > 0) and (
+                    self.context.time > self.enter_time):
+                self.restore_checkpoint()
+
+        if self.decay_spent and (self.decay_interval > 0) and (
+                self.context.time % self.decay_interval == 0):
+            self.decay_spent_fuel()
+
         if self.retired():
             if self.context.time == self.exit_time + 1:
-                self.transmute()
+                self.record("RETIRED", "")
+                if self.cycle_step <= self.cycle_time:
+                    self.transmute(self.cycle_step)
 
             while self.core.count > 0:
                 if self.discharge() == False:
@@ -218,13 +533,18 @@ class DepleteReactor(Facility):
             while (
                     self.fresh_fuel.count > 0) and (
                     self.spent_fuel.space >= self.assem_size):
-                self.spent_fuel.push(self.fresh_fuel.pop())
+                material = self.fresh_fuel.pop()
+                if self.decay_spent:
+                    self.decay_times[material.obj_id] = self.context.time
+                self.spent_fuel.push(material)
 
             if self.check_decommission_condition():
                 self.decommission()
+            return
 
         if self.cycle_step == self.cycle_time:
             self.transmute()
+            self.record("CYCLE_END", "")
 
         if (self.cycle_step >= self.cycle_time) and (self.discharged == False):
             self.discharged = self.discharge()
@@ -246,14 +566,22 @@ class DepleteReactor(Facility):
         cycle length counter is restarted.
 
         If it's the beginning of a new cycle and the core is full,
-        then a cycle start is recorded.
+        then a cycle start is recorded. If async_depletion is True, the
+        depletion of the core is started in the background, unless the
+        reactor is at an equilibrium cycle.
 
         If it's in the middle of a cycle and the core is full, the
-        the power_cap value is recorded as power generated. If these
-        conditions aren't met, then a power of 0 is recorded.
+        the power_cap value is recorded as power generated, and the
+        core is depleted by one time step if incremental_depletion is
+        True. If these conditions aren't met, then a power of 0 is
+        recorded.
 
         If it's in the middle of a cycle or the core is full, then
         the cycle duration counter increases by one.
+
+        Every checkpoint_interval time steps, the depletion state
+        is written to the checkpoint file, and every memory_interval
+        time steps the memory use is recorded.
         '''
         if self.retired():
             return
@@ -266,15 +594,36 @@ class DepleteReactor(Facility):
             self.discharged = False
             self.cycle_step = 0
 
+        if (self.cycle_step == 0) and (
+                self.core.count == self.n_assem_core):
+            self.record("CYCLE_START", "")
+            if self.depletion_mode == "openmc" and (
+                    self.async_depletion or self.incremental_depletion) and (
+                    not self.at_equilibrium()):
+                if self.incremental_depletion:
+                    self.incremental_active = True
+                else:
+                    self.submit_depletion()
+
         if (self.cycle_step >= 0) and (self.cycle_step < self.cycle_time) and (
                 self.core.count == self.n_assem_core):
             lib.record_time_series(lib.POWER, self, self.power_cap)
+            if self.incremental_active:
+                self.advance_core()
         else:
             lib.record_time_series(lib.POWER, self, 0)
 
         if (self.cycle_step > 0) or (self.core.count == self.n_assem_core):
             self.cycle_step += 1
 
+        if (self.checkpoint_interval > 0) and (
+                self.context.time % self.checkpoint_interval == 0):
+            self.save_checkpoint()
+
+        if (self.memory_interval > 0) and (
+                self.context.time % self.memory_interval == 0):
+            self.record_memory()
+
         return
 
     def enter_notify(self):
@@ -283,19 +632,89 @@ class DepleteReactor(Facility):
         Also defines a list for the input commodity preferences if
         none are provided by the user.
 
-        Establish the openmc.deplete.MicroXS and openmc.Materials
-        objects for use in simulation.
+        The OpenMC model is not read here, see ``load_model``.
         '''
         super().enter_notify()
+        if self.depletion_mode not in ("openmc", "table"):
+            raise ValueError(
+                "openmcyclus.DepleteReactor:DepleteReactor depletion_mode "
+                "must be 'openmc' or 'table', not " + self.depletion_mode)
+        if self.budget_fallback not in ("scaled", "coarse"):
+            raise ValueError(
+                "openmcyclus.DepleteReactor:DepleteReactor budget_fallback "
+                "must be 'scaled' or 'coarse', not " + self.budget_fallback)
+        if len(self.depletion_workers) > 0:
+            from openmcyclus.worker import get_authkey
+
+            get_authkey()
         if len(self.fuel_prefs) == 0:
             self.fuel_prefs = [1] * len(self.fuel_incommods)
-        self.materials = self.materials.from_xml(
-            str(self.model_path + "materials.xml"))
-        self.micro_xs = od.MicroXS.from_csv(
-            str(self.model_path + "micro_xs.csv"))
+        if (self.memory_interval > 0) and (self.memory_top > 0):
+            from openmcyclus.memory import start_tracing
+            start_tracing()
 
         self.record_position()
 
+    def load_model(self):
+        '''
+        Establish the Depletion, openmc.Materials and
+        openmc.deplete.MicroXS objects for use in simulation.
+
+        This is deferred until the first call to transmute, so OpenMC
+        is only imported and the model files are only read by
+        reactors that deplete fuel. The cross sections are shared
+        by all reactors using the same model_path. If an
+        assembly_template is given, the template material is cloned
+        for each assembly in the core, and the materials are shared by
+        all reactors with the same model_path and core size. If
+        xs_library is given, the cross section library is read once
+        per process in the same way.
+
+        If depletion_mode is "table", only the burnup table is read.
+        '''
+        if self.depletion_mode == "table":
+            if self.table is None:
+                from openmcyclus.table import read_table
+                self.table = read_table(
+                    str(self.model_path + self.table_file))
+            return
+        if self.xs_library and (self.library is None):
+            from openmcyclus.xs_library import read_library
+            self.library = read_library(
+                str(self.model_path + self.xs_library))
+        if self.deplete is not None:
+            return
+        from openmcyclus.depletion import (Depletion, load_micro_xs,
+                                           read_template_materials)
+        import openmc
+
+        self.deplete = Depletion(self.chain_file,
+                                 self.cycle_time, self.thermal_power,
+                                 self.model_path, self.depletion_processes,
+                                 self.blas_threads)
+        if self.assembly_template:
+            self.materials = read_template_materials(
+                str(self.model_path + "materials.xml"),
+                self.assembly_template, self.n_assem_core)
+        else:
+            self.materials = openmc.Materials.from_xml(
+                str(self.model_path + "materials.xml"))
+        self.micro_xs = load_micro_xs(
+            str(self.model_path + "micro_xs.csv"), self.flux_spectrum)
+
+    def total_flux(self):
+        '''
+        Get the one-group flux for the depletion
+
+        Returns:
+        --------
+        float: total of flux_spectrum if it is given, otherwise flux
+            (n/cm2s)
+        '''
+        if len(self.flux_spectrum) > 0:
+            return float(sum(self.flux_spectrum))
+        return self.flux
+
     def check_decommission_condition(self):
         '''
         If the core and the spent fuel are empty, then the core can be
@@ -472,7 +891,9 @@ class DepleteReactor(Facility):
         For each trade, get the commodity name, get the
         composition of the trade.
 
-        Then trade the materials from the spent fuel inventory.
+        Then trade the materials from the spent fuel inventory. If
+        decay_spent is True, the traded materials are decayed to the
+        current time first.
 
          Parameters:
         -----------
@@ -494,6 +915,9 @@ class DepleteReactor(Facility):
             if mats[commodity] == []:
                 continue
             mat = mats[commodity].pop(-1)
+            if self.decay_spent:
+                self.decay_spent_fuel([mat])
+                self.decay_times.pop(mat.obj_id, None)
             responses[trades[ii]] = mat
             self.resource_indexes.pop(mat.obj_id)
         self.push_spent(mats)
@@ -512,9 +936,9 @@ class DepleteReactor(Facility):
         For each trade in the responses, get the commodity requested
         in the trade and reset the index.
 
-        If the core is not full, the put the material in the core.
-        If the core is full, the put the material in the fresh
-        fuel inventory.
+        If the core is not full, the put the material in the core,
+        and add it to the core mirror. If the core is full, the put
+        the material in the fresh fuel inventory.
 
         Parameters:
         -----------
@@ -527,12 +951,14 @@ class DepleteReactor(Facility):
         n_load = len(responses)
         if n_load > 0:
             ss = str(n_load) + " assemblies"
+            self.record("LOAD", ss)
         for trade in responses:
             commodity = trade.request.commodity
             material = trade.request.target
             self.index_res(material, commodity)
             if self.core.count < self.n_assem_core:
                 self.core.push(material)
+                self.mirror.push([material])
             else:
                 self.fresh_fuel.push(material)
 
@@ -559,8 +985,10 @@ class DepleteReactor(Facility):
 
         Record the number of assemblies discharged.
 
-        Remove the correct number of assemblies from the core.
-        Get the name of each spent fuel assembly. Then get the
+        Remove the correct number of assemblies from the core and
+        the core mirror.
+        Get the name of each spent fuel assembly, and update its recipe
+        if the composition changed. Then get the
         mass of each spent fuel commodity discharged. Return true if the
         fuel has been discharged.
 
@@ -573,13 +1001,24 @@ class DepleteReactor(Facility):
             return False
 
         ss = str(npop) + " assemblies"
+        self.record("DISCHARGE", ss)
         discharge_assemblies = self.core.pop_n(npop)
+        self.mirror.remove(discharge_assemblies)
+        if self.recipes is None:
+            from openmcyclus.compositions import RecipeRegistry
+            self.recipes = RecipeRegistry(self.context)
         for assembly in discharge_assemblies:
             recipe_name = self.get_recipe(assembly, 'out')
             comp = assembly.comp()
-            self.context.add_recipe(recipe_name, comp, 'mass')
+            self.recipes.add(recipe_name, comp, 'mass')
 
+        for assembly in discharge_assemblies:
+            self.load_times.pop(assembly.obj_id, None)
+            self.burnups.pop(assembly.obj_id, None)
         self.spent_fuel.push_many(discharge_assemblies)
+        if self.decay_spent:
+            for assembly in discharge_assemblies:
+                self.decay_times[assembly.obj_id] = self.context.time
 
         for ii in range(len(self.fuel_outcommods)):
             spent_mats = self.peek_spent()
@@ -601,58 +1040,1098 @@ class DepleteReactor(Facility):
         return.
 
         Record the number of assemblies that are to be loaded, then move
-        them from the fresh fuel inventory to the core inventory.
+        them from the fresh fuel inventory to the core inventory and
+        the core mirror.
         '''
         n = min((self.n_assem_core - self.core.count), self.fresh_fuel.count)
 
         if n == 0:
             return
         ss = str(n) + " assemblies"
+        self.record("LOAD", ss)
 
-        self.core.push_many(self.fresh_fuel.pop_n(n))
+        assemblies = self.fresh_fuel.pop_n(n)
+        for assembly in assemblies:
+            self.load_times[assembly.obj_id] = self.context.time
+        self.core.push_many(assemblies)
+        self.mirror.push(assemblies)
         return
 
-    def transmute(self):
+    def transmute(self, steps=None):
         '''
         Get the material composition of assemblies in
-        the core and pass those compositions to OpenMC, along
-        with the cross section data, material definitions,
-        decay chain file name, power level, and depletion time
-        to OpenMC. The depletion time steps are 30 days each,
-        for the number of months in a cycle. The power level is
-        converted from MW to W.
+        the core from the core mirror and pass those compositions
+        to OpenMC, along with the cross section data, material
+        definitions, decay chain file name, power level, and depletion
+        time to OpenMC. The depletion time steps are the length of a
+        Cyclus time step, for the given number of steps.
+        The power level is converted from MW to W. If there are no
+        steps to deplete or the core is empty, nothing is done.
+
+        If depletion_mode is "table", the spent compositions are
+        interpolated from the burnup table instead, using the
+        power of a single assembly. If homogenize_batches is True,
+        one material is depleted for each batch in the core. At an
+        equilibrium cycle, the spent compositions of the previous
+        cycle are reused. If the depletion was started in
+        the background at the start of the cycle, its result is used.
+        If the core was depleted at each time step of the cycle, the
+        compositions from the last step are used, and only the steps
+        left are depleted. If transmute_budget is given, the
+        depletion is only waited for until the budget is used, and is
+        otherwise replaced by the budget_fallback estimate. The spent
+        compositions are truncated if comp_max_nuclides or comp_cutoff
+        are given.
 
         Record the number of assemblies to be transmuted. Transmute the fuel
         by changing the recipe of the material to that of the
-        fuel_outrecipes
+        fuel_outrecipes, and write the spent compositions to the core
+        mirror. If export_file is given, the compositions of the
+        assemblies are written to it.
+
+        Parameters:
+        -----------
+        steps: int
+            number of time steps the fuel was in the core for.
+            Defaults to cycle_time.
         '''
-        assemblies = self.core.pop_n(self.core.count)
-        self.core.push_many(assemblies)
-        # ss = str(len(assemblies)) + " assemblies"
-        # self.record("TRANSMUTE", ss)
-        comp_list = [assembly.comp() for assembly in assemblies]
-        material_ids, materials = self.deplete.update_materials(
-            comp_list, self.materials)
-        ind_op = od.IndependentOperator(
-            materials,
-            [np.array([self.flux])] * len(materials),
-            [self.micro_xs] * len(materials),
-            str(self.model_path + self.chain_file))
-        ind_op.output_dir = self.model_path
-        integrator = od.PredictorIntegrator(ind_op,
-                                            np.ones(int(self.cycle_time)
-                                                    ) * self.context.dt,
-                                            power=self.thermal_power * 1e6,
-                                            timestep_units='s')
-        integrator.integrate()
-        spent_comps = self.deplete.get_spent_comps(
-            material_ids)
+        if steps is None:
+            steps = self.cycle_time
+        if (steps == 0) or (self.core.count == 0):
+            return
+        self.load_model()
+        assemblies, comp_list = self.core_assemblies()
+        ss = str(len(assemblies)) + " assemblies"
+        self.record("TRANSMUTE", ss)
+        start = time.perf_counter()
+        source = "equilibrium"
+        spent_comps = self.equilibrium_comps(assemblies, steps, comp_list)
+        if spent_comps is not None:
+            self.record("EQUILIBRIUM", ss)
+            self.cancel_depletion()
+        else:
+            source = "async"
+            if (self.transmute_budget > 0) and not self.incremental_active:
+                spent_comps, source = self.budgeted_depletion(
+                    assemblies, comp_list, steps,
+                    start + self.transmute_budget)
+            else:
+                spent_comps = self.collect_depletion(assemblies, steps)
+            if spent_comps is None:
+                source = "incremental"
+                spent_comps = self.incremental_comps(assemblies, steps)
+            if spent_comps is None:
+                source = self.depletion_mode
+                spent_comps = self.deplete_core(
+                    assemblies, comp_list, steps,
+                    arrays=(self.mirror.nuclides, self.mirror.masses))
+            # Estimates are not reused in later cycles
+            if source not in ["scaled", "coarse", "fresh"]:
+                self.update_equilibrium(assemblies, spent_comps, steps,
+                                        comp_list)
+                if self.transmute_budget > 0:
+                    self.budget_reference = (comp_list, spent_comps,
+                                             steps * self.burnup_step())
+        solve_time = time.perf_counter() - start
+        if (self.comp_max_nuclides > 0) or (self.comp_cutoff > 0):
+            from openmcyclus.compositions import truncate
+            spent_comps = [truncate(comp, self.comp_max_nuclides,
+                                    self.comp_cutoff)
+                           for comp in spent_comps]
+        # The burnup of the steps depleted during the cycle was added
+        burnup = max(steps - self.incremental_steps, 0) * self.burnup_step()
+        self.core_comps = {}
+        self.incremental_steps = 0
+        self.incremental_active = False
+        self.fresh_comps.extend(comp_list)
+        self.spent_comps.extend(spent_comps)
+        self.mirror.update(spent_comps)
         for assembly, spent_comp in zip(assemblies, spent_comps):
-            self.fresh_comps = np.append(self.fresh_comps, assembly.comp())
-            self.spent_comps = np.append(self.spent_comps, spent_comp)
+            self.burnups[assembly.obj_id] = self.burnups.get(
+                assembly.obj_id, 0.0) + burnup
             assembly.transmute(spent_comp)
+        if self.export_file:
+            self.export_transmute(assemblies, comp_list, spent_comps, steps,
+                                  source, solve_time)
+        self.trim_history()
+        if self.bounded_memory:
+            from openmcyclus.memory import release
+            release()
         return
 
+    def core_assemblies(self):
+        '''
+        Get the assemblies in the core and their compositions from the
+        core mirror, without popping the core buffer. The mirror is
+        rebuilt from the buffer if it does not have the same number of
+        assemblies, e.g. after a restart from a checkpoint.
+
+        Returns:
+        --------
+        assemblies: list of Materials
+            assemblies in the core
+        comp_list: list of dicts
+            composition of each assembly, in the same order
+        '''
+        if len(self.mirror) != self.core.count:
+            assemblies = self.core.pop_n(self.core.count)
+            self.core.push_many(assemblies)
+            self.mirror.clear()
+            self.mirror.push(assemblies)
+        return list(self.mirror.materials), self.mirror.comps()
+
+    def advance_core(self):
+        '''
+        Deplete the assemblies in the core by one time step, starting
+        from the compositions depleted in the earlier time steps of the
+        cycle. The compositions are kept with every nuclide of the
+        depletion chain between the steps, so that the steps give the
+        same result as depleting the whole cycle at once.
+        '''
+        self.load_model()
+        assemblies, comp_list = self.core_assemblies()
+        comp_list = [self.core_comps.get(assembly.obj_id) or comp
+                     for assembly, comp in zip(assemblies, comp_list)]
+        spent_comps = self.deplete_core(assemblies, comp_list, 1,
+                                        chain_comps=True)
+        self.core_comps = {assembly.obj_id: comp for assembly, comp
+                           in zip(assemblies, spent_comps)}
+        step = self.burnup_step()
+        for assembly in assemblies:
+            self.burnups[assembly.obj_id] = self.burnups.get(
+                assembly.obj_id, 0.0) + step
+        self.incremental_steps += 1
+
+    def incremental_comps(self, assemblies, steps):
+        '''
+        Get the spent compositions of the core from the depletion done
+        at each time step of the cycle. Any steps that were not
+        depleted during the cycle are depleted now.
+
+        Parameters:
+        -----------
+        assemblies: list of Materials
+            assemblies in the core
+        steps: int
+            number of time steps to deplete for
+
+        Returns:
+        --------
+        spent_comps: list of dicts
+            spent compositions, in the same order as assemblies. None
+            if the core was not depleted during the cycle.
+        '''
+        if (self.incremental_steps == 0) or any(
+                assembly.obj_id not in self.core_comps
+                for assembly in assemblies):
+            return None
+        from openmcyclus.depletion import select_spent
+
+        spent_comps = [self.core_comps[assembly.obj_id]
+                       for assembly in assemblies]
+        if steps > self.incremental_steps:
+            spent_comps = self.deplete_core(assemblies, spent_comps,
+                                            steps - self.incremental_steps,
+                                            chain_comps=True)
+        micro_xs = self.micro_xs if self.library is None else \
+            self.library.micro_xs([0.0])[0]
+        return select_spent(spent_comps, micro_xs)
+
+    def core_inventory(self):
+        '''
+        Get the current nuclide masses of the assemblies in the core.
+        With incremental_depletion, these are the compositions depleted
+        up to the current time step of the cycle, otherwise the
+        compositions at the start of the cycle.
+
+        Returns:
+        --------
+        inventory: list of dicts
+            mass of each nuclide (kg) in each assembly, in core order
+        '''
+        assemblies, comp_list = self.core_assemblies()
+        inventory = []
+        for assembly, comp in zip(assemblies, comp_list):
+            comp = self.core_comps.get(assembly.obj_id) or comp
+            total = sum(comp.values())
+            inventory.append({nuc: mass * assembly.quantity / total
+                              for nuc, mass in comp.items()})
+        return inventory
+
+    def export_transmute(self, assemblies, fresh_comps, spent_comps, steps,
+                         source, solve_time):
+        '''
+        Write the assemblies of a transmute to export_file, as one row
+        group. The mass columns are the nuclides of the burnup table
+        if depletion_mode is "table", otherwise the nuclides of the
+        depletion chain.
+
+        Parameters:
+        -----------
+        assemblies: list of Materials
+            assemblies in the core
+        fresh_comps: list of dicts
+            compositions before the transmute
+        spent_comps: list of dicts
+            compositions after the transmute
+        steps: int
+            number of time steps depleted
+        source: str
+            how the spent compositions were found: equilibrium,
+            async, incremental, openmc, table, or the budget_fallback
+            estimate, scaled or coarse
+        solve_time: float
+            wall time to find the spent compositions (s)
+        '''
+        from openmcyclus.export import get_exporter, transmute_columns
+
+        if self.depletion_mode == "table":
+            nuclides = self.table.nuclides
+        else:
+            from openmcyclus.depletion import chain_nuclides
+            nuclides = chain_nuclides(self.model_path + self.chain_file)
+        exporter = get_exporter(self.export_file, nuclides)
+        exporter.write(transmute_columns(
+            exporter.nuclides, self.id, self.context.time,
+            [assembly.obj_id for assembly in assemblies], steps, source,
+            self.total_flux(), self.thermal_power,
+            [assembly.quantity for assembly in assemblies],
+            [self.burnups.get(assembly.obj_id, 0.0)
+             for assembly in assemblies],
+            solve_time, fresh_comps, spent_comps))
+
+    def trim_history(self):
+        '''
+        Keep only the last history_limit fresh and spent compositions,
+        or the last n_assem_core if bounded_memory is True and
+        history_limit is 0
+        '''
+        limit = self.history_limit
+        if (limit <= 0) and self.bounded_memory:
+            limit = self.n_assem_core
+        if (limit > 0) and (len(self.fresh_comps) > limit):
+            del self.fresh_comps[:-limit]
+            del self.spent_comps[:-limit]
+
+    def deplete_core(self, assemblies, comp_list, steps, dt=None,
+                     chain_comps=False, arrays=None):
+        '''
+        Get the spent compositions of the assemblies in the core,
+        from the burnup table or from the OpenMC depletion solver
+        depending on depletion_mode.
+
+        Parameters:
+        -----------
+        assemblies: list of Materials
+            assemblies in the core
+        comp_list: list of dicts
+            compositions of the assemblies
+        steps: int
+            number of time steps to deplete for
+        dt: float
+            length of each step (s). Defaults to the Cyclus time step.
+        chain_comps: bool
+            if True, the OpenMC spent compositions have every nuclide
+            of the depletion chain
+        arrays: tuple of numpy.ndarrays
+            nuclide ids and masses of comp_list, e.g. from the core
+            mirror, see ``run_depletion``
+
+        Returns:
+        --------
+        spent_comps: list of dicts
+            spent compositions, in the same order as assemblies
+        '''
+        if dt is None:
+            dt = self.context.dt
+        if self.depletion_mode == "table":
+            power = self.thermal_power / self.n_assem_core
+            # Each problem with the table is warned about once
+            for problem in self.table.check(comp_list, self.total_flux(),
+                                            power, steps * dt):
+                if problem not in self.table_problems:
+                    self.table_problems.add(problem)
+                    warnings.warn(str(self.prototype) + " burnup table: " +
+                                  problem)
+            return self.table.spent_comps(
+                comp_list, [assembly.quantity for assembly in assemblies],
+                self.total_flux(), power, steps * dt)
+        if not self.homogenize_batches:
+            return self.run_depletion(comp_list, steps,
+                                      burnups=self.core_burnups(assemblies),
+                                      dt=dt, chain_comps=chain_comps,
+                                      arrays=arrays)
+        from openmcyclus.depletion import homogenize, split_batches
+
+        groups = self.batch_groups(assemblies)
+        masses = [assembly.quantity for assembly in assemblies]
+        batch_comps, multiplicity = homogenize(comp_list, masses, groups)
+        spent_comps = self.run_depletion(
+            batch_comps, steps, multiplicity,
+            self.core_burnups(assemblies, groups), dt, chain_comps)
+        return split_batches(spent_comps, masses, groups)
+
+    def core_burnups(self, assemblies, groups=None):
+        '''
+        Get the burnup of the assemblies in the core, or of the first
+        assembly in each batch. The assemblies in a batch have the
+        same history, so they have the same burnup.
+
+        Parameters:
+        -----------
+        assemblies: list of Materials
+            assemblies in the core
+        groups: list of lists of ints
+            indices of the assemblies in each batch
+
+        Returns:
+        --------
+        list of floats: burnup (MWd/kgHM)
+        '''
+        if groups is not None:
+            assemblies = [assemblies[group[0]] for group in groups]
+        return [self.burnups.get(assembly.obj_id, 0.0)
+                for assembly in assemblies]
+
+    def burnup_step(self, dt=None):
+        '''
+        Get the burnup added to the assemblies in the core in one
+        time step, with the thermal power shared evenly by mass
+
+        Parameters:
+        -----------
+        dt: float
+            length of the step (s). Defaults to the Cyclus time step.
+
+        Returns:
+        --------
+        float: burnup (MWd/kgHM)
+        '''
+        from openmcyclus.xs_library import burnup_step
+
+        if dt is None:
+            dt = self.context.dt
+        return burnup_step(self.thermal_power, dt, self.core.quantity)
+
+    def run_depletion(self, comp_list, steps, multiplicity=None,
+                      burnups=None, dt=None, chain_comps=False,
+                      arrays=None):
+        '''
+        Run the OpenMC depletion on the depletion workers if any are
+        given, or in this process. If the job fails on all of the
+        workers, a warning is given and the depletion is run in this
+        process.
+
+        Parameters:
+        -----------
+        comp_list: list of dicts
+            compositions to deplete
+        steps: int
+            number of time steps to deplete for
+        multiplicity: list of ints
+            number of assemblies that each composition stands for
+        burnups: list of floats
+            burnup of each composition (MWd/kgHM), used with
+            xs_library
+        dt: float
+            length of each step (s). Defaults to the Cyclus time step.
+        chain_comps: bool
+            if True, the spent compositions have every nuclide of the
+            depletion chain
+        arrays: tuple of numpy.ndarrays
+            nuclide ids and masses of comp_list. If given, they are
+            used by the depletion in this process instead of comp_list,
+            so the compositions are not converted again.
+
+        Returns:
+        --------
+        spent_comps: list of dicts
+            spent compositions
+        '''
+        if dt is None:
+            dt = self.context.dt
+        if len(self.depletion_workers) > 0:
+            from openmcyclus.worker import WorkerClient, WorkerError
+
+            if self.workers is None:
+                self.workers = WorkerClient(self.depletion_workers,
+                                            self.worker_timeout,
+                                            self.worker_retries)
+            try:
+                return self.workers.run(self.depletion_job(
+                    comp_list, steps, multiplicity, burnups, dt,
+                    chain_comps))
+            except WorkerError as error:
+                warnings.warn(str(error) + ". Running the depletion in "
+                              "this process.")
+        return self.deplete.run(
+            comp_list if arrays is None else arrays, self.materials,
+            self.micro_xs, self.total_flux(), dt, steps,
+            multiplicity=multiplicity,
+            xs_library=self.library, burnups=burnups,
+            burnup_step=self.burnup_step(dt), chain_comps=chain_comps)
+
+    def depletion_job(self, comp_list, steps, multiplicity=None,
+                      burnups=None, dt=None, chain_comps=False):
+        '''
+        Create a depletion job that can be run in another process,
+        see ``openmcyclus.depletion.run_job``
+
+        Parameters:
+        -----------
+        comp_list: list of dicts
+            compositions to deplete
+        steps: int
+            number of time steps to deplete for
+        multiplicity: list of ints
+            number of assemblies that each composition stands for
+        burnups: list of floats
+            burnup of each composition (MWd/kgHM), used with
+            xs_library
+        dt: float
+            length of each step (s). Defaults to the Cyclus time step.
+        chain_comps: bool
+            if True, the spent compositions have every nuclide of the
+            depletion chain
+
+        Returns:
+        --------
+        dict: depletion job
+        '''
+        return {"comp_list": comp_list,
+                "chain_file": self.chain_file,
+                "path": self.model_path,
+                "power": self.thermal_power,
+                "flux": self.total_flux(),
+                "dt": dt or self.context.dt,
+                "steps": steps,
+                "assembly_template": self.assembly_template,
+                "multiplicity": multiplicity,
+                "processes": self.depletion_processes,
+                "blas_threads": self.blas_threads,
+                "flux_spectrum": list(self.flux_spectrum),
+                "xs_library": self.xs_library,
+                "burnups": burnups,
+                "burnup_step": self.burnup_step(dt),
+                "chain_comps": chain_comps}
+
+    def batch_groups(self, assemblies):
+        '''
+        Group the assemblies in the core by batch, using the time
+        they were loaded and their recipe. The assemblies in a batch
+        have the same history.
+
+        Parameters:
+        -----------
+        assemblies: list of Materials
+            assemblies in the core
+
+        Returns:
+        --------
+        groups: list of lists of ints
+            indices of the assemblies in each batch, in core order
+        '''
+        groups = {}
+        for index, assembly in enumerate(assemblies):
+            key = (self.load_times.get(assembly.obj_id, -1),
+                   self.resource_indexes.get(assembly.obj_id, -1))
+            groups.setdefault(key, []).append(index)
+        return list(groups.values())
+
+    def core_batches(self, assemblies, comp_list=None):
+        '''
+        Get the recipe and the fresh composition of each batch in the
+        core, to compare cycles for the equilibrium detection
+
+        Parameters:
+        -----------
+        assemblies: list of Materials
+            assemblies in the core
+        comp_list: list of dicts
+            composition of each assembly. Read from the assemblies if
+            not given.
+
+        Returns:
+        --------
+        groups: list of lists of ints
+            indices of the assemblies in each batch
+        batches: list of tuples
+            (recipe index, mass fractions) of each batch
+        '''
+        from openmcyclus.equilibrium import mix
+
+        if comp_list is None:
+            comp_list = [assembly.comp() for assembly in assemblies]
+        groups = self.batch_groups(assemblies)
+        batches = []
+        for group in groups:
+            batch = [assemblies[ii] for ii in group]
+            batches.append((
+                self.resource_indexes.get(batch[0].obj_id, -1),
+                mix([comp_list[ii] for ii in group],
+                    [assembly.quantity for assembly in batch])))
+        return groups, batches
+
+    def at_equilibrium(self):
+        '''
+        Check whether the spent compositions of the assemblies in the
+        core can be reused from the last depleted cycle, so the
+        depletion does not need to be started
+
+        Returns:
+        --------
+        Bool: True if the reactor is at an equilibrium cycle
+        '''
+        if self.equilibrium is None:
+            return False
+        assemblies, comp_list = self.core_assemblies()
+        _, batches = self.core_batches(assemblies, comp_list)
+        return self.equilibrium.lookup(batches) is not None
+
+    def equilibrium_comps(self, assemblies, steps, comp_list=None):
+        '''
+        Get the spent compositions of the core from the last depleted
+        cycle, if the reactor is at an equilibrium cycle. The
+        depletion is run again every equilibrium_interval cycles, and
+        whenever the fresh compositions or recipes of the batches change.
+
+        Parameters:
+        -----------
+        assemblies: list of Materials
+            assemblies in the core
+        steps: int
+            number of time steps to deplete for
+        comp_list: list of dicts
+            composition of each assembly. Read from the assemblies if
+            not given.
+
+        Returns:
+        --------
+        spent_comps: list of dicts
+            spent compositions, in the same order as assemblies. None if
+            the depletion must be run.
+        '''
+        if (self.equilibrium is None) or (steps != self.cycle_time):
+            return None
+        groups, batches = self.core_batches(assemblies, comp_list)
+        outputs = self.equilibrium.lookup(batches)
+        if outputs is None:
+            return None
+        self.equilibrium.reuse()
+        spent_comps = [None] * len(assemblies)
+        for group, output in zip(groups, outputs):
+            for ii in group:
+                spent_comps[ii] = dict(output)
+        return spent_comps
+
+    def update_equilibrium(self, assemblies, spent_comps, steps,
+                           comp_list=None):
+        '''
+        Store the fresh and spent compositions of each batch of a
+        depleted cycle, to detect an equilibrium cycle. Nothing is
+        stored if equilibrium_rtol is 0 or for a partial cycle.
+
+        Parameters:
+        -----------
+        assemblies: list of Materials
+            assemblies in the core
+        spent_comps: list of dicts
+            spent compositions, in the same order as assemblies
+        steps: int
+            number of time steps that were depleted
+        comp_list: list of dicts
+            fresh composition of each assembly. Read from the
+            assemblies if not given.
+        '''
+        if (self.equilibrium_rtol <= 0) or (steps != self.cycle_time):
+            return
+        from openmcyclus.equilibrium import Equilibrium
+
+        if self.equilibrium is None:
+            self.equilibrium = Equilibrium(self.equilibrium_rtol,
+                                           self.equilibrium_interval)
+        groups, batches = self.core_batches(assemblies, comp_list)
+        outputs = []
+        for group in groups:
+            output = {}
+            for ii in group:
+                for nuc, mass in spent_comps[ii].items():
+                    output[nuc] = output.get(nuc, 0.0) + mass / len(group)
+            outputs.append(output)
+        self.equilibrium.update(batches, outputs)
+
+    def submit_depletion(self):
+        '''
+        Start the depletion of the assemblies in the core in a
+        background process. The core does not change until the end
+        of the cycle, so the depletion only depends on the current
+        compositions and the state variables. The compositions are
+        sent to the process in shared memory, indexed by the nuclides
+        of the depletion chain. The result is collected by
+        ``collect_depletion``.
+
+        If transmute_budget is given, the depletion runs in a pool of
+        this reactor only, so that it can be stopped when the budget is
+        used, and the coarse estimate is started at the same time if
+        it can be needed. The pool is reused in the next cycles unless
+        it had to be stopped.
+        '''
+        from openmcyclus.depletion import (get_executor, run_shared,
+                                           homogenize, chain_nuclides,
+                                           load_micro_xs, budget_executor)
+        from openmcyclus.shared import SharedMasses, fill_masses
+
+        assemblies, comp_list = self.core_assemblies()
+        fresh_comps = comp_list
+        multiplicity = None
+        self.depletion_groups = None
+        if self.homogenize_batches:
+            self.depletion_groups = self.batch_groups(assemblies)
+            comp_list, multiplicity = homogenize(
+                comp_list, [assembly.quantity for assembly in assemblies],
+                self.depletion_groups)
+        # The nuclides and cross sections are read before the worker
+        # processes are forked, so that the workers share them
+        nuclides = chain_nuclides(self.model_path + self.chain_file)
+        load_micro_xs(self.model_path + "micro_xs.csv", self.flux_spectrum)
+        buffer = SharedMasses((2, len(comp_list), len(nuclides)))
+        try:
+            fill_masses(comp_list, nuclides, buffer.masses[0])
+        except ValueError as error:
+            buffer.unlink()
+            warnings.warn(str(error) + ". The depletion is run at the "
+                          "end of the cycle.")
+            return
+        job = self.depletion_job(
+            None, self.cycle_time, multiplicity,
+            self.core_burnups(assemblies, self.depletion_groups))
+        del job["comp_list"]
+        job["shared"] = buffer.name
+        job["n_comps"] = len(comp_list)
+        self.depletion_buffer = buffer
+        self.depletion_ids = [assembly.obj_id for assembly in assemblies]
+        # The depletions of the reactors run in parallel in the
+        # background processes, so by default each one runs its matrix
+        # exponentials without starting a pool of its own
+        if job["processes"] == 0:
+            job["processes"] = 1
+        if self.transmute_budget <= 0:
+            self.depletion_future = get_executor(job["processes"]).submit(
+                run_shared, job)
+            return
+        if self.depletion_executor is None:
+            self.depletion_executor = budget_executor()
+        self.depletion_future = self.depletion_executor.submit(
+            run_shared, job)
+        if (self.budget_fallback == "coarse") or (
+                self.budget_reference is None):
+            self.submit_coarse(assemblies, fresh_comps, self.cycle_time)
+
+    def submit_coarse(self, assemblies, comp_list, steps):
+        '''
+        Start the coarse estimate of the spent compositions, the
+        depletion of the cycle in a single time step, in the pool of
+        the depletion with a time budget. The result is collected by
+        ``estimate_comps``.
+
+        Parameters:
+        -----------
+        assemblies: list of Materials
+            assemblies in the core
+        comp_list: list of dicts
+            compositions of the assemblies
+        steps: int
+            number of time steps to deplete for
+        '''
+        from openmcyclus.depletion import homogenize, run_job
+
+        multiplicity = None
+        self.coarse_groups = None
+        if self.homogenize_batches:
+            self.coarse_groups = self.batch_groups(assemblies)
+            comp_list, multiplicity = homogenize(
+                comp_list, [assembly.quantity for assembly in assemblies],
+                self.coarse_groups)
+        job = self.depletion_job(
+            comp_list, 1, multiplicity,
+            self.core_burnups(assemblies, self.coarse_groups),
+            steps * self.context.dt)
+        if job["processes"] == 0:
+            job["processes"] = 1
+        self.coarse_future = self.depletion_executor.submit(run_job, job)
+
+    def budgeted_depletion(self, assemblies, comp_list, steps, deadline):
+        '''
+        Deplete the core in a background process, and wait for it
+        until the deadline. The depletion started at the start of the
+        cycle is used if there is one. If the depletion is not done by
+        the deadline, its process is stopped and the spent
+        compositions are estimated with budget_fallback instead, and
+        this is recorded. The coarse estimate runs at the same time as
+        the depletion, so it is ready soon after the deadline.
+
+        Parameters:
+        -----------
+        assemblies: list of Materials
+            assemblies in the core
+        comp_list: list of dicts
+            compositions of the assemblies
+        steps: int
+            number of time steps to deplete for
+        deadline: float
+            time.perf_counter() value to wait until
+
+        Returns:
+        --------
+        spent_comps: list of dicts
+            spent compositions, in the same order as assemblies. None
+            if the depletion could not be run in the background.
+        source: str
+            how the spent compositions were found: async, scaled or
+            coarse
+        '''
+        from concurrent.futures import wait
+
+        if (self.depletion_mode != "openmc") or (steps != self.cycle_time):
+            return self.collect_depletion(assemblies, steps), "async"
+        if (self.depletion_future is not None) and (
+                [assembly.obj_id for assembly in assemblies] !=
+                self.depletion_ids):
+            self.cancel_depletion()
+        if self.depletion_future is None:
+            self.submit_depletion()
+        if self.depletion_future is None:
+            return None, "async"
+        done, _ = wait([self.depletion_future],
+                       max(deadline - time.perf_counter(), 0.0))
+        if done:
+            spent_comps, source = self.collect_depletion(
+                assemblies, steps), "async"
+        else:
+            spent_comps, source = self.estimate_comps(assemblies, comp_list,
+                                                      steps)
+            self.cancel_depletion()
+            self.record("APPROXIMATED", source)
+        self.record_budget(source, deadline)
+        return spent_comps, source
+
+    def estimate_comps(self, assemblies, comp_list, steps):
+        '''
+        Estimate the spent compositions of the core with
+        budget_fallback. The "scaled" estimate adds the change of the
+        compositions in the last cycle that was depleted, scaled by
+        the ratio of the burnups. The "coarse" estimate depletes the
+        cycle in a single time step, and is used if no cycle has been
+        depleted yet. It is taken from ``submit_coarse`` if it was
+        started, and is waited for at most transmute_budget. If it is
+        not done by then, this is recorded as a COARSE_TIMEOUT event,
+        and the scaled estimate is used if there is one, or otherwise
+        the fresh compositions are kept.
+
+        Parameters:
+        -----------
+        assemblies: list of Materials
+            assemblies in the core
+        comp_list: list of dicts
+            compositions of the assemblies
+        steps: int
+            number of time steps to deplete for
+
+        Returns:
+        --------
+        spent_comps: list of dicts
+            spent compositions, in the same order as assemblies
+        source: str
+            estimate used, scaled, coarse or fresh
+        '''
+        if (self.budget_fallback == "scaled") and (
+                self.budget_reference is not None):
+            return self.scaled_comps(comp_list, steps), "scaled"
+        if self.coarse_future is None:
+            return self.deplete_core(assemblies, comp_list, 1,
+                                     steps * self.context.dt), "coarse"
+        from concurrent.futures import wait
+        from openmcyclus.depletion import split_batches
+
+        done, _ = wait([self.coarse_future], self.transmute_budget)
+        if not done:
+            self.record("COARSE_TIMEOUT", str(self.transmute_budget))
+            warnings.warn("The coarse estimate of " + str(self.prototype) +
+                          " was not done within " +
+                          str(self.transmute_budget) + " s")
+            if self.budget_reference is not None:
+                return self.scaled_comps(comp_list, steps), "scaled"
+            return comp_list, "fresh"
+        spent_comps = self.coarse_future.result()
+        self.coarse_future = None
+        if self.coarse_groups is not None:
+            spent_comps = split_batches(
+                spent_comps, [assembly.quantity for assembly in assemblies],
+                self.coarse_groups)
+        return spent_comps, "coarse"
+
+    def scaled_comps(self, comp_list, steps):
+        '''
+        Get the "scaled" estimate of the spent compositions, from the
+        change of the compositions in the last cycle that was depleted
+
+        Parameters:
+        -----------
+        comp_list: list of dicts
+            compositions of the assemblies
+        steps: int
+            number of time steps to deplete for
+
+        Returns:
+        --------
+        spent_comps: list of dicts
+            spent compositions, in the same order as comp_list
+        '''
+        from openmcyclus.equilibrium import scale_depletion
+
+        fresh_comps, spent_comps, burnup = self.budget_reference
+        scale = steps * self.burnup_step() / burnup if burnup > 0 else 1.0
+        return scale_depletion(comp_list, fresh_comps, spent_comps, scale)
+
+    def record_budget(self, source, deadline):
+        '''
+        Record a depletion run with a time budget to the
+        TransmuteBudget table: the budget and the wall time until the
+        spent compositions were found (s), and how they were found.
+        '''
+        wall_time = time.perf_counter() - deadline + self.transmute_budget
+        datum = self.context.new_datum("TransmuteBudget")
+        datum.add_val("AgentId", self.id, None, 'int')
+        datum.add_val("Time", self.context.time, None, 'int')
+        datum.add_val("Budget", self.transmute_budget, None, 'double')
+        datum.add_val("WallTime", wall_time, None, 'double')
+        datum.add_val("Source", source, None, 'std::string')
+        datum.record()
+
+    def cancel_depletion(self):
+        '''
+        Cancel the depletion started by ``submit_depletion``, and
+        remove its shared memory. If a depletion with a time budget or
+        its coarse estimate is still running, the processes of its pool
+        are stopped, and a new pool is started for the next one.
+        '''
+        futures = [future for future in [self.depletion_future,
+                                         self.coarse_future]
+                   if future is not None]
+        for future in futures:
+            future.cancel()
+        self.depletion_future = None
+        self.coarse_future = None
+        if (self.depletion_executor is not None) and any(
+                not future.done() for future in futures):
+            from openmcyclus.depletion import kill_executor
+
+            kill_executor(self.depletion_executor)
+            self.depletion_executor = None
+        if self.depletion_buffer is not None:
+            self.depletion_buffer.unlink()
+            self.depletion_buffer = None
+
+    def collect_depletion(self, assemblies, steps):
+        '''
+        Get the result of the depletion started by
+        ``submit_depletion``, waiting for it to finish if needed.
+
+        Parameters:
+        -----------
+        assemblies: list of Materials
+            assemblies in the core
+        steps: int
+            number of time steps to deplete for
+
+        Returns:
+        --------
+        spent_comps: list of dicts
+            spent compositions, in the same order as assemblies. None
+            if no depletion was started or if it was started for
+            different assemblies or a different number of steps.
+        '''
+        if self.depletion_future is None:
+            return None
+        if ([assembly.obj_id for assembly in assemblies] !=
+                self.depletion_ids) or (steps != self.cycle_time):
+            self.cancel_depletion()
+            return None
+        from openmcyclus.checkpoint import array_to_comps
+        from openmcyclus.depletion import chain_nuclides, split_batches
+
+        try:
+            n_comps = self.depletion_future.result()
+            spent_comps = array_to_comps(
+                chain_nuclides(self.model_path + self.chain_file),
+                self.depletion_buffer.masses[1, :n_comps])
+        finally:
+            self.depletion_future = None
+            self.cancel_depletion()
+        if self.depletion_groups is None:
+            return spent_comps
+        return split_batches(
+            spent_comps, [assembly.quantity for assembly in assemblies],
+            self.depletion_groups)
+
+    def decay_spent_fuel(self, materials=None):
+        '''
+        Decay spent fuel assemblies from the time they were discharged,
+        or last decayed, to the current time. The decay-only matrix of
+        the depletion chain and its exponential for a time step are
+        calculated once per process. Assemblies that have been stored
+        for the same number of time steps are decayed together.
+
+        Parameters:
+        -----------
+        materials: list of Materials
+            spent fuel assemblies to decay. Defaults to all of the
+            assemblies in the spent fuel inventory.
+        '''
+        from openmcyclus.decay import get_decay_operator
+
+        if materials is None:
+            materials = self.spent_fuel.pop_n(self.spent_fuel.count)
+            self.spent_fuel.push_many(materials)
+        groups = defaultdict(list)
+        for material in materials:
+            steps = self.context.time - self.decay_times.get(
+                material.obj_id, self.context.time)
+            if steps > 0:
+                groups[steps].append(material)
+        if len(groups) == 0:
+            return
+        operator = get_decay_operator(
+            str(self.model_path + self.chain_file), self.context.dt)
+        for steps, group in groups.items():
+            comps = operator.decay([material.comp() for material in group],
+                                   steps)
+            for material, comp in zip(group, comps):
+                material.transmute(comp)
+                self.decay_times[material.obj_id] = self.context.time
+
+    def checkpoint_file(self):
+        '''
+        Get the name of the checkpoint file for this reactor
+
+        Returns:
+        --------
+        str: name of the checkpoint file
+        '''
+        path = self.checkpoint_path or self.model_path
+        return os.path.join(path, "checkpoint_" + str(self.prototype) +
+                            "_" + str(self.id) + ".npz")
+
+    def save_checkpoint(self):
+        '''
+        Write the depletion state that is not held by Cyclus to the
+        checkpoint file: the cycle step, the assembly load times and
+        spent fuel decay times, the fresh and spent composition history,
+        the core compositions depleted during the cycle and, if they
+        have been loaded, the OpenMC materials and cross sections.
+        Everything is written as NumPy arrays. The depletion chain is
+        not written, only a hash of the chain file to check it on
+        restart.
+        '''
+        import numpy as np
+        from openmcyclus import checkpoint
+
+        arrays = {"time": np.array(self.context.time),
+                  "cycle_step": np.array(self.cycle_step),
+                  "decay_ids": np.array(list(self.decay_times.keys()),
+                                        dtype=np.int64),
+                  "decay_times": np.array(list(self.decay_times.values()),
+                                          dtype=np.int64),
+                  "load_ids": np.array(list(self.load_times.keys()),
+                                       dtype=np.int64),
+                  "load_times": np.array(list(self.load_times.values()),
+                                         dtype=np.int64),
+                  "burnup_ids": np.array(list(self.burnups.keys()),
+                                         dtype=np.int64),
+                  "burnups": np.array(list(self.burnups.values()),
+                                      dtype=float),
+                  "core_ids": np.array(list(self.core_comps.keys()),
+                                       dtype=np.int64),
+                  "incremental_steps": np.array(self.incremental_steps),
+                  "incremental_active": np.array(self.incremental_active)}
+        arrays["core_nuclides"], arrays["core_masses"] = \
+            checkpoint.comps_to_array(list(self.core_comps.values()))
+        arrays["fresh_nuclides"], arrays["fresh_masses"] = \
+            checkpoint.comps_to_array(self.fresh_comps)
+        arrays["spent_nuclides"], arrays["spent_masses"] = \
+            checkpoint.comps_to_array(self.spent_comps)
+        if self.materials is not None:
+            if self.chain_hash is None:
+                self.chain_hash = checkpoint.file_hash(
+                    self.model_path + self.chain_file)
+            arrays["chain_hash"] = np.array(self.chain_hash)
+            arrays.update(checkpoint.materials_to_arrays(self.materials))
+            arrays.update(checkpoint.micro_xs_to_arrays(self.micro_xs))
+        checkpoint.save(self.checkpoint_file(), arrays)
+
+    def restore_checkpoint(self):
+        '''
+        Read the depletion state from the checkpoint file, if it
+        exists. The materials and cross sections are created from the
+        stored arrays, so the model files are not read again.
+
+        The checkpoint should be written at the time step before
+        the one the simulation restarts from, otherwise the cycle
+        step is out of date and a warning is given.
+
+        Returns:
+        --------
+        Bool: True if the state was restored, False if there is no
+            checkpoint file
+        '''
+        from openmcyclus import checkpoint
+        from openmcyclus.depletion import Depletion
+
+        filename = self.checkpoint_file()
+        if not os.path.isfile(filename):
+            return False
+        arrays = checkpoint.load(filename)
+        if int(arrays["time"]) + 1 != self.context.time:
+            warnings.warn(
+                "Checkpoint " + filename + " was written at time " +
+                str(int(arrays["time"])) + ", restarting at time " +
+                str(self.context.time))
+        self.cycle_step = int(arrays["cycle_step"])
+        self.decay_times = dict(zip(arrays["decay_ids"].tolist(),
+                                    arrays["decay_times"].tolist()))
+        if "load_ids" in arrays:
+            self.load_times = dict(zip(arrays["load_ids"].tolist(),
+                                       arrays["load_times"].tolist()))
+        if "burnup_ids" in arrays:
+            self.burnups = dict(zip(arrays["burnup_ids"].tolist(),
+                                    arrays["burnups"].tolist()))
+        if "core_ids" in arrays:
+            self.core_comps = dict(zip(
+                arrays["core_ids"].tolist(),
+                checkpoint.array_to_comps(arrays["core_nuclides"],
+                                          arrays["core_masses"])))
+            self.incremental_steps = int(arrays["incremental_steps"])
+            self.incremental_active = bool(arrays["incremental_active"])
+        self.fresh_comps = checkpoint.array_to_comps(
+            arrays["fresh_nuclides"], arrays["fresh_masses"])
+        self.spent_comps = checkpoint.array_to_comps(
+            arrays["spent_nuclides"], arrays["spent_masses"])
+        if "chain_hash" in arrays:
+            self.chain_hash = checkpoint.file_hash(
+                self.model_path + self.chain_file)
+            if self.chain_hash != str(arrays["chain_hash"]):
+                raise ValueError(
+                    "Depletion chain " + self.model_path + self.chain_file +
+                    " has changed since checkpoint " + filename)
+            self.deplete = Depletion(self.chain_file,
+                                     self.cycle_time, self.thermal_power,
+                                     self.model_path,
+                                     self.depletion_processes,
+                                     self.blas_threads)
+            self.materials = checkpoint.arrays_to_materials(arrays)
+            self.micro_xs = checkpoint.arrays_to_micro_xs(arrays)
+        return True
+
     def record(self, event, val):
         '''
         Record a reactor event to the output database with the
@@ -668,8 +2147,43 @@ class DepleteReactor(Facility):
         datum = self.context.new_datum("ReactorEvents")
         datum.add_val("AgentId", self.id, None, 'int')
         datum.add_val("Time", self.context.time, None, 'int')
+        datum.add_val("Event", event, None, 'std::string')
+        datum.add_val("Value", val, None, 'std::string')
+        datum.record()
         return
 
+    def record_memory(self):
+        '''
+        Record the memory use of the process to the ReactorMemory
+        table: the resident set size, the memory traced by tracemalloc
+        and its peak (MB), and the number of compositions in the
+        history of this reactor. The largest allocation sites are
+        recorded to the ReactorAllocations table. The process is only
+        sampled once per time step, so reactors sampled at the same
+        time step record the same process values.
+        '''
+        from openmcyclus.memory import sample
+
+        memory = sample(self.context.time, self.memory_top)
+        datum = self.context.new_datum("ReactorMemory")
+        datum.add_val("AgentId", self.id, None, 'int')
+        datum.add_val("Time", self.context.time, None, 'int')
+        datum.add_val("RSS", memory["rss"], None, 'double')
+        datum.add_val("Traced", memory["traced"], None, 'double')
+        datum.add_val("PeakTraced", memory["peak"], None, 'double')
+        datum.add_val("HistorySize", len(self.fresh_comps) +
+                      len(self.spent_comps), None, 'int')
+        datum.record()
+        for rank, (location, size, count) in enumerate(memory["top"]):
+            datum = self.context.new_datum("ReactorAllocations")
+            datum.add_val("AgentId", self.id, None, 'int')
+            datum.add_val("Time", self.context.time, None, 'int')
+            datum.add_val("Rank", rank, None, 'int')
+            datum.add_val("Location", location, None, 'std::string')
+            datum.add_val("Size", size, None, 'double')
+            datum.add_val("Count", count, None, 'int')
+            datum.record()
+
     def index_res(self, material, incommod):
         '''
         For the name of any item in the fuel in_commods list
@@ -0,0 +1,377 @@
+import sqlite3
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+
+REACTOR_SPEC = ":openmcyclus.DepleteReactor:DepleteReactor"
+CHUNKSIZE = 1000000
+
+
+@contextmanager
+def connect(db):
+    '''
+    Open a Cyclus sqlite output database, or use an open connection
+
+    Parameters:
+    -----------
+    db: str or sqlite3.Connection
+        name of the output database or a connection to it. A
+        connection that is passed in is not closed.
+
+    Yields:
+    -------
+    sqlite3.Connection
+    '''
+    if isinstance(db, sqlite3.Connection):
+        yield db
+        return
+    conn = sqlite3.connect(db)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _in_clause(column, values):
+    '''
+    Create a SQL condition that a column is in a list of values
+
+    Parameters:
+    -----------
+    column: str
+        column name
+    values: list
+        values to match
+
+    Returns:
+    --------
+    clause: str
+        SQL condition with one placeholder for each value
+    params: list
+        values for the placeholders
+    '''
+    values = list(values)
+    return (column + " IN (" + ", ".join(["?"] * len(values)) + ")",
+            values)
+
+
+def read_sql(db, query, params=(), chunksize=CHUNKSIZE, reduce=None):
+    '''
+    Read the result of a query in chunks, so that large output
+    databases are not loaded into memory at once. If reduce is given,
+    it is applied to each chunk and the reduced chunks are combined.
+
+    Parameters:
+    -----------
+    db: str or sqlite3.Connection
+        output database
+    query: str
+        SQL query
+    params: sequence
+        values for the placeholders in the query
+    chunksize: int
+        number of rows in each chunk
+    reduce: function
+        function that takes a DataFrame and returns a smaller
+        DataFrame, e.g. a groupby sum. It is applied again to the
+        combined chunks, so it must be associative.
+
+    Returns:
+    --------
+    pandas.DataFrame
+    '''
+    with connect(db) as conn:
+        chunks = pd.read_sql_query(query, conn, params=list(params),
+                                   chunksize=chunksize)
+        frames = [chunk if reduce is None else reduce(chunk)
+                  for chunk in chunks]
+    if len(frames) == 0:
+        return pd.DataFrame()
+    frame = pd.concat(frames, ignore_index=True)
+    if (reduce is not None) and (len(frames) > 1):
+        frame = reduce(frame)
+    return frame
+
+
+def reactors(db, spec=REACTOR_SPEC):
+    '''
+    Get the entry and exit times of the reactor agents
+
+    Parameters:
+    -----------
+    db: str or sqlite3.Connection
+        output database
+    spec: str
+        archetype spec of the reactors
+
+    Returns:
+    --------
+    pandas.DataFrame
+        columns SimId, AgentId, Prototype, EnterTime, Lifetime and
+        ExitTime. ExitTime is -1 for agents that did not exit.
+    '''
+    with connect(db) as conn:
+        has_exit = conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' "
+            "AND name = 'AgentExit'").fetchone()[0]
+    if has_exit:
+        query = ("SELECT e.SimId, e.AgentId, e.Prototype, e.EnterTime, "
+                 "e.Lifetime, COALESCE(x.ExitTime, -1) AS ExitTime "
+                 "FROM AgentEntry e LEFT JOIN AgentExit x "
+                 "ON e.SimId = x.SimId AND e.AgentId = x.AgentId "
+                 "WHERE e.Spec = ?")
+    else:
+        query = ("SELECT SimId, AgentId, Prototype, EnterTime, Lifetime, "
+                 "-1 AS ExitTime FROM AgentEntry WHERE Spec = ?")
+    return read_sql(db, query, (spec,))
+
+
+def find_ids(value, values, ids):
+    '''
+    Find the ids of the rows in which a column is equal to a value
+
+    Parameters:
+    -----------
+    value: scalar or numpy.ndarray
+        value to find. An array is compared to each row of a 2D
+        values array.
+    values: array_like
+        column to search
+    ids: array_like
+        id of each row
+
+    Returns:
+    --------
+    numpy.ndarray
+        ids of the matching rows
+    '''
+    values = np.asarray(values)
+    ids = np.asarray(ids)
+    if isinstance(value, np.ndarray) and (values.ndim == 2):
+        mask = (values == value).all(axis=1)
+    else:
+        mask = values == value
+    return ids[mask]
+
+
+def exit_times(agent_id, agent_ids, times):
+    '''
+    Find the exit times of an agent
+
+    Parameters:
+    -----------
+    agent_id: int
+        id of the agent
+    agent_ids: array_like
+        AgentId column of the exit table
+    times: array_like
+        ExitTime column of the exit table
+
+    Returns:
+    --------
+    numpy.ndarray
+        exit times of the agent
+    '''
+    return find_ids(agent_id, agent_ids, times)
+
+
+def discharged_masses(db, agent_ids=None, nuclides=None,
+                      chunksize=CHUNKSIZE):
+    '''
+    Get the mass of each nuclide in the materials sent by the
+    reactors, for each reactor and time step.
+
+    The transactions of the reactors and their resources are read
+    first, and the quantities are summed for each composition. Only
+    the compositions of those resources are then read from the
+    Compositions table, in chunks, and the nuclide masses are summed
+    for each chunk. The tables are joined with pandas, because Cyclus
+    output databases do not have indices for a join in SQL.
+
+    Parameters:
+    -----------
+    db: str or sqlite3.Connection
+        output database
+    agent_ids: list of ints
+        ids of the reactors. Defaults to all DepleteReactor agents.
+    nuclides: list of ints
+        nuclide ids to include. Defaults to all nuclides.
+    chunksize: int
+        number of rows of the Compositions table read at once
+
+    Returns:
+    --------
+    pandas.DataFrame
+        columns SimId, AgentId, Time, Commodity, NucId and Mass (kg)
+    '''
+    if agent_ids is None:
+        agent_ids = reactors(db)["AgentId"].tolist()
+    columns = ["SimId", "AgentId", "Time", "Commodity", "NucId", "Mass"]
+    keys = columns[:-1]
+    clause, params = _in_clause("SenderId", agent_ids)
+    sent = read_sql(db, "SELECT SimId, SenderId AS AgentId, ResourceId, "
+                    "Time, Commodity FROM Transactions WHERE " + clause,
+                    params)
+    if len(sent) == 0:
+        return pd.DataFrame(columns=columns)
+    resource_ids = set(sent["ResourceId"])
+
+    def sent_resources(frame):
+        return frame[frame["ResourceId"].isin(resource_ids)]
+
+    resources = read_sql(db, "SELECT SimId, ResourceId, Quantity, QualId "
+                         "FROM Resources", chunksize=chunksize,
+                         reduce=sent_resources)
+    quantities = sent.merge(resources, on=["SimId", "ResourceId"])
+    # The nuclide masses are summed by an integer group index, which is
+    # much faster than grouping by the SimId and Commodity objects
+    groups = quantities.groupby(keys[:-1], sort=False)
+    quantities["Group"] = groups.ngroup()
+    labels = groups.size().reset_index()[keys[:-1]]
+    quantities = quantities.groupby(["SimId", "Group", "QualId"],
+                                    as_index=False)["Quantity"].sum()
+
+    # Most outputs have one simulation, then the SimId blobs of the
+    # Compositions table are not read
+    on = ["SimId", "QualId"]
+    if quantities["SimId"].nunique() == 1:
+        on = ["QualId"]
+        quantities = quantities.drop(columns="SimId")
+
+    def nuclide_masses(frame):
+        if "MassFrac" in frame:
+            frame = quantities.merge(frame, on=on)
+            frame["Mass"] = frame["Quantity"] * frame["MassFrac"]
+        return frame.groupby(["Group", "NucId"], as_index=False,
+                             sort=False)["Mass"].sum()
+
+    query = ("SELECT " + ", ".join(on) + ", NucId, MassFrac "
+             "FROM Compositions WHERE QualId IN "
+             "(SELECT QualId FROM temp._analysis_quals)")
+    params = []
+    if nuclides is not None:
+        nuc_clause, params = _in_clause("NucId", nuclides)
+        query += " AND " + nuc_clause
+    with connect(db) as conn:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS _analysis_quals "
+                     "(QualId INTEGER PRIMARY KEY)")
+        conn.execute("DELETE FROM temp._analysis_quals")
+        conn.executemany("INSERT OR IGNORE INTO temp._analysis_quals "
+                         "VALUES (?)",
+                         [(int(qual),) for qual in quantities["QualId"]])
+        try:
+            masses = read_sql(conn, query, params, chunksize, nuclide_masses)
+        finally:
+            conn.execute("DROP TABLE temp._analysis_quals")
+    if len(masses) == 0:
+        return pd.DataFrame(columns=columns)
+    masses = labels.iloc[masses["Group"]].reset_index(drop=True).assign(
+        NucId=masses["NucId"].values, Mass=masses["Mass"].values)
+    return masses[columns].sort_values(keys, ignore_index=True)
+
+
+def power_series(db, agent_ids=None, pivot=False):
+    '''
+    Get the power produced by the reactors at each time step
+
+    Parameters:
+    -----------
+    db: str or sqlite3.Connection
+        output database
+    agent_ids: list of ints
+        ids of the reactors. Defaults to all DepleteReactor agents.
+    pivot: bool
+        if True, return one column per reactor and one row per time
+        step, with 0 where no power was recorded
+
+    Returns:
+    --------
+    pandas.DataFrame
+        columns SimId, AgentId, Time and Value (MWe), or the pivoted
+        table
+    '''
+    if agent_ids is None:
+        agent_ids = reactors(db)["AgentId"].tolist()
+    clause, params = _in_clause("AgentId", agent_ids)
+    power = read_sql(db, "SELECT SimId, AgentId, Time, Value FROM "
+                     "TimeSeriesPower WHERE " + clause +
+                     " ORDER BY SimId, AgentId, Time", params)
+    if pivot:
+        return power.pivot_table(index="Time", columns="AgentId",
+                                 values="Value", aggfunc="sum",
+                                 fill_value=0)
+    return power
+
+
+def cycle_events(db, agent_ids=None, events=None):
+    '''
+    Get the events recorded by the reactors in the ReactorEvents
+    table, such as CYCLE_START, CYCLE_END, LOAD, DISCHARGE and
+    TRANSMUTE.
+
+    Parameters:
+    -----------
+    db: str or sqlite3.Connection
+        output database
+    agent_ids: list of ints
+        ids of the reactors. Defaults to all reactors.
+    events: list of strs
+        events to include. Defaults to all events.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        columns SimId, AgentId, Time, Event and Value
+    '''
+    query = "SELECT SimId, AgentId, Time, Event, Value FROM ReactorEvents"
+    clauses = []
+    params = []
+    if agent_ids is not None:
+        clause, values = _in_clause("AgentId", agent_ids)
+        clauses.append(clause)
+        params += values
+    if events is not None:
+        clause, values = _in_clause("Event", events)
+        clauses.append(clause)
+        params += values
+    if len(clauses) > 0:
+        query += " WHERE " + " AND ".join(clauses)
+    return read_sql(db, query + " ORDER BY SimId, AgentId, Time", params)
+
+
+def cycle_lengths(db, agent_ids=None):
+    '''
+    Get the start, end and length of each cycle of the reactors,
+    by pairing each CYCLE_START event with the next CYCLE_END event
+    of the same reactor
+
+    Parameters:
+    -----------
+    db: str or sqlite3.Connection
+        output database
+    agent_ids: list of ints
+        ids of the reactors. Defaults to all reactors.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        columns SimId, AgentId, Start, End and Length. Cycles that
+        did not end have an End and Length of -1.
+    '''
+    events = cycle_events(db, agent_ids, ["CYCLE_START", "CYCLE_END"])
+    starts = events[events["Event"] == "CYCLE_START"]
+    ends = events[events["Event"] == "CYCLE_END"]
+    starts = starts.assign(Cycle=starts.groupby(
+        ["SimId", "AgentId"]).cumcount())
+    ends = ends.assign(Cycle=ends.groupby(["SimId", "AgentId"]).cumcount())
+    cycles = starts.merge(ends, on=["SimId", "AgentId", "Cycle"],
+                          how="left", suffixes=("_start", "_end"))
+    cycles = pd.DataFrame({
+        "SimId": cycles["SimId"],
+        "AgentId": cycles["AgentId"],
+        "Start": cycles["Time_start"],
+        "End": cycles["Time_end"].fillna(-1).astype(int)})
+    cycles["Length"] = np.where(cycles["End"] >= 0,
+                                cycles["End"] - cycles["Start"], -1)
+    return cycles
@@ -0,0 +1,241 @@
+import hashlib
+import os
+import numpy as np
+
+
+def comps_to_array(comps):
+    '''
+    Convert a list of compositions to a mass array indexed by nuclide
+
+    Parameters:
+    -----------
+    comps: list of dicts
+        compositions, keys are nuclide ids (int) and values are masses
+
+    Returns:
+    --------
+    nuclides: numpy.ndarray of ints
+        sorted nuclide ids present in any of the compositions
+    masses: numpy.ndarray
+        array of shape (len(comps), len(nuclides)) with the mass of
+        each nuclide in each composition
+    '''
+    nuclides = np.array(sorted({nuc for comp in comps for nuc in comp}),
+                        dtype=np.int64)
+    index = {nuc: ii for ii, nuc in enumerate(nuclides)}
+    masses = np.zeros((len(comps), len(nuclides)))
+    for row, comp in enumerate(comps):
+        for nuc, mass in comp.items():
+            masses[row, index[nuc]] = mass
+    return nuclides, masses
+
+
+def array_to_comps(nuclides, masses):
+    '''
+    Convert a mass array indexed by nuclide to a list of compositions.
+    Nuclides with zero mass are left out of the compositions.
+
+    Parameters:
+    -----------
+    nuclides: numpy.ndarray of ints
+        nuclide ids for the columns of masses
+    masses: numpy.ndarray
+        array of shape (number of compositions, len(nuclides))
+
+    Returns:
+    --------
+    comps: list of dicts
+        compositions, keys are nuclide ids (int) and values are masses
+    '''
+    comps = []
+    for row in masses:
+        nonzero = np.flatnonzero(row)
+        comps.append({int(nuclides[ii]): float(row[ii]) for ii in nonzero})
+    return comps
+
+
+def materials_to_arrays(materials):
+    '''
+    Convert OpenMC materials to arrays. Only the information used for
+    depletion is kept: ids, names, temperature, volume, density and
+    nuclides.
+
+    Parameters:
+    -----------
+    materials: openmc.Materials
+        materials to convert
+
+    Returns:
+    --------
+    arrays: dict of numpy.ndarrays
+        materials data, with keys starting with ``mat_`` for the
+        material data and ``nuc_`` for the nuclide data
+    '''
+    arrays = {
+        "mat_id": np.array([mat.id for mat in materials], dtype=np.int64),
+        "mat_name": np.array([mat.name or "" for mat in materials],
+                             dtype=str),
+        "mat_temperature": np.array(
+            [np.nan if mat.temperature is None else mat.temperature
+             for mat in materials], dtype=float),
+        "mat_volume": np.array(
+            [np.nan if mat.volume is None else mat.volume
+             for mat in materials], dtype=float),
+        "mat_depletable": np.array([mat.depletable for mat in materials],
+                                   dtype=bool),
+        "mat_density": np.array(
+            [np.nan if mat.density is None else mat.density
+             for mat in materials], dtype=float),
+        "mat_density_units": np.array([mat.density_units
+                                       for mat in materials], dtype=str),
+    }
+    rows = [(index, nuc.name, nuc.percent, nuc.percent_type)
+            for index, mat in enumerate(materials) for nuc in mat.nuclides]
+    arrays["nuc_material"] = np.array([row[0] for row in rows],
+                                      dtype=np.int64)
+    arrays["nuc_name"] = np.array([row[1] for row in rows], dtype=str)
+    arrays["nuc_percent"] = np.array([row[2] for row in rows], dtype=float)
+    arrays["nuc_percent_type"] = np.array([row[3] for row in rows],
+                                          dtype=str)
+    return arrays
+
+
+def arrays_to_materials(arrays):
+    '''
+    Create OpenMC materials from the arrays written by
+    ``materials_to_arrays``
+
+    Parameters:
+    -----------
+    arrays: dict of numpy.ndarrays
+        materials data
+
+    Returns:
+    --------
+    materials: openmc.Materials
+        materials created from the arrays
+    '''
+    import openmc
+
+    materials = openmc.Materials()
+    for index, mat_id in enumerate(arrays["mat_id"]):
+        temperature = arrays["mat_temperature"][index]
+        if np.isnan(temperature):
+            temperature = None
+        material = openmc.Material(material_id=int(mat_id),
+                                   name=str(arrays["mat_name"][index]),
+                                   temperature=temperature)
+        volume = arrays["mat_volume"][index]
+        if not np.isnan(volume):
+            material.volume = float(volume)
+        material.depletable = bool(arrays["mat_depletable"][index])
+        density = arrays["mat_density"][index]
+        units = str(arrays["mat_density_units"][index])
+        if units:
+            material.set_density(
+                units, None if np.isnan(density) else float(density))
+        for row in np.flatnonzero(arrays["nuc_material"] == index):
+            material.add_nuclide(str(arrays["nuc_name"][row]),
+                                 float(arrays["nuc_percent"][row]),
+                                 str(arrays["nuc_percent_type"][row]))
+        materials.append(material)
+    return materials
+
+
+def micro_xs_to_arrays(micro_xs):
+    '''
+    Convert microscopic cross sections to arrays
+
+    Parameters:
+    -----------
+    micro_xs: openmc.deplete.MicroXS
+        cross sections to convert
+
+    Returns:
+    --------
+    arrays: dict of numpy.ndarrays
+        cross section data, nuclide names and reaction names
+    '''
+    return {"xs_data": np.asarray(micro_xs.data, dtype=float),
+            "xs_nuclides": np.array(micro_xs.nuclides, dtype=str),
+            "xs_reactions": np.array(micro_xs.reactions, dtype=str)}
+
+
+def arrays_to_micro_xs(arrays):
+    '''
+    Create microscopic cross sections from the arrays written by
+    ``micro_xs_to_arrays``
+
+    Parameters:
+    -----------
+    arrays: dict of numpy.ndarrays
+        cross section data
+
+    Returns:
+    --------
+    openmc.deplete.MicroXS
+    '''
+    import openmc.deplete as od
+
+    return od.MicroXS(arrays["xs_data"],
+                      [str(nuc) for nuc in arrays["xs_nuclides"]],
+                      [str(rx) for rx in arrays["xs_reactions"]])
+
+
+def file_hash(filename):
+    '''
+    Get the SHA-1 hash of the contents of a file
+
+    Parameters:
+    -----------
+    filename: str
+        name of the file
+
+    Returns:
+    --------
+    str: hexadecimal digest of the file contents
+    '''
+    sha = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def save(filename, arrays):
+    '''
+    Write arrays to a compressed npz file. The file is written
+    under a temporary name and then moved, so an existing checkpoint
+    is never left partially written.
+
+    Parameters:
+    -----------
+    filename: str
+        name of the checkpoint file
+    arrays: dict of numpy.ndarrays
+        data to write
+    '''
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_file = filename + ".tmp.npz"
+    np.savez_compressed(tmp_file, **arrays)
+    os.replace(tmp_file, filename)
+
+
+def load(filename):
+    '''
+    Read arrays from a checkpoint file
+
+    Parameters:
+    -----------
+    filename: str
+        name of the checkpoint file
+
+    Returns:
+    --------
+    arrays: dict of numpy.ndarrays
+        data in the file
+    '''
+    with np.load(filename, allow_pickle=False) as data:
+        return {key: data[key] for key in data.files}
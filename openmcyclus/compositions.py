@@ -0,0 +1,305 @@
+import numpy as np
+
+
+def truncate(comp, max_nuclides=0, cutoff=0.0):
+    '''
+    Remove the nuclides with the smallest masses from a composition,
+    and scale the remaining nuclides so the total mass is not changed.
+
+    Parameters:
+    -----------
+    comp: dict
+        composition, keys are nuclide ids and values are masses
+    max_nuclides: int
+        maximum number of nuclides to keep. Not used if 0.
+    cutoff: float
+        largest fraction of the total mass that can be removed. The
+        smallest nuclides are removed first. Not used if 0.
+
+    Returns:
+    --------
+    dict: truncated composition. The original composition is
+        returned if no nuclides are removed.
+    '''
+    if (max_nuclides <= 0) and (cutoff <= 0):
+        return comp
+    nuclides = sorted(comp, key=lambda nuc: (comp[nuc], nuc), reverse=True)
+    if max_nuclides > 0:
+        nuclides = nuclides[:max_nuclides]
+    total = sum(comp.values())
+    if (cutoff > 0) and (total > 0):
+        removed = total - sum(comp[nuc] for nuc in nuclides)
+        while (len(nuclides) > 1) and (
+                removed + comp[nuclides[-1]] <= cutoff * total):
+            removed += comp[nuclides.pop()]
+    if len(nuclides) == len(comp):
+        return comp
+    kept = sum(comp[nuc] for nuc in nuclides)
+    if kept <= 0:
+        return {nuc: comp[nuc] for nuc in nuclides}
+    scale = total / kept
+    return {nuc: comp[nuc] * scale for nuc in nuclides}
+
+
+def recipe_nuclide_id(nuclide):
+    '''
+    Convert a nuclide from a Cyclus recipe to the id used in material
+    compositions
+
+    Parameters:
+    -----------
+    nuclide: str
+        nuclide name (e.g. U235), or id in the zzaaa or zzaaammmm form
+
+    Returns:
+    --------
+    int: nuclide id in the zzaaammmm form
+    '''
+    nuclide = nuclide.strip()
+    if nuclide.isdigit():
+        nuclide = int(nuclide)
+        return nuclide * 10000 if nuclide < 1000000 else nuclide
+    import openmc.data
+
+    z, a, m = openmc.data.zam(nuclide)
+    return (z * 1000 + a) * 10000 + m
+
+
+def atomic_mass(nuclide):
+    '''
+    Get the atomic mass of a nuclide (g/mol), or its mass number if
+    the mass is not tabulated
+
+    Parameters:
+    -----------
+    nuclide: int
+        nuclide id in the zzaaammmm form
+
+    Returns:
+    --------
+    float: atomic mass
+    '''
+    import openmc.data
+
+    z, a, m = nuclide // 10000000, (nuclide // 10000) % 1000, nuclide % 10000
+    try:
+        return openmc.data.atomic_mass(openmc.data.gnds_name(z, a, m))
+    except KeyError:
+        return float(a)
+
+
+def recipe_comp(recipe):
+    '''
+    Read the composition of a recipe in a Cyclus input as mass
+    fractions. Recipes with an atom basis are converted with the
+    atomic masses of the nuclides.
+
+    Parameters:
+    -----------
+    recipe: xml.etree.ElementTree.Element
+        recipe element, with basis and nuclide children
+
+    Returns:
+    --------
+    dict: mass fraction of each nuclide, with a total of 1
+
+    Raises:
+    -------
+    ValueError
+        if the basis is not mass or atom
+    '''
+    basis = recipe.findtext("basis", "mass").strip()
+    if basis not in ("mass", "atom"):
+        raise ValueError("Recipe " + str(recipe.findtext("name")) +
+                         " has basis " + basis + ", not mass or atom")
+    comp = {}
+    for nuclide in recipe.findall("nuclide"):
+        nuc = recipe_nuclide_id(nuclide.findtext("id"))
+        comp[nuc] = comp.get(nuc, 0.0) + float(nuclide.findtext("comp"))
+    if basis == "atom":
+        comp = {nuc: frac * atomic_mass(nuc) for nuc, frac in comp.items()}
+    total = sum(comp.values())
+    return {nuc: frac / total for nuc, frac in comp.items()}
+
+
+class RecipeRegistry(object):
+    def __init__(self, context):
+        '''
+        Add recipes to the Cyclus context only when their composition
+        changes. Each call to ``context.add_recipe`` records a new
+        composition in the output database, even if it is the same as
+        the last one added with that name.
+
+        Parameters:
+        -----------
+        context: cyclus context
+            context of the agent that adds the recipes
+
+        Attributes:
+        -----------
+        recipes: dict
+            last composition added for each recipe name
+        added: int
+            number of recipes added to the context
+        skipped: int
+            number of recipes that were not added because they had
+            not changed
+        '''
+        self.context = context
+        self.recipes = {}
+        self.added = 0
+        self.skipped = 0
+
+    def add(self, name, comp, basis='mass'):
+        '''
+        Add a recipe, if its composition is different from the last
+        composition added with the same name
+
+        Parameters:
+        -----------
+        name: str
+            recipe name
+        comp: dict
+            composition, keys are nuclide ids and values are
+            mass or atom fractions
+        basis: str
+            'mass' or 'atom'
+
+        Returns:
+        --------
+        Bool: True if the recipe was added to the context
+        '''
+        key = (basis, tuple(sorted(comp.items())))
+        if self.recipes.get(name) == key:
+            self.skipped += 1
+            return False
+        self.context.add_recipe(name, comp, basis)
+        self.recipes[name] = key
+        self.added += 1
+        return True
+
+
+class CoreMirror(object):
+    def __init__(self):
+        '''
+        Compositions of the assemblies in a reactor core, kept in a
+        mass array indexed by nuclide next to the Cyclus buffer. The
+        assemblies are added and removed with the buffer, so the core
+        compositions are read without popping the buffer and without
+        getting the composition of each material from Cyclus.
+
+        Attributes:
+        -----------
+        materials: list of Materials
+            assemblies in the core, in the order they were added
+        nuclides: numpy.ndarray of ints
+            sorted nuclide ids for the columns of masses
+        masses: numpy.ndarray
+            array of shape (len(materials), len(nuclides)) with the
+            composition of each assembly
+        '''
+        self.materials = []
+        self.nuclides = np.zeros(0, dtype=np.int64)
+        self.masses = np.zeros((0, 0))
+
+    def __len__(self):
+        return len(self.materials)
+
+    def _columns(self, comps):
+        '''
+        Get the columns of the nuclides in each composition, adding
+        columns for nuclides that are not in the array yet
+        '''
+        keys = [np.fromiter(comp.keys(), dtype=np.int64, count=len(comp))
+                for comp in comps]
+        new = np.setdiff1d(np.concatenate(keys + [self.nuclides]),
+                           self.nuclides)
+        if len(new) > 0:
+            nuclides = np.union1d(self.nuclides, new)
+            masses = np.zeros((len(self.masses), len(nuclides)))
+            masses[:, np.searchsorted(nuclides, self.nuclides)] = self.masses
+            self.nuclides, self.masses = nuclides, masses
+        return [np.searchsorted(self.nuclides, key) for key in keys]
+
+    def push(self, materials, comps=None):
+        '''
+        Add assemblies to the core
+
+        Parameters:
+        -----------
+        materials: list of Materials
+            assemblies to add
+        comps: list of dicts
+            composition of each assembly. Read from the materials if
+            not given.
+        '''
+        if comps is None:
+            comps = [material.comp() for material in materials]
+        columns = self._columns(comps)
+        rows = np.zeros((len(comps), len(self.nuclides)))
+        for row, column, comp in zip(rows, columns, comps):
+            row[column] = np.fromiter(comp.values(), dtype=np.float64,
+                                      count=len(comp))
+        self.materials.extend(materials)
+        self.masses = np.concatenate([self.masses, rows])
+
+    def remove(self, materials):
+        '''
+        Remove assemblies from the core
+
+        Parameters:
+        -----------
+        materials: list of Materials
+            assemblies to remove, matched by obj_id
+        '''
+        ids = {material.obj_id for material in materials}
+        keep = [ii for ii, material in enumerate(self.materials)
+                if material.obj_id not in ids]
+        self.materials = [self.materials[ii] for ii in keep]
+        self.masses = self.masses[keep]
+
+    def clear(self):
+        '''
+        Remove all assemblies
+        '''
+        self.materials = []
+        self.masses = np.zeros((0, len(self.nuclides)))
+
+    def comps(self):
+        '''
+        Get the composition of each assembly
+
+        Returns:
+        --------
+        comps: list of dicts
+            compositions in core order, without the nuclides with
+            zero mass
+        '''
+        comps = []
+        for row in self.masses:
+            nonzero = np.flatnonzero(row)
+            comps.append(dict(zip(self.nuclides[nonzero].tolist(),
+                                  row[nonzero].tolist())))
+        return comps
+
+    def update(self, comps):
+        '''
+        Replace the compositions of all assemblies, e.g. with their
+        spent compositions. The compositions are normalized to a total
+        of 1, as Cyclus does for material compositions.
+
+        Parameters:
+        -----------
+        comps: list of dicts
+            new composition of each assembly, in core order
+        '''
+        if len(comps) != len(self.materials):
+            raise ValueError(str(len(comps)) + " compositions given for " +
+                             str(len(self.materials)) + " assemblies")
+        columns = self._columns(comps)
+        self.masses[:] = 0.0
+        for row, column, comp in zip(self.masses, columns, comps):
+            row[column] = np.fromiter(comp.values(), dtype=np.float64,
+                                      count=len(comp))
+        totals = self.masses.sum(axis=1, keepdims=True)
+        np.divide(self.masses, totals, out=self.masses, where=totals > 0)
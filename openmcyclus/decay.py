@@ -0,0 +1,272 @@
+import math
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from functools import lru_cache
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import expm
+
+
+# Nuclides with a decay constant times the time step above this are
+# assumed to decay completely within a single time step
+FAST_DECAY = 50.0
+
+
+def read_decay_data(chain_file):
+    '''
+    Read the half lives and decay modes from an OpenMC depletion
+    chain file
+
+    Parameters:
+    -----------
+    chain_file: str
+        name of the depletion chain file
+
+    Returns:
+    --------
+    names: list of strs
+        names of the nuclides in the chain
+    half_lives: dict
+        half life (s) of each radioactive nuclide
+    decay_modes: dict
+        list of (decay type, target, branching ratio) for each nuclide
+    '''
+    root = ET.parse(chain_file).getroot()
+    names = []
+    half_lives = {}
+    decay_modes = {}
+    for nuclide in root.findall('nuclide'):
+        name = nuclide.get('name')
+        names.append(name)
+        if nuclide.get('half_life') is not None:
+            half_lives[name] = float(nuclide.get('half_life'))
+        decay_modes[name] = [(decay.get('type'), decay.get('target'),
+                              float(decay.get('branching_ratio')))
+                             for decay in nuclide.findall('decay')]
+    return names, half_lives, decay_modes
+
+
+def decay_matrix(chain_file, dt):
+    '''
+    Create the decay-only burnup matrix of a depletion chain, and its
+    exponential for a time step.
+
+    Nuclides that decay completely within the time step are removed
+    from the matrix, and anything that decays to them goes to their
+    daughters instead. This keeps the matrix small and not stiff.
+    As in OpenMC, a decay to the nuclide itself (spontaneous fission)
+    is not a loss, and alpha and proton decays also produce He4 and H1.
+
+    Parameters:
+    -----------
+    chain_file: str
+        name of the depletion chain file
+    dt: float
+        length of the time step (s)
+
+    Returns:
+    --------
+    names: list of strs
+        names of all nuclides in the chain
+    kept: list of strs
+        names of the nuclides that remain in the matrix
+    projection: scipy.sparse.csr_matrix
+        matrix of shape (len(kept), len(names)) that moves the short
+        lived nuclides to their daughters
+    exponential: scipy.sparse.csr_matrix
+        exponential of the decay matrix times dt, of shape
+        (len(kept), len(kept))
+    '''
+    names, half_lives, decay_modes = read_decay_data(chain_file)
+    in_chain = set(names)
+    decay_constants = {}
+    products = {}
+    for name in names:
+        daughters = defaultdict(float)
+        for decay_type, target, ratio in decay_modes[name]:
+            if target is not None:
+                daughters[target] += ratio
+            if 'He4' in in_chain:
+                daughters['He4'] += ratio * decay_type.count('alpha')
+            if 'H1' in in_chain:
+                daughters['H1'] += ratio * decay_type.split(',').count('p')
+        remain = daughters.pop(name, 0.0)
+        half_life = half_lives.get(name, 0.0)
+        if half_life > 0 and remain < 1:
+            decay_constants[name] = math.log(2) / half_life * (1 - remain)
+            products[name] = {target: ratio / (1 - remain)
+                              for target, ratio in daughters.items()}
+
+    fast = {name for name, decay in decay_constants.items()
+            if decay * dt > FAST_DECAY}
+    kept = [name for name in names if name not in fast]
+    index = {name: ii for ii, name in enumerate(kept)}
+
+    @lru_cache(maxsize=None)
+    def resolve(name):
+        if name not in fast:
+            return ((name, 1.0),)
+        out = defaultdict(float)
+        for target, ratio in products[name].items():
+            for daughter, fraction in resolve(target):
+                out[daughter] += ratio * fraction
+        return tuple(out.items())
+
+    rows, cols, vals = [], [], []
+    for col, name in enumerate(names):
+        for daughter, fraction in resolve(name):
+            rows.append(index[daughter])
+            cols.append(col)
+            vals.append(fraction)
+    projection = sp.csr_matrix((vals, (rows, cols)),
+                               shape=(len(kept), len(names)))
+
+    rows, cols, vals = [], [], []
+    for name in kept:
+        if name not in decay_constants:
+            continue
+        col = index[name]
+        rows.append(col)
+        cols.append(col)
+        vals.append(-decay_constants[name])
+        for target, ratio in products[name].items():
+            for daughter, fraction in resolve(target):
+                rows.append(index[daughter])
+                cols.append(col)
+                vals.append(decay_constants[name] * ratio * fraction)
+    matrix = sp.csc_matrix((vals, (rows, cols)),
+                           shape=(len(kept), len(kept)))
+    exponential = sp.csr_matrix(expm(matrix * dt))
+    exponential.data[np.abs(exponential.data) < 1e-30] = 0
+    exponential.eliminate_zeros()
+    return names, kept, projection, exponential
+
+
+class DecayOperator(object):
+    def __init__(self, chain_file, dt):
+        '''
+        Decay compositions without running a depletion, using the
+        exponential of the decay-only matrix of the depletion chain
+        for a Cyclus time step.
+
+        Parameters:
+        -----------
+        chain_file: str
+            name of the depletion chain file
+        dt: float
+            length of a time step (s)
+
+        Attributes:
+        -----------
+        nuclides: numpy.ndarray of ints
+            ids of the nuclides in the chain
+        kept: numpy.ndarray of ints
+            ids of the nuclides in the decay matrix
+        projection: scipy.sparse.csr_matrix
+            matrix that moves the short lived nuclides to their
+            daughters
+        exponential: scipy.sparse.csr_matrix
+            exponential of the decay matrix for one time step
+        '''
+        from openmc.data import zam
+
+        names, kept, self.projection, self.exponential = decay_matrix(
+            chain_file, dt)
+        self.nuclides = np.array([_zaid(*zam(name)) for name in names],
+                                 dtype=np.int64)
+        self.kept = np.array([_zaid(*zam(name)) for name in kept],
+                             dtype=np.int64)
+        self.index = {nuc: ii for ii, nuc in enumerate(self.nuclides)}
+        self.mass_numbers = (self.nuclides // 10000) % 1000
+        self.kept_mass_numbers = (self.kept // 10000) % 1000
+        self.powers = {1: self.exponential}
+
+    def matrix_power(self, steps):
+        '''
+        Get the exponential of the decay matrix for a number of
+        time steps. These are cached.
+
+        Parameters:
+        -----------
+        steps: int
+            number of time steps
+
+        Returns:
+        --------
+        scipy.sparse.csr_matrix
+        '''
+        if steps not in self.powers:
+            half = self.matrix_power(steps // 2)
+            power = half @ half
+            if steps % 2:
+                power = power @ self.exponential
+            self.powers[steps] = power
+        return self.powers[steps]
+
+    def decay(self, comps, steps):
+        '''
+        Decay compositions for a number of time steps. All
+        compositions are decayed with a single sparse matrix product.
+        Nuclides that are not in the chain are left unchanged.
+
+        Parameters:
+        -----------
+        comps: list of dicts
+            compositions, keys are nuclide ids and values are masses
+        steps: int
+            number of time steps
+
+        Returns:
+        --------
+        decayed: list of dicts
+            decayed compositions
+        '''
+        if steps <= 0 or len(comps) == 0:
+            return comps
+        atoms = np.zeros((len(self.nuclides), len(comps)))
+        others = []
+        for col, comp in enumerate(comps):
+            other = {}
+            for nuc, mass in comp.items():
+                if nuc in self.index:
+                    row = self.index[nuc]
+                    atoms[row, col] = mass / self.mass_numbers[row]
+                else:
+                    other[nuc] = mass
+            others.append(other)
+        decayed = self.matrix_power(steps) @ (self.projection @ atoms)
+        masses = np.clip(decayed, 0, None) * self.kept_mass_numbers[:, None]
+
+        comps = []
+        for col, other in enumerate(others):
+            nonzero = np.flatnonzero(masses[:, col])
+            comp = {int(self.kept[row]): float(masses[row, col])
+                    for row in nonzero}
+            comp.update(other)
+            comps.append(comp)
+        return comps
+
+
+def _zaid(Z, A, m):
+    return Z * int(1e7) + A * int(1e4) + m
+
+
+@lru_cache(maxsize=None)
+def get_decay_operator(chain_file, dt):
+    '''
+    Get the decay operator for a chain file and time step. Operators
+    are cached, so the matrix exponential is only calculated once per
+    process.
+
+    Parameters:
+    -----------
+    chain_file: str
+        name of the depletion chain file
+    dt: float
+        length of a time step (s)
+
+    Returns:
+    --------
+    DecayOperator
+    '''
+    return DecayOperator(chain_file, dt)
@@ -1,14 +1,537 @@
+import hashlib
 import numpy as np
 import openmc
 import openmc.deplete as od
 import xml.etree.ElementTree as ET
-import math
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from openmcyclus.pool import configure as configure_pool
+
+
+_executor = None
+_collapsed_xs = {}
+
+# Smallest mass (g) of a nuclide kept in the spent compositions
+MIN_SPENT_MASS = 1e-10
+
+
+@lru_cache(maxsize=None)
+def read_micro_xs(micro_xs_file):
+    '''
+    Read the one-group cross sections from a csv file. The data
+    is cached, so each file is only read once per process.
+
+    Parameters:
+    -----------
+    micro_xs_file: str
+        name of the csv file with the cross section data
+
+    Returns:
+    --------
+    openmc.deplete.MicroXS
+        microscopic cross section data. This object is shared and
+        must not be modified.
+    '''
+    return od.MicroXS.from_csv(micro_xs_file)
+
+
+@lru_cache(maxsize=None)
+def micro_xs_hash(micro_xs_file):
+    '''
+    Get the hash of a cross section file, cached per process
+
+    Parameters:
+    -----------
+    micro_xs_file: str
+        name of the csv file with the cross section data
+
+    Returns:
+    --------
+    str: hexadecimal digest of the file contents
+    '''
+    from openmcyclus.checkpoint import file_hash
+
+    return file_hash(micro_xs_file)
+
+
+def collapse_micro_xs(micro_xs, spectrum):
+    '''
+    Collapse multigroup cross sections to one group, weighted by a
+    flux spectrum. All nuclides and reactions are collapsed with one
+    tensor contraction over the energy groups.
+
+    Parameters:
+    -----------
+    micro_xs: openmc.deplete.MicroXS
+        cross sections with one value for each energy group
+    spectrum: array_like
+        flux in each energy group, in the same group order as
+        micro_xs
+
+    Returns:
+    --------
+    openmc.deplete.MicroXS
+        one-group cross sections
+    '''
+    spectrum = np.asarray(spectrum, dtype=float)
+    data = np.asarray(micro_xs.data, dtype=float)
+    if data.shape[-1] != len(spectrum):
+        raise ValueError("The cross sections have " + str(data.shape[-1]) +
+                         " groups and the spectrum has " +
+                         str(len(spectrum)))
+    if spectrum.sum() <= 0:
+        raise ValueError("The flux spectrum must have a positive total")
+    one_group = np.tensordot(data, spectrum / spectrum.sum(), axes=1)
+    return od.MicroXS(one_group[..., np.newaxis], list(micro_xs.nuclides),
+                      list(micro_xs.reactions))
+
+
+def load_micro_xs(micro_xs_file, spectrum=None):
+    '''
+    Read the cross sections, collapsed to one group with a flux
+    spectrum if one is given. The collapsed cross sections are cached
+    by the hash of the file and of the spectrum, so reactors with the
+    same cross sections and spectrum share them and each collapse is
+    only done once per process.
+
+    Parameters:
+    -----------
+    micro_xs_file: str
+        name of the csv file with the cross section data
+    spectrum: list of floats
+        flux in each energy group. If None or empty, the cross
+        sections are used as they are.
+
+    Returns:
+    --------
+    openmc.deplete.MicroXS
+        microscopic cross section data. This object is shared and
+        must not be modified.
+    '''
+    if spectrum is None or len(spectrum) == 0:
+        return read_micro_xs(micro_xs_file)
+    spectrum = np.ascontiguousarray(spectrum, dtype=np.float64)
+    key = (micro_xs_hash(micro_xs_file),
+           hashlib.sha1(spectrum.tobytes()).hexdigest())
+    if key not in _collapsed_xs:
+        _collapsed_xs[key] = collapse_micro_xs(
+            read_micro_xs(micro_xs_file), spectrum)
+    return _collapsed_xs[key]
+
+
+@lru_cache(maxsize=None)
+def read_materials(materials_file):
+    '''
+    Read the materials from an xml file. The materials are cached,
+    so each file is only read once per process. This is used by
+    worker processes, which run one depletion at a time.
+
+    Parameters:
+    -----------
+    materials_file: str
+        name of the materials.xml file
+
+    Returns:
+    --------
+    openmc.Materials
+        materials in the file. This object is shared, and the
+        compositions are changed by each depletion.
+    '''
+    return openmc.Materials.from_xml(materials_file)
+
+
+@lru_cache(maxsize=None)
+def read_template_materials(materials_file, template, n_assem):
+    '''
+    Read the materials from an xml file and clone the assembly
+    template material for a core. The result is cached, so the file
+    is only read and the template is only cloned once per process for
+    each core size.
+
+    Parameters:
+    -----------
+    materials_file: str
+        name of the materials.xml file
+    template: str
+        name of the assembly template material
+    n_assem: int
+        number of assemblies in the core
+
+    Returns:
+    --------
+    openmc.Materials
+        materials with one assembly material for each assembly. This
+        object is shared, and the compositions are changed by each
+        depletion.
+    '''
+    return clone_template(openmc.Materials.from_xml(materials_file),
+                          template, n_assem)
+
+
+def clone_template(materials, template, n_assem):
+    '''
+    Create the materials for a core from a single assembly template
+    material. The template is cloned once for each assembly, keeping
+    its volume, temperature and density, and the clones are named
+    ``assembly_1`` to ``assembly_<n_assem>``. The template and any
+    other assembly materials (with ``assembly_`` in their name) are
+    removed, and the other materials are kept as they are.
+
+    Parameters:
+    -----------
+    materials: openmc.Materials
+        materials with the template material
+    template: str
+        name of the template material
+    n_assem: int
+        number of assemblies in the core
+
+    Returns:
+    --------
+    openmc.Materials
+        materials without the template, with one assembly material
+        for each assembly, after the other materials
+    '''
+    templates = [material for material in materials
+                 if material.name == template]
+    if len(templates) != 1:
+        raise ValueError("Expected one material named " + template +
+                         ", found " + str(len(templates)))
+    core_materials = openmc.Materials(
+        [material for material in materials
+         if (material.name != template) and
+         ('assembly_' not in (material.name or ''))])
+    for ii in range(n_assem):
+        assembly = templates[0].clone()
+        assembly.name = "assembly_" + str(ii + 1)
+        assembly.depletable = True
+        core_materials.append(assembly)
+    return core_materials
+
+
+@lru_cache(maxsize=None)
+def nuclide_name(nuclide):
+    '''
+    Get the OpenMC name of a Cyclus nuclide id
+
+    Parameters:
+    -----------
+    nuclide: int
+        nuclide id (ZZAAAMMMM)
+
+    Returns:
+    --------
+    str: name of the nuclide, e.g. U235
+    '''
+    Z = nuclide // int(1e7)
+    A = (nuclide - Z * int(1e7)) // int(1e4)
+    m = nuclide - Z * int(1e7) - A * int(1e4)
+    return openmc.data.gnds_name(Z, A, m)
+
+
+@lru_cache(maxsize=None)
+def nuclide_id(name):
+    '''
+    Get the Cyclus nuclide id of an OpenMC nuclide name
+
+    Parameters:
+    -----------
+    name: str
+        name of the nuclide, e.g. U235
+
+    Returns:
+    --------
+    int: nuclide id (ZZAAAMMMM)
+    '''
+    Z, A, m = openmc.data.zam(name)
+    return Z * int(1e7) + A * int(1e4) + m
+
+
+@lru_cache(maxsize=None)
+def nuclide_mass(name):
+    '''
+    Get the atomic mass of a nuclide (g/mol), or its mass number if
+    the mass is not tabulated
+
+    Parameters:
+    -----------
+    name: str
+        name of the nuclide, e.g. U235
+
+    Returns:
+    --------
+    float: atomic mass (g/mol)
+    '''
+    try:
+        return openmc.data.atomic_mass(name)
+    except KeyError:
+        return float(openmc.data.zam(name)[1])
+
+
+def select_spent(chain_comps, micro_xs):
+    '''
+    Keep the nuclides of chain compositions that are in the spent
+    compositions from ``Depletion.get_spent_comps``: the nuclides of
+    the cross sections, with a mass above MIN_SPENT_MASS
+
+    Parameters:
+    -----------
+    chain_comps: list of dicts
+        compositions with the nuclides of the depletion chain, from
+        ``Depletion.get_chain_comps``
+    micro_xs: openmc.deplete.MicroXS
+        cross sections of the depletion
+
+    Returns:
+    --------
+    spent_comps: list of dicts
+        compositions with the nuclides of the cross sections
+    '''
+    nuclides = {nuclide_id(name) for name in micro_xs.nuclides}
+    return [{nuc: mass for nuc, mass in comp.items()
+             if (nuc in nuclides) and (mass > MIN_SPENT_MASS)}
+            for comp in chain_comps]
+
+
+def homogenize(comp_list, masses, groups):
+    '''
+    Mix the compositions of each group of assemblies, weighted by the
+    mass of each assembly
+
+    Parameters:
+    -----------
+    comp_list: list of dicts
+        compositions of the assemblies
+    masses: list of floats
+        mass of each assembly
+    groups: list of lists of ints
+        indices in comp_list of the assemblies in each group
+
+    Returns:
+    --------
+    batch_comps: list of dicts
+        mass fractions of each group
+    multiplicity: list of ints
+        number of assemblies in each group
+    '''
+    from openmcyclus.checkpoint import comps_to_array, array_to_comps
+
+    nuclides, fractions = comps_to_array(comp_list)
+    fractions /= fractions.sum(axis=1, keepdims=True)
+    fractions *= np.asarray(masses, dtype=float)[:, None]
+    batch = np.array([fractions[group].sum(axis=0) for group in groups])
+    batch /= batch.sum(axis=1, keepdims=True)
+    return (array_to_comps(nuclides, batch),
+            [len(group) for group in groups])
+
+
+def split_batches(batch_comps, masses, groups):
+    '''
+    Split the spent compositions of groups of assemblies back onto
+    each assembly, in proportion to the mass of the assembly
+
+    Parameters:
+    -----------
+    batch_comps: list of dicts
+        spent compositions of each group
+    masses: list of floats
+        mass of each assembly
+    groups: list of lists of ints
+        indices of the assemblies in each group
+
+    Returns:
+    --------
+    spent_comps: list of dicts
+        spent compositions of each assembly
+    '''
+    spent_comps = [None] * len(masses)
+    for comp, group in zip(batch_comps, groups):
+        total = sum(masses[ii] for ii in group)
+        for ii in group:
+            fraction = masses[ii] / total
+            spent_comps[ii] = {nuc: mass * fraction
+                               for nuc, mass in comp.items()}
+    return spent_comps
+
+
+@lru_cache(maxsize=None)
+def chain_nuclides(chain_file):
+    '''
+    Get the ids of the nuclides in a depletion chain, which are the
+    columns of the composition arrays sent to the depletion processes.
+    The ids are cached, so each chain is only read once per process.
+
+    Parameters:
+    -----------
+    chain_file: str
+        name of the depletion chain xml file
+
+    Returns:
+    --------
+    numpy.ndarray of ints
+        sorted nuclide ids (ZZAAAMMMM). The array is read-only.
+    '''
+    nuclides = set()
+    for nuclide in ET.parse(chain_file).getroot().iter("nuclide"):
+        Z, A, m = openmc.data.zam(nuclide.get("name"))
+        nuclides.add(Z * int(1e7) + A * int(1e4) + m)
+    nuclides = np.array(sorted(nuclides), dtype=np.int64)
+    nuclides.flags.writeable = False
+    return nuclides
+
+
+def get_executor(processes=1):
+    '''
+    Get the process pool that runs depletion in the background.
+    The pool is shared by all reactors in the process, and is
+    created the first time it is needed. Worker processes are forked
+    because Cyclus embeds the Python interpreter, so a new interpreter
+    can not be started from sys.executable.
+
+    Parameters:
+    -----------
+    processes: int
+        number of processes used by each job for the matrix
+        exponentials. The pool has one worker for every processes
+        CPUs, so the jobs running at the same time do not start more
+        processes than there are CPUs. Only used when the pool is
+        created.
+
+    Returns:
+    --------
+    concurrent.futures.ProcessPoolExecutor
+    '''
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=max((os.cpu_count() or 1) // max(processes, 1), 1),
+            mp_context=multiprocessing.get_context("fork"))
+    return _executor
+
+
+def budget_executor():
+    '''
+    Start a process pool for the depletion of one reactor with a time
+    budget: one process for the depletion of the cycle and one for
+    the coarse estimate that replaces it if the budget is used. Unlike
+    the shared pool from ``get_executor``, its processes can be
+    stopped with ``kill_executor`` without stopping the jobs of other
+    reactors.
+
+    Returns:
+    --------
+    concurrent.futures.ProcessPoolExecutor
+    '''
+    return ProcessPoolExecutor(
+        max_workers=2, mp_context=multiprocessing.get_context("fork"))
+
+
+def kill_executor(executor):
+    '''
+    Stop the processes of a process pool, including the jobs that are
+    running
+
+    Parameters:
+    -----------
+    executor: concurrent.futures.ProcessPoolExecutor
+        pool to stop
+    '''
+    processes = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+
+
+def run_job(job):
+    '''
+    Run a depletion in a worker process. The model files are read
+    once per worker, and each job writes its results to its own
+    temporary directory so that jobs running at the same time do not
+    overwrite each other.
+
+    Parameters:
+    -----------
+    job: dict
+        keys are comp_list, chain_file, path, power, flux, dt
+        and steps, as used by ``Depletion`` and ``Depletion.run``,
+        and optionally assembly_template, multiplicity, processes,
+        blas_threads, flux_spectrum, and xs_library (file name in path),
+        burnups, burnup_step and chain_comps
+
+    Returns:
+    --------
+    spent_comps: list of dicts
+        list of the spent compositions
+    '''
+    deplete = Depletion(job["chain_file"], job["steps"], job["power"],
+                        job["path"], job.get("processes", 0),
+                        job.get("blas_threads", 0))
+    if job.get("assembly_template"):
+        materials = read_template_materials(
+            job["path"] + "materials.xml", job["assembly_template"],
+            len(job["comp_list"]))
+    else:
+        materials = read_materials(job["path"] + "materials.xml")
+    micro_xs = load_micro_xs(job["path"] + "micro_xs.csv",
+                             job.get("flux_spectrum"))
+    xs_library = None
+    if job.get("xs_library"):
+        from openmcyclus.xs_library import read_library
+        xs_library = read_library(job["path"] + job["xs_library"])
+    with tempfile.TemporaryDirectory() as output_dir:
+        return deplete.run(job["comp_list"], materials, micro_xs,
+                           job["flux"], job["dt"], job["steps"],
+                           output_dir=output_dir,
+                           multiplicity=job.get("multiplicity"),
+                           xs_library=xs_library,
+                           burnups=job.get("burnups"),
+                           burnup_step=job.get("burnup_step", 0.0),
+                           chain_comps=job.get("chain_comps", False))
+
+
+def run_shared(job):
+    '''
+    Run a depletion in a worker process with the compositions in
+    shared memory. The fresh compositions are read from, and the spent
+    compositions are written to, a block with a mass array of shape
+    (2, n_comps, number of chain nuclides), see
+    ``openmcyclus.shared.SharedMasses``. The columns are the nuclides
+    from ``chain_nuclides``.
+
+    Parameters:
+    -----------
+    job: dict
+        as for ``run_job``, with the name of the block as shared and
+        the number of compositions as n_comps instead of comp_list
+
+    Returns:
+    --------
+    int: number of spent compositions written to the block
+    '''
+    from openmcyclus.checkpoint import array_to_comps
+    from openmcyclus.shared import SharedMasses, fill_masses
+
+    nuclides = chain_nuclides(job["path"] + job["chain_file"])
+    shared = SharedMasses((2, job["n_comps"], len(nuclides)), job["shared"])
+    try:
+        comp_list = array_to_comps(nuclides, shared.masses[0])
+        spent_comps = run_job(dict(job, comp_list=comp_list))
+        fill_masses(spent_comps, nuclides, shared.masses[1])
+    finally:
+        shared.close()
+    return len(spent_comps)
 
 
 class Depletion(object):
     def __init__(self, chain_file: str,
                  timesteps: int, power: float,
-                 path: str):
+                 path: str, processes: int = 0,
+                 blas_threads: int = 0):
         '''
         Class to hold objects related to calling
         :class:`~openmc.deplete.IndependentOperator`
@@ -28,6 +551,13 @@ class Depletion(object):
             power output of the reactor, assumed in MWth.
         path: str
             relative path to micro xs and materials files
+        processes: int
+            number of processes for the matrix exponentials of the
+            materials, see ``openmcyclus.pool.configure``. The
+            default, 0, uses one process per CPU.
+        blas_threads: int
+            number of BLAS threads per process. The default, 0, does
+            not change the number of threads.
 
         Attributes:
         -----------
@@ -41,26 +571,39 @@ class Depletion(object):
             power output of the reactor, assumed in MWth.
         path: str
             relative path to micro_xs.csv and materials.xml files
+        processes: int
+            number of processes for the matrix exponentials
+        blas_threads: int
+            number of BLAS threads per process
 
         '''
         self.chain_file = chain_file
         self.timesteps = timesteps
         self.power = power
         self.path = path
+        self.processes = processes
+        self.blas_threads = blas_threads
 
     def update_materials(self, comp_list, materials):
         '''
         Read in the material compositions of the fuel assemblies present
         in the reactor to be transmuted. Then modify the composition of
         the pre-defined materials to match the compositions from
-        Cyclus.
+        Cyclus. The compositions are converted to a single mass array,
+        unless they are given as one, and the nuclides of each material
+        are filled in from it.
 
+        The assembly materials are matched to the compositions in
+        order. If there are more assembly materials than compositions,
+        the remaining materials are not changed.
 
         Parameters:
         -----------
-        comp_list: list of dicts
+        comp_list: list of dicts, or tuple of numpy.ndarrays
             list of the fresh fuel compositions present in the core
-            at the calling of the transmute function.
+            at the calling of the transmute function, or their nuclide
+            ids and masses (one row per composition), as from
+            ``checkpoint.comps_to_array``
         materials: openmc.Materials
             materials object to be depleted
 
@@ -71,22 +614,204 @@ class Depletion(object):
         materials: openmc.Materials
             updated material object
         '''
+        from openmcyclus.checkpoint import comps_to_array
 
+        if isinstance(comp_list, tuple):
+            nuclides, masses = comp_list
+        else:
+            nuclides, masses = comps_to_array(comp_list)
+        assemblies = [material for material in materials
+                      if 'assembly_' in (material.name or '')]
+        if len(assemblies) < len(masses):
+            raise ValueError("The materials have " + str(len(assemblies)) +
+                             " assembly materials for " +
+                             str(len(masses)) + " compositions")
+        names = [nuclide_name(int(nuclide)) for nuclide in nuclides]
         material_ids = []
-        for index, material in enumerate(materials):
-            if 'assembly_' in material.name:
-                material_ids.append(material.id)
-                material.nuclides.clear()
-                for nuclide, percent in comp_list[index].items():
-                    Z = math.floor(nuclide / int(1e7))
-                    A = math.floor((nuclide - Z * int(1e7)) / int(1e4))
-                    m = nuclide - Z * int(1e7) - A * int(1e4)
-                    nucname = openmc.data.gnds_name(Z, A, m)
-                    material.add_nuclide(nucname, percent, percent_type='wo')
+        for material, row in zip(assemblies, masses):
+            material_ids.append(material.id)
+            material.nuclides.clear()
+            material.nuclides.extend(
+                openmc.material.NuclideTuple(names[ii], float(row[ii]), 'wo')
+                for ii in np.flatnonzero(row))
 
         return material_ids, materials
 
-    def get_spent_comps(self, material_ids, microxs):
+    def run(self, comp_list, materials, micro_xs, flux, dt, steps=None,
+            output_dir=None, multiplicity=None, xs_library=None,
+            burnups=None, burnup_step=0.0, chain_comps=False):
+        '''
+        Deplete the given compositions with
+        :class:`~openmc.deplete.IndependentOperator` and the
+        :class:`~openmc.deplete.PredictorIntegrator`. The matrix
+        exponentials use the persistent pool from
+        ``openmcyclus.pool``.
+
+        If a cross section library is given, the depletion is run one
+        step at a time, and the cross sections of each assembly
+        material are interpolated from the library at the burnup of
+        the assembly in the middle of the step.
+
+        Parameters:
+        -----------
+        comp_list: list of dicts, or tuple of numpy.ndarrays
+            list of the fresh fuel compositions to deplete, or their
+            nuclide ids and masses, see ``update_materials``
+        materials: openmc.Materials
+            materials with one assembly material for each composition
+        micro_xs: openmc.deplete.MicroXS
+            microscopic cross section data. With a library, this is
+            only used for the materials that are not assemblies.
+        flux: float
+            flux through the materials (n/cm2s)
+        dt: float
+            length of each depletion step (s)
+        steps: int
+            number of depletion steps. Defaults to the timesteps
+            attribute.
+        output_dir: str
+            directory for the depletion results. Defaults to the
+            path attribute.
+        multiplicity: list of ints
+            number of assemblies represented by each composition. The
+            volume of each assembly material is multiplied by this
+            during the depletion. Defaults to one assembly each.
+        xs_library: openmcyclus.xs_library.XSLibrary
+            cross sections tabulated over burnup
+        burnups: list of floats
+            burnup of each composition at the start (MWd/kgHM).
+            Defaults to 0.
+        burnup_step: float
+            burnup added to each composition in each step (MWd/kgHM)
+        chain_comps: bool
+            if True, the spent compositions have every nuclide of the
+            chain, see ``get_chain_comps``, so that they can be
+            depleted further
+
+        Returns:
+        --------
+        spent_comps: list of dicts
+            list of the spent compositions, in the same order as
+            comp_list
+        '''
+        if steps is None:
+            steps = self.timesteps
+        if output_dir is None:
+            output_dir = self.path
+        configure_pool(self.processes, self.blas_threads)
+        material_ids, materials = self.update_materials(comp_list, materials)
+        # Assembly materials without a composition are not depleted
+        materials = openmc.Materials(
+            [material for material in materials
+             if (material.id in material_ids) or
+             ('assembly_' not in (material.name or ''))])
+        assemblies = [material for material in materials
+                      if material.id in material_ids]
+        volumes = [material.volume for material in assemblies]
+        if multiplicity is not None:
+            for material, number in zip(assemblies, multiplicity):
+                material.volume = material.volume * number
+        # The spent compositions have the nuclides of the cross sections
+        spent_xs = micro_xs
+        try:
+            if xs_library is None:
+                self.integrate(materials, [micro_xs] * len(materials), flux,
+                               np.ones(int(steps)) * dt, output_dir)
+            else:
+                spent_xs = xs_library.micro_xs([0.0])[0]
+                if burnups is None:
+                    burnups = np.zeros(len(material_ids))
+                burnups = np.asarray(burnups, dtype=float)
+                for step in range(int(steps)):
+                    # Every nuclide of the chain is carried to the next
+                    # step, including those without cross sections
+                    if step > 0:
+                        self.update_materials(self.get_chain_comps(
+                            material_ids, output_dir), materials)
+                    assembly_xs = dict(zip(material_ids, xs_library.micro_xs(
+                        burnups + (step + 0.5) * burnup_step)))
+                    self.integrate(
+                        materials, [assembly_xs.get(material.id, micro_xs)
+                                    for material in materials],
+                        flux, [dt], output_dir)
+        finally:
+            for material, volume in zip(assemblies, volumes):
+                material.volume = volume
+        if chain_comps:
+            return self.get_chain_comps(material_ids, output_dir)
+        return self.get_spent_comps(material_ids, spent_xs, output_dir)
+
+    def integrate(self, materials, micro_xs_list, flux, timesteps,
+                  output_dir):
+        '''
+        Run the depletion solver over the given time steps
+
+        Parameters:
+        -----------
+        materials: openmc.Materials
+            materials to deplete
+        micro_xs_list: list of openmc.deplete.MicroXS
+            cross sections of each material
+        flux: float
+            flux through the materials (n/cm2s)
+        timesteps: array of floats
+            length of each depletion step (s)
+        output_dir: str
+            directory for the depletion results
+        '''
+        ind_op = od.IndependentOperator(
+            materials,
+            [np.array([flux])] * len(materials),
+            micro_xs_list,
+            str(self.path + self.chain_file))
+        ind_op.output_dir = output_dir
+        integrator = od.PredictorIntegrator(ind_op, np.asarray(timesteps),
+                                            power=self.power * 1e6,
+                                            timestep_units='s')
+        integrator.integrate()
+
+    def get_chain_comps(self, material_ids, output_dir=None):
+        '''
+        Get the compositions of the materials at the end of the
+        depletion with every nuclide of the depletion chain. Unlike
+        ``get_spent_comps``, nuclides without cross sections and
+        nuclides with small masses are kept, so the compositions can
+        be depleted further without losing decay products.
+
+        Parameters:
+        -----------
+        material_ids: list of strs
+            material ids for the assembly materials in the OpenMC model
+        output_dir: str
+            directory with the depletion results. Defaults to the
+            path attribute.
+
+        Returns:
+        --------
+        chain_comps: list of dicts
+            mass (g) of each nuclide with a positive mass, for each
+            material
+        '''
+        if output_dir is None:
+            output_dir = self.path
+        results = od.Results(os.path.join(output_dir,
+                                          "depletion_results.h5"))
+        step = results[-1]
+        names = sorted(step.index_nuc, key=step.index_nuc.get)
+        ids = np.array([nuclide_id(name) for name in names])
+        factors = np.array([nuclide_mass(name) for name in names]) / \
+            openmc.data.AVOGADRO
+        chain_comps = []
+        for material_id in material_ids:
+            atoms = np.asarray(step.data[0, step.index_mat[str(material_id)],
+                                         :len(names)])
+            masses = atoms * factors
+            positive = np.flatnonzero(masses > 0)
+            chain_comps.append({int(ids[ii]): float(masses[ii])
+                                for ii in positive})
+        return chain_comps
+
+    def get_spent_comps(self, material_ids, microxs, output_dir=None):
         '''
         Creates a list of each of the spent fuel compositions from the
         OpenMC depletion
@@ -98,13 +823,19 @@ class Depletion(object):
         microxs: openmc.deplete.MicroXS
             microscopic cross section data, used to loop over nuclides
             of interest.
+        output_dir: str
+            directory with the depletion results. Defaults to the
+            path attribute.
 
         Returns:
         --------
         spent_comps: list of dicts
             list of the compositions from the OpenMC model
         '''
-        results = od.Results(self.path + "depletion_results.h5")
+        if output_dir is None:
+            output_dir = self.path
+        results = od.Results(os.path.join(output_dir,
+                                          "depletion_results.h5"))
         nuclides = microxs.nuclides
         spent_comps = []
         for material_id in material_ids:
@@ -112,7 +843,7 @@ class Depletion(object):
             for nuclide in nuclides:
                 Z, A, m = openmc.data.zam(nuclide)
                 mass = results.get_mass(str(material_id), nuclide)[-1][-1]
-                if mass <= 1e-10:
+                if mass <= MIN_SPENT_MASS:
                     continue
                 comp.update({Z * int(1e7) + A * int(1e4) + m: mass})
             spent_comps.append(comp)
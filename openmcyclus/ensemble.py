@@ -0,0 +1,494 @@
+'''
+Run an ensemble of Cyclus scenarios made from a base input and a grid
+of DepleteReactor parameters. A variant of the input is written for
+each point of the grid, and the variants are run in a bounded pool of
+forked processes. The depletion chain, cross sections, materials and
+cross section libraries of the models are read once in the parent
+process before the pool starts, so every run starts with warm caches
+instead of parsing them again. The outputs and timings of all runs are
+written to one summary table.
+
+Example:
+
+    $ openmcyclus-ensemble examples/simple.xml --param cycle_time=12,18 \\
+        --param thermal_power=100,200 --param enrichment=0.04,0.045 \\
+        --processes 8 --out-dir ensemble
+'''
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import warnings
+import xml.etree.ElementTree as ET
+import pandas as pd
+from openmcyclus.compositions import recipe_nuclide_id
+
+
+def parse_value(value):
+    '''
+    Parse a parameter value as JSON, or keep it as a string
+    '''
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def parse_grid(params, grid_file=None):
+    '''
+    Get the parameter grid from the command line and a JSON file
+
+    Parameters:
+    -----------
+    params: list of strs
+        KEY=VALUE1,VALUE2,... for each parameter
+    grid_file: str
+        JSON file with a list of values for each parameter
+
+    Returns:
+    --------
+    grid: dict
+        list of values for each parameter
+    '''
+    grid = {}
+    if grid_file is not None:
+        with open(grid_file) as f:
+            grid.update(json.load(f))
+    for param in params:
+        if "=" not in param:
+            raise ValueError("Parameter " + param + " is not KEY=VALUES")
+        key, values = param.split("=", 1)
+        grid[key.strip()] = [parse_value(value)
+                             for value in values.split(",")]
+    return grid
+
+
+def grid_points(grid):
+    '''
+    Get every combination of the parameter values
+
+    Parameters:
+    -----------
+    grid: dict
+        list of values for each parameter
+
+    Returns:
+    --------
+    list of dicts
+        value of each parameter for each point
+    '''
+    keys = list(grid)
+    return [dict(zip(keys, values))
+            for values in itertools.product(*[grid[key] for key in keys])]
+
+
+def set_enrichment(root, recipes, enrichment):
+    '''
+    Set the U235 mass fraction of the uranium in recipes, keeping the
+    uranium fraction of each recipe. The recipes are changed for every
+    facility that uses them.
+
+    Parameters:
+    -----------
+    root: xml.etree.ElementTree.Element
+        root of the Cyclus input, changed in place
+    recipes: list of str
+        names of the recipes
+    enrichment: float
+        U235 mass fraction of the uranium
+
+    Returns:
+    --------
+    list of str: names of the recipes that were changed
+
+    Raises:
+    -------
+    ValueError
+        if none of the recipes has both U235 and U238
+    '''
+    changed = []
+    for recipe in root.findall("recipe"):
+        if recipe.findtext("name") not in recipes:
+            continue
+        uranium = {}
+        for nuclide in recipe.findall("nuclide"):
+            nuc_id = recipe_nuclide_id(nuclide.findtext("id"))
+            if nuc_id in [922350000, 922380000]:
+                uranium[nuc_id] = nuclide
+        if len(uranium) != 2:
+            continue
+        total = sum(float(nuclide.findtext("comp"))
+                    for nuclide in uranium.values())
+        uranium[922350000].find("comp").text = str(enrichment * total)
+        uranium[922380000].find("comp").text = str(
+            (1 - enrichment) * total)
+        changed.append(recipe.findtext("name"))
+    if len(changed) == 0:
+        raise ValueError("No recipe with U235 and U238 in " + str(recipes))
+    return changed
+
+
+def warn_shared(root, facility, recipes):
+    '''
+    Warn if the recipes changed for one facility are also used by other
+    DepleteReactor facilities
+    '''
+    for other in root.findall("facility"):
+        config = other.find("config/DepleteReactor")
+        if (other is facility) or (config is None):
+            continue
+        shared = set(recipes) & {val.text.strip() for val in
+                                 config.findall("fuel_inrecipes/val")}
+        if len(shared) > 0:
+            warnings.warn("The enrichment of " +
+                          str(facility.findtext("name")) +
+                          " also changes the recipes " +
+                          str(sorted(shared)) + " of " +
+                          str(other.findtext("name")))
+
+
+def apply_params(root, params):
+    '''
+    Set DepleteReactor inputs in a Cyclus input. A parameter is set for
+    every DepleteReactor, or only for one facility if it is given as
+    <facility name>/<input>. The enrichment parameter sets the U235
+    fraction of the uranium in the fresh fuel recipes of the reactors.
+    Recipes are shared by the facilities of the input, so
+    <facility name>/enrichment also changes the fuel of every other
+    facility that uses the same recipes, which is warned about. List
+    values are written as <val> entries.
+
+    Parameters:
+    -----------
+    root: xml.etree.ElementTree.Element
+        root of the Cyclus input, changed in place
+    params: dict
+        value of each parameter
+    '''
+    for key, value in params.items():
+        facility_name, _, name = key.rpartition("/")
+        for facility in root.findall("facility"):
+            config = facility.find("config/DepleteReactor")
+            if (config is None) or (
+                    facility_name and
+                    facility.findtext("name") != facility_name):
+                continue
+            if name == "enrichment":
+                changed = set_enrichment(
+                    root, [val.text.strip() for val in
+                           config.findall("fuel_inrecipes/val")],
+                    float(value))
+                if facility_name:
+                    warn_shared(root, facility, changed)
+                continue
+            element = config.find(name)
+            if element is None:
+                element = ET.SubElement(config, name)
+            for child in list(element):
+                element.remove(child)
+            if isinstance(value, (list, tuple)):
+                element.text = None
+                for val in value:
+                    ET.SubElement(element, "val").text = str(val)
+            else:
+                element.text = str(value)
+
+
+def write_variants(base_input, points, out_dir):
+    '''
+    Write a Cyclus input for each point of the parameter grid
+
+    Parameters:
+    -----------
+    base_input: str
+        Cyclus input file
+    points: list of dicts
+        value of each parameter for each variant
+    out_dir: str
+        directory for the inputs and outputs
+
+    Returns:
+    --------
+    variants: list of dicts
+        name, params, input_file and output_file of each variant
+    '''
+    os.makedirs(out_dir, exist_ok=True)
+    base = ET.parse(base_input)
+    variants = []
+    for ii, params in enumerate(points):
+        name = "variant_" + str(ii).zfill(len(str(len(points))))
+        root = ET.fromstring(ET.tostring(base.getroot()))
+        apply_params(root, params)
+        input_file = os.path.join(out_dir, name + ".xml")
+        ET.ElementTree(root).write(input_file)
+        variants.append({"name": name, "params": params,
+                         "input_file": input_file,
+                         "output_file": os.path.join(out_dir,
+                                                     name + ".sqlite")})
+    return variants
+
+
+def model_keys(input_files):
+    '''
+    Get the model files used by the DepleteReactor facilities of the
+    inputs
+
+    Returns:
+    --------
+    set of tuples
+        (model_path, chain_file, flux_spectrum, assembly_template,
+        n_assem_core, xs_library, depletion_mode, table_file)
+    '''
+    keys = set()
+    for input_file in input_files:
+        root = ET.parse(input_file).getroot()
+        for config in root.findall("facility/config/DepleteReactor"):
+            keys.add((config.findtext("model_path", "").strip(),
+                      config.findtext("chain_file", "").strip(),
+                      tuple(float(val.text) for val in
+                            config.findall("flux_spectrum/val")),
+                      config.findtext("assembly_template", "").strip(),
+                      int(config.findtext("n_assem_core", "0")),
+                      config.findtext("xs_library", "").strip(),
+                      config.findtext("depletion_mode", "openmc").strip(),
+                      config.findtext("table_file", "").strip()))
+    return keys
+
+
+def warm_caches(input_files):
+    '''
+    Read the model files of the reactors into the caches of this
+    process, so that processes forked from it share them
+
+    Parameters:
+    -----------
+    input_files: list of strs
+        Cyclus input files
+
+    Returns:
+    --------
+    int: number of models read
+    '''
+    keys = model_keys(input_files)
+    try:
+        for (path, chain_file, spectrum, template, n_assem, xs_library,
+             mode, table_file) in keys:
+            if mode == "table":
+                from openmcyclus.table import read_table
+                read_table(path + table_file)
+                continue
+            from openmcyclus.depletion import (chain_nuclides, load_micro_xs,
+                                               read_template_materials)
+            chain_nuclides(path + chain_file)
+            load_micro_xs(path + "micro_xs.csv", spectrum or None)
+            if template:
+                read_template_materials(path + "materials.xml", template,
+                                        n_assem)
+            if xs_library:
+                from openmcyclus.xs_library import read_library
+                read_library(path + xs_library)
+    except ImportError as error:
+        warnings.warn("Model files not read before the runs: " + str(error))
+    return len(keys)
+
+
+def summarize(output_file):
+    '''
+    Get the outputs of a run that are compared across the ensemble
+
+    Parameters:
+    -----------
+    output_file: str
+        Cyclus sqlite output database
+
+    Returns:
+    --------
+    dict
+        n_reactors, n_cycles (CYCLE_END events), n_transmutes and
+        energy (sum of the reactor power over the time steps, MWe)
+    '''
+    from openmcyclus import analysis
+
+    events = analysis.cycle_events(output_file,
+                                   events=["CYCLE_END", "TRANSMUTE"])
+    power = analysis.power_series(output_file)
+    return {"n_reactors": len(analysis.reactors(output_file)),
+            "n_cycles": int((events["Event"] == "CYCLE_END").sum()),
+            "n_transmutes": int((events["Event"] == "TRANSMUTE").sum()),
+            "energy": float(power["Value"].sum()) if len(power) else 0.0}
+
+
+def run_variant(variant, mode="inprocess", cyclus="cyclus"):
+    '''
+    Run a variant and summarize its output. In inprocess mode, the
+    simulation runs in this process with ``cyclus.simstate``, and uses
+    the caches filled before the process was forked. In subprocess
+    mode, the Cyclus executable is started for the run.
+
+    Parameters:
+    -----------
+    variant: dict
+        name, params, input_file and output_file, from
+        ``write_variants``
+    mode: str
+        "inprocess" or "subprocess"
+    cyclus: str
+        Cyclus executable, for subprocess mode
+
+    Returns:
+    --------
+    dict: name, parameters, status, error, wall_time_s, rss_mb and
+        the outputs from ``summarize``
+    '''
+    from openmcyclus.memory import rss
+
+    output_file = variant["output_file"]
+    if os.path.exists(output_file):
+        os.remove(output_file)
+    row = {"name": variant["name"]}
+    row.update(variant["params"])
+    row.update(status=0, error="")
+    start = time.perf_counter()
+    try:
+        if mode == "subprocess":
+            with open(output_file + ".log", "w") as log:
+                row["status"] = subprocess.run(
+                    [cyclus, "-o", output_file, variant["input_file"]],
+                    stdout=log, stderr=subprocess.STDOUT).returncode
+        else:
+            from cyclus.simstate import SimState
+
+            from openmcyclus.export import close_all
+
+            state = SimState(input_file=variant["input_file"],
+                             output_path=output_file)
+            state.load()
+            state.run()
+            # Forked processes exit without running the exit handlers
+            close_all()
+    except Exception as error:
+        row.update(status=1, error=repr(error))
+    row["wall_time_s"] = time.perf_counter() - start
+    row["rss_mb"] = rss()
+    if (row["status"] == 0) and os.path.exists(output_file):
+        try:
+            row.update(summarize(output_file))
+        except Exception as error:
+            row["error"] = repr(error)
+    return row
+
+
+def _run(writer, variant, mode, cyclus):
+    writer.send(run_variant(variant, mode, cyclus))
+    writer.close()
+
+
+def run_ensemble(variants, processes=None, mode="inprocess",
+                 cyclus="cyclus"):
+    '''
+    Run the variants in forked processes, at most processes at a time.
+    Each process runs one variant and exits, so no Cyclus state is
+    carried from one run to the next, and each run starts from the
+    caches of this process. The processes are not daemonic, so the
+    runs can start the processes of their depletions.
+
+    Parameters:
+    -----------
+    variants: list of dicts
+        from ``write_variants``
+    processes: int
+        number of runs at the same time. Defaults to the number of
+        CPUs.
+    mode: str
+        "inprocess" or "subprocess", see ``run_variant``
+    cyclus: str
+        Cyclus executable, for subprocess mode
+
+    Returns:
+    --------
+    pandas.DataFrame
+        one row for each variant, from ``run_variant``. A run whose
+        process exits without a row has status 1 and the exit code
+        in error.
+    '''
+    from multiprocessing.connection import wait
+
+    context = multiprocessing.get_context("fork")
+    processes = max(processes or os.cpu_count() or 1, 1)
+    pending = list(variants)
+    running = {}
+    rows = []
+    while pending or running:
+        while pending and (len(running) < processes):
+            variant = pending.pop(0)
+            reader, writer = context.Pipe(duplex=False)
+            process = context.Process(target=_run, args=(
+                writer, variant, mode, cyclus))
+            process.start()
+            writer.close()
+            running[reader] = (process, variant)
+        # A reader is ready when the row is sent or the process exits
+        for reader in wait(list(running)):
+            process, variant = running.pop(reader)
+            try:
+                row = reader.recv()
+            except EOFError:
+                row = None
+            reader.close()
+            process.join()
+            if row is None:
+                row = {"name": variant["name"]}
+                row.update(variant["params"])
+                row.update(status=1, error="exited with code " +
+                           str(process.exitcode))
+            rows.append(row)
+    return pd.DataFrame(rows).sort_values("name", ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run Cyclus scenarios over a grid of DepleteReactor "
+        "parameters")
+    parser.add_argument("base_input", help="Cyclus input file")
+    parser.add_argument("--param", action="append", default=[],
+                        metavar="KEY=VALUE1,VALUE2",
+                        help="values of a DepleteReactor input, "
+                        "<facility>/<input> for one facility, or "
+                        "enrichment for the fresh fuel recipes")
+    parser.add_argument("--grid-file", default=None,
+                        help="JSON file with a list of values for each "
+                        "parameter")
+    parser.add_argument("--out-dir", default="ensemble")
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--mode", choices=["inprocess", "subprocess"],
+                        default="inprocess")
+    parser.add_argument("--cyclus", default="cyclus")
+    parser.add_argument("--summary", default=None,
+                        help="summary CSV file, defaults to "
+                        "<out-dir>/summary.csv")
+    args = parser.parse_args()
+
+    grid = parse_grid(args.param, args.grid_file)
+    variants = write_variants(args.base_input, grid_points(grid),
+                              args.out_dir)
+    start = time.perf_counter()
+    if args.mode == "inprocess":
+        warm_caches([variant["input_file"] for variant in variants])
+    warm_time = time.perf_counter() - start
+    summary = run_ensemble(variants, args.processes, args.mode, args.cyclus)
+    summary_file = args.summary or os.path.join(args.out_dir, "summary.csv")
+    summary.to_csv(summary_file, index=False)
+    print(summary.to_string(index=False))
+    print(str(len(variants)) + " runs in " +
+          str(round(time.perf_counter() - start, 1)) + " s, " +
+          str(round(warm_time, 1)) + " s reading the models, summary in " +
+          summary_file)
+    return int((summary["status"] != 0).any())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+def mix(comps, masses):
+    '''
+    Mix compositions, weighted by mass
+
+    Parameters:
+    -----------
+    comps: list of dicts
+        compositions, keys are nuclide ids and values are masses or
+        mass fractions
+    masses: list of floats
+        mass of each composition
+
+    Returns:
+    --------
+    dict: mass fractions of the mixture
+    '''
+    mixed = {}
+    for comp, mass in zip(comps, masses):
+        total = sum(comp.values())
+        for nuc, value in comp.items():
+            mixed[nuc] = mixed.get(nuc, 0.0) + value / total * mass
+    total = sum(mixed.values())
+    return {nuc: value / total for nuc, value in mixed.items()}
+
+
+def relative_difference(comp, other):
+    '''
+    Get the relative difference of two compositions, as the sum of
+    the absolute differences of each nuclide divided by the total of
+    the other composition
+
+    Parameters:
+    -----------
+    comp: dict
+        composition, keys are nuclide ids and values are masses
+    other: dict
+        composition to compare against
+
+    Returns:
+    --------
+    float: relative difference
+    '''
+    total = sum(abs(value) for value in other.values())
+    if total == 0:
+        return 0.0 if len(comp) == 0 else float('inf')
+    difference = sum(abs(comp.get(nuc, 0.0) - other.get(nuc, 0.0))
+                     for nuc in set(comp) | set(other))
+    return difference / total
+
+
+def scale_depletion(comps, fresh_comps, spent_comps, scale=1.0):
+    '''
+    Estimate spent compositions from the fresh and spent compositions
+    of an earlier depletion. Each composition is matched to the most
+    similar fresh composition of the earlier depletion, and the change
+    of the mass fractions in that depletion, times scale, is added to
+    it. Nuclides with a negative mass fraction are removed.
+
+    Parameters:
+    -----------
+    comps: list of dicts
+        compositions to deplete, keys are nuclide ids and values are
+        masses or mass fractions
+    fresh_comps: list of dicts
+        fresh compositions of the earlier depletion
+    spent_comps: list of dicts
+        spent compositions of the earlier depletion, in the same order
+    scale: float
+        ratio of the burnup of the estimate to the burnup of the
+        earlier depletion
+
+    Returns:
+    --------
+    list of dicts: estimated spent mass fractions
+    '''
+    def fractions(comp):
+        total = sum(comp.values())
+        return {nuc: value / total for nuc, value in comp.items()}
+
+    fresh_comps = [fractions(comp) for comp in fresh_comps]
+    spent_comps = [fractions(comp) for comp in spent_comps]
+    estimates = []
+    for comp in comps:
+        comp = fractions(comp)
+        index = min(range(len(fresh_comps)),
+                    key=lambda ii: relative_difference(comp, fresh_comps[ii]))
+        fresh, spent = fresh_comps[index], spent_comps[index]
+        estimate = dict(comp)
+        for nuc in set(fresh) | set(spent):
+            estimate[nuc] = estimate.get(nuc, 0.0) + scale * (
+                spent.get(nuc, 0.0) - fresh.get(nuc, 0.0))
+        estimates.append({nuc: value for nuc, value in estimate.items()
+                          if value > 0})
+    return estimates
+
+
+class Equilibrium(object):
+    def __init__(self, rtol, interval):
+        '''
+        Detect when a reactor reaches an equilibrium cycle, in which
+        each batch in the core has the same fresh and spent compositions
+        as the batch in the same position in the previous cycle. Then
+        the spent compositions of the previous cycle can be reused
+        without running the depletion.
+
+        Parameters:
+        -----------
+        rtol: float
+            relative tolerance for the compositions of a batch to be the
+            same in two cycles, see ``relative_difference``
+        interval: int
+            number of cycles to reuse the spent compositions before the
+            depletion is run again to check the equilibrium. If 0, the
+            equilibrium is never checked again.
+
+        Attributes:
+        -----------
+        batches: list of tuples
+            (recipe, fresh composition, spent composition) of each batch
+            in the last cycle that was depleted, in core order
+        converged: bool
+            True if the last two depleted cycles were the same
+        reused: int
+            number of cycles the spent compositions were reused since
+            the last depletion
+        '''
+        self.rtol = rtol
+        self.interval = interval
+        self.batches = []
+        self.converged = False
+        self.reused = 0
+
+    def matches(self, batches, outputs=None):
+        '''
+        Check whether the batches are the same as in the last
+        depleted cycle
+
+        Parameters:
+        -----------
+        batches: list of tuples
+            (recipe, fresh composition) of each batch, in core order
+        outputs: list of dicts
+            spent compositions of each batch. Not compared if None.
+
+        Returns:
+        --------
+        Bool: True if the number of batches and the recipes are the
+            same, and all compositions are within the tolerance
+        '''
+        if len(batches) != len(self.batches):
+            return False
+        if outputs is None:
+            outputs = [None] * len(batches)
+        for (recipe, comp), output, previous in zip(
+                batches, outputs, self.batches):
+            if recipe != previous[0]:
+                return False
+            if relative_difference(comp, previous[1]) > self.rtol:
+                return False
+            if (output is not None) and (
+                    relative_difference(output, previous[2]) > self.rtol):
+                return False
+        return True
+
+    def lookup(self, batches):
+        '''
+        Get the spent compositions of the batches without depleting,
+        if the reactor is at equilibrium, the batches match the last
+        depleted cycle, and the equilibrium does not need to be checked
+        again. This does not count as a reuse, see ``reuse``.
+
+        Parameters:
+        -----------
+        batches: list of tuples
+            (recipe, fresh composition) of each batch, in core order
+
+        Returns:
+        --------
+        outputs: list of dicts
+            spent composition of each batch, None if the depletion
+            must be run
+        '''
+        if not self.converged:
+            return None
+        if (self.interval > 0) and (self.reused >= self.interval):
+            return None
+        if not self.matches(batches):
+            return None
+        return [dict(previous[2]) for previous in self.batches]
+
+    def reuse(self):
+        '''
+        Count a cycle that reused the spent compositions
+        '''
+        self.reused += 1
+
+    def update(self, batches, outputs):
+        '''
+        Store the result of a depleted cycle, and check whether it is
+        the same as the last depleted cycle
+
+        Parameters:
+        -----------
+        batches: list of tuples
+            (recipe, fresh composition) of each batch, in core order
+        outputs: list of dicts
+            spent composition of each batch
+
+        Returns:
+        --------
+        Bool: True if the reactor is at equilibrium
+        '''
+        self.converged = self.matches(batches, outputs)
+        self.batches = [(recipe, comp, output) for (recipe, comp), output
+                        in zip(batches, outputs)]
+        self.reused = 0
+        return self.converged
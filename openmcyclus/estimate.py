@@ -0,0 +1,485 @@
+'''
+Estimate the cost of a Cyclus scenario with DepleteReactor facilities
+before running it. The input file is read without running Cyclus: the
+DepleteReactor prototypes, the facilities deployed by the institutions
+(initial facility lists and DeployInst build lists), the cycle and
+refueling times, the lifetimes and the simulation duration give the
+time step of every call to ``DepleteReactor.transmute``, the number of
+depletion solves and the number of assemblies. With a per-solve cost
+measured on this machine for the chain, cross section and materials
+files of each prototype, the solves give the wall time and the peak
+number of depletions running at the same time.
+
+The estimate assumes that the reactors always get fuel, and every
+solve is counted, so the reactors that reach an equilibrium cycle
+make fewer solves than estimated. Facilities deployed by other
+institution archetypes are not counted.
+
+Count the transmutes, then calibrate the solve cost and estimate the
+wall time:
+
+    $ python -m openmcyclus.estimate examples/complex.xml
+    $ python -m openmcyclus.estimate examples/complex.xml --calibrate \\
+        --calibration calibration.json --timeline timeline.csv
+'''
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+import numpy as np
+import pandas as pd
+
+
+REACTOR_COLUMNS = ["prototype", "enter_time", "exit_time", "transmutes",
+                   "solves", "steps", "assemblies", "materials",
+                   "solve_s"]
+
+TIMELINE_COLUMNS = ["time", "transmutes", "solves", "in_flight", "solve_s",
+                    "wall_s"]
+
+
+def read_reactors(root):
+    '''
+    Get the inputs used for the estimate of each DepleteReactor
+    prototype in a Cyclus input
+
+    Parameters:
+    -----------
+    root: xml.etree.ElementTree.Element
+        root of the Cyclus input
+
+    Returns:
+    --------
+    reactors: dict
+        inputs of each prototype, keys are the prototype names
+    '''
+    reactors = {}
+    for facility in root.findall("facility"):
+        config = facility.find("config/DepleteReactor")
+        if config is None:
+            continue
+        reactors[facility.findtext("name").strip()] = {
+            "lifetime": int(facility.findtext("lifetime", "-1")),
+            "cycle_time": int(config.findtext("cycle_time")),
+            "refuel_time": int(config.findtext("refuel_time")),
+            "n_assem_core": int(config.findtext("n_assem_core")),
+            "n_assem_batch": int(config.findtext("n_assem_batch")),
+            "depletion_mode": config.findtext("depletion_mode",
+                                              "openmc").strip(),
+            "async_depletion": config.findtext(
+                "async_depletion", "false").strip().lower() in ["true", "1"],
+            "incremental_depletion": config.findtext(
+                "incremental_depletion",
+                "false").strip().lower() in ["true", "1"],
+            "homogenize_batches": config.findtext(
+                "homogenize_batches",
+                "false").strip().lower() in ["true", "1"],
+            "transmute_budget": float(config.findtext("transmute_budget",
+                                                      "0")),
+            "model_path": config.findtext("model_path", "").strip(),
+            "chain_file": config.findtext("chain_file", "").strip(),
+            "assembly_template": config.findtext("assembly_template",
+                                                 "").strip()}
+    return reactors
+
+
+def read_deployments(root, prototypes):
+    '''
+    Get the facilities of some prototypes deployed by the institutions
+    of a Cyclus input, from the initial facility lists and the build
+    lists of DeployInst institutions
+
+    Parameters:
+    -----------
+    root: xml.etree.ElementTree.Element
+        root of the Cyclus input
+    prototypes: dict
+        lifetime of each prototype to find
+
+    Returns:
+    --------
+    deployments: list of tuples
+        (prototype, enter time, lifetime) of each facility, in the
+        order of the input
+    '''
+    deployments = []
+    for institution in root.iter("institution"):
+        for entry in institution.findall("initialfacilitylist/entry"):
+            prototype = entry.findtext("prototype").strip()
+            if prototype in prototypes:
+                deployments += [(prototype, 0, prototypes[prototype])] * \
+                    int(entry.findtext("number"))
+        config = institution.find("config/DeployInst")
+        if config is None:
+            continue
+        names = [val.text.strip() for val in config.findall("prototypes/val")]
+        build_times = [int(val.text)
+                       for val in config.findall("build_times/val")]
+        n_build = [int(val.text) for val in config.findall("n_build/val")]
+        lifetimes = [int(val.text) for val in config.findall("lifetimes/val")]
+        for ii, prototype in enumerate(names):
+            if prototype not in prototypes:
+                continue
+            lifetime = lifetimes[ii] if lifetimes else prototypes[prototype]
+            deployments += [(prototype, build_times[ii], lifetime)] * \
+                n_build[ii]
+    return deployments
+
+
+def transmute_times(enter_time, lifetime, cycle_time, refuel_time, duration):
+    '''
+    Get the time steps of the calls to ``DepleteReactor.transmute`` of
+    a reactor that always gets fuel, following its tick and tock
+    logic. A cycle ends cycle_time time steps after it starts, and the
+    next cycle starts refuel_time time steps later. A reactor retired
+    during a cycle transmutes its core for the part of the cycle that
+    was completed.
+
+    Parameters:
+    -----------
+    enter_time: int
+        time step the reactor is deployed
+    lifetime: int
+        number of time steps the reactor operates, -1 if it is never
+        retired
+    cycle_time: int
+        length of a cycle (time steps)
+    refuel_time: int
+        length of a refueling (time steps)
+    duration: int
+        number of time steps of the simulation
+
+    Returns:
+    --------
+    transmutes: list of tuples
+        (time step, number of time steps depleted) of each transmute
+    '''
+    exit_time = enter_time + lifetime - 1 if lifetime >= 0 else -1
+    transmutes = []
+    cycle_step = 0
+    for t in range(enter_time, duration):
+        if (exit_time != -1) and (t > exit_time):
+            if 0 < cycle_step <= cycle_time:
+                transmutes.append((t, cycle_step))
+            break
+        if cycle_step == cycle_time:
+            transmutes.append((t, cycle_time))
+        if cycle_step >= cycle_time + refuel_time:
+            cycle_step = 0
+        cycle_step += 1
+    return transmutes
+
+
+def core_materials(reactor):
+    '''
+    Get the number of materials depleted by each solve of a reactor:
+    one for each assembly, or one for each batch of assemblies if
+    homogenize_batches is True
+    '''
+    if reactor["homogenize_batches"]:
+        return min(reactor["n_assem_core"],
+                   math.ceil(reactor["n_assem_core"] /
+                             max(reactor["n_assem_batch"], 1)))
+    return reactor["n_assem_core"]
+
+
+def solve_cost(cost, materials, steps):
+    '''
+    Get the wall time of a depletion solve from a calibrated cost
+
+    Parameters:
+    -----------
+    cost: dict
+        overhead (s) of a solve, and time (s) for each material and
+        time step, from ``calibrate``
+    materials: int
+        number of materials depleted
+    steps: int
+        number of time steps depleted
+
+    Returns:
+    --------
+    float: wall time of the solve (s)
+    '''
+    return cost["overhead"] + cost["per_unit"] * materials * steps
+
+
+def reactor_solves(reactor, transmutes, cost=None):
+    '''
+    Get the depletion solves of a reactor. Each transmute is one
+    solve, unless the depletion mode is 'table'; with
+    incremental_depletion, the core is depleted by one solve of one
+    time step at each time step of the cycle instead. A solve is in
+    flight from the start of its cycle if async_depletion is True,
+    and otherwise only during its time step.
+
+    Parameters:
+    -----------
+    reactor: dict
+        inputs of the prototype, from ``read_reactors``
+    transmutes: list of tuples
+        (time step, number of time steps depleted) of each transmute
+    cost: dict
+        calibrated solve cost, from ``calibrate``. The solve times
+        are NaN if not given.
+
+    Returns:
+    --------
+    solves: list of tuples
+        (start time step, end time step, time steps depleted, wall
+        time in s) of each solve
+    '''
+    if reactor["depletion_mode"] == "table":
+        return []
+    materials = core_materials(reactor)
+    solves = []
+    for t, steps in transmutes:
+        if reactor["incremental_depletion"]:
+            parts = [(t - steps + ii, 1) for ii in range(steps)]
+        else:
+            parts = [(t, steps)]
+        for end, part_steps in parts:
+            wall = np.nan if cost is None else solve_cost(cost, materials,
+                                                          part_steps)
+            if reactor["transmute_budget"] > 0:
+                wall = min(wall, reactor["transmute_budget"])
+            start = end - steps if reactor["async_depletion"] and \
+                not reactor["incremental_depletion"] else end
+            solves.append((start, end, part_steps, wall))
+    return solves
+
+
+def estimate(input_file, costs=None):
+    '''
+    Estimate the transmutes, solves and wall time of the DepleteReactor
+    facilities of a Cyclus input
+
+    Parameters:
+    -----------
+    input_file: str
+        Cyclus input file
+    costs: dict
+        calibrated solve cost of each prototype, from ``calibrate``.
+        The wall times are NaN for the prototypes without a cost.
+
+    Returns:
+    --------
+    reactors: pandas.DataFrame
+        one row for each deployed reactor, with the columns in
+        ``REACTOR_COLUMNS``. materials is the number of materials of
+        each solve and solve_s the total time of the solves (s).
+    timeline: pandas.DataFrame
+        one row for each time step, with the columns in
+        ``TIMELINE_COLUMNS``. in_flight is the number of depletions
+        running during the time step and wall_s the time the solves
+        ending in the time step add to the run (s): the sum of their
+        times, or their longest time if they all ran in the
+        background.
+    '''
+    root = ET.parse(input_file).getroot()
+    duration = int(root.findtext("control/duration"))
+    prototypes = read_reactors(root)
+    costs = costs or {}
+    rows = []
+    timeline = pd.DataFrame(0.0, index=np.arange(duration),
+                            columns=TIMELINE_COLUMNS[1:])
+    blocking = np.zeros(duration)
+    background = np.zeros(duration)
+    for prototype, enter_time, lifetime in read_deployments(
+            root, {name: reactor["lifetime"]
+                   for name, reactor in prototypes.items()}):
+        reactor = prototypes[prototype]
+        transmutes = transmute_times(enter_time, lifetime,
+                                     reactor["cycle_time"],
+                                     reactor["refuel_time"], duration)
+        solves = reactor_solves(reactor, transmutes, costs.get(prototype))
+        full_cycles = sum(steps == reactor["cycle_time"]
+                          for _, steps in transmutes)
+        walls = np.array([wall for _, _, _, wall in solves])
+        rows.append({
+            "prototype": prototype,
+            "enter_time": enter_time,
+            "exit_time": enter_time + lifetime - 1 if lifetime >= 0 else -1,
+            "transmutes": len(transmutes),
+            "solves": len(solves),
+            "steps": sum(steps for _, steps in transmutes),
+            "assemblies": reactor["n_assem_core"] + full_cycles *
+            reactor["n_assem_batch"],
+            "materials": core_materials(reactor) if solves else 0,
+            "solve_s": walls.sum()})
+        for t, _ in transmutes:
+            timeline.loc[t, "transmutes"] += 1
+        for start, end, _, wall in solves:
+            timeline.loc[end, "solves"] += 1
+            timeline.loc[max(start, 0):end, "in_flight"] += 1
+            timeline.loc[end, "solve_s"] += wall
+            if reactor["async_depletion"]:
+                background[end] = max(background[end], wall)
+            else:
+                blocking[end] += wall
+    timeline["wall_s"] = blocking + background
+    timeline = timeline.rename_axis("time").reset_index()
+    for column in ["transmutes", "solves", "in_flight"]:
+        timeline[column] = timeline[column].astype(int)
+    return pd.DataFrame(rows, columns=REACTOR_COLUMNS), timeline
+
+
+def calibration_key(job):
+    '''
+    Get the key of a calibration, from the contents of the model files
+    of a depletion job and the number of materials
+    '''
+    from openmcyclus.checkpoint import file_hash
+
+    hashes = [file_hash(job["path"] + name)
+              for name in [job["chain_file"], "micro_xs.csv", "materials.xml"]
+              if os.path.exists(job["path"] + name)]
+    return "/".join(hashes + [job.get("assembly_template", ""),
+                              str(len(job["comp_list"]))])
+
+
+def calibrate(job, steps=2, repeats=1):
+    '''
+    Measure the cost of depletion solves of a job with ``run_job``. A
+    first solve reads the model files into the caches, as in a
+    Cyclus run. Then a solve of one material and one time step, and a
+    solve of all of the materials for ``steps`` time steps, are timed,
+    and the cost is fitted as overhead + per_unit * materials * steps.
+
+    Parameters:
+    -----------
+    job: dict
+        depletion job, e.g. from ``regression.read_cases``
+    steps: int
+        number of time steps of the larger solve
+    repeats: int
+        number of times each solve is timed. The fastest time is used.
+
+    Returns:
+    --------
+    cost: dict
+        overhead (s) and per_unit (s per material and time step)
+    '''
+    from openmcyclus.depletion import run_job
+
+    def timed(n_materials, n_steps):
+        part = dict(job, comp_list=job["comp_list"][:n_materials],
+                    steps=n_steps)
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            run_job(part)
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    timed(1, 1)
+    units = len(job["comp_list"]) * steps
+    small = timed(1, 1)
+    large = timed(len(job["comp_list"]), steps)
+    per_unit = max(large - small, 0.0) / (units - 1) if units > 1 else 0.0
+    return {"overhead": max(small - per_unit, 0.0), "per_unit": per_unit}
+
+
+def load_calibration(filename):
+    '''
+    Read calibrated costs from a JSON file, or an empty dict if the
+    file does not exist
+    '''
+    if (filename is None) or (not os.path.exists(filename)):
+        return {}
+    with open(filename) as f:
+        return json.load(f)
+
+
+def calibrate_input(input_file, calibration=None, steps=2, repeats=1,
+                    measure=True):
+    '''
+    Get the solve cost of each DepleteReactor prototype of a Cyclus
+    input. Costs are calibrated once for each set of model files and
+    core size, and reused from the calibration file after that.
+
+    Parameters:
+    -----------
+    input_file: str
+        Cyclus input file
+    calibration: dict
+        cost of each calibration key, from earlier calibrations.
+        Updated in place with the new calibrations.
+    steps: int
+        number of time steps of the larger calibration solve
+    repeats: int
+        number of times each calibration solve is timed
+    measure: bool
+        if False, only the costs in calibration are used, and the
+        prototypes without one are left out
+
+    Returns:
+    --------
+    costs: dict
+        cost of each prototype, for ``estimate``
+    '''
+    from openmcyclus.regression import read_cases
+
+    calibration = {} if calibration is None else calibration
+    costs = {}
+    for name, job in read_cases(input_file).items():
+        prototype = name.split("/")[1]
+        if prototype in costs:
+            continue
+        key = calibration_key(job)
+        if key not in calibration:
+            if not measure:
+                continue
+            calibration[key] = calibrate(job, steps, repeats)
+        costs[prototype] = calibration[key]
+    return costs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Estimate the depletion solves and wall time of a "
+        "Cyclus input with DepleteReactor facilities")
+    parser.add_argument("input_file", help="Cyclus input file")
+    parser.add_argument("--calibrate", action="store_true",
+                        help="time depletion solves of the models that "
+                        "are not in the calibration file")
+    parser.add_argument("--calibration", default=None,
+                        help="JSON file of calibrated solve costs, "
+                        "written after --calibrate")
+    parser.add_argument("--steps", type=int, default=2,
+                        help="time steps of the larger calibration solve")
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--timeline", default=None,
+                        help="CSV file for the estimate of each time step")
+    args = parser.parse_args()
+
+    calibration = load_calibration(args.calibration)
+    costs = {}
+    if args.calibrate or calibration:
+        costs = calibrate_input(args.input_file, calibration, args.steps,
+                                args.repeats, measure=args.calibrate)
+        if args.calibrate and args.calibration:
+            with open(args.calibration, "w") as f:
+                json.dump(calibration, f, indent=2)
+    reactors, timeline = estimate(args.input_file, costs)
+    if args.timeline:
+        timeline.to_csv(args.timeline, index=False)
+    print(reactors.to_string(index=False))
+    print(str(len(reactors)) + " reactors, " +
+          str(int(reactors["transmutes"].sum())) + " transmutes, " +
+          str(int(reactors["solves"].sum())) + " solves, peak of " +
+          str(int(timeline["in_flight"].max()) if len(timeline) else 0) +
+          " depletions at once")
+    if costs:
+        print("Estimated solve time " +
+              str(round(float(timeline["solve_s"].sum()), 1)) +
+              " s, wall time added to the run " +
+              str(round(float(timeline["wall_s"].sum()), 1)) + " s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
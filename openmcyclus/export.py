@@ -0,0 +1,251 @@
+'''
+Stream the inputs and outputs of each ``DepleteReactor.transmute`` to
+Parquet or Arrow files, for analyses that do not fit in the Cyclus
+output database. Each transmute is written as one row group, with one
+row for each assembly, so the file grows during the run and is never
+held in memory. The schema is fixed when the file is opened: scalar
+columns for the reactor, the assembly and the depletion, and one
+fresh and one spent mass column for each nuclide of the depletion
+chain. The masses of nuclides that are not in the chain are added to
+the FreshOther and SpentOther columns.
+
+``pyarrow`` is only needed if ``export_file`` is used. Read the files
+with e.g. ``pyarrow.dataset.dataset(path)`` or ``pandas.read_parquet``.
+'''
+import atexit
+import numpy as np
+
+
+SCALAR_COLUMNS = [("AgentId", "int64"), ("Time", "int64"),
+                  ("AssemblyId", "int64"), ("Steps", "int64"),
+                  ("Source", "string"), ("Flux", "float64"),
+                  ("Power", "float64"), ("Mass", "float64"),
+                  ("Burnup", "float64"), ("SolveTime", "float64"),
+                  ("FreshOther", "float64"), ("SpentOther", "float64")]
+
+_exporters = {}
+
+
+def nuclide_masses(comps, quantities, nuclides):
+    '''
+    Get the mass of each nuclide in each assembly, from the
+    compositions and the assembly masses
+
+    Parameters:
+    -----------
+    comps: list of dicts
+        compositions, keys are nuclide ids and values are masses or
+        mass fractions
+    quantities: list of floats
+        mass of each assembly (kg)
+    nuclides: numpy.ndarray of ints
+        sorted nuclide ids of the columns
+
+    Returns:
+    --------
+    masses: numpy.ndarray
+        array of shape (len(comps), len(nuclides)) with the mass of
+        each nuclide (kg)
+    other: numpy.ndarray
+        mass of the nuclides of each assembly that are not in
+        nuclides (kg)
+    '''
+    masses = np.zeros((len(comps), len(nuclides)))
+    other = np.zeros(len(comps))
+    for row, (comp, quantity) in enumerate(zip(comps, quantities)):
+        keys = np.fromiter(comp.keys(), dtype=np.int64, count=len(comp))
+        values = np.fromiter(comp.values(), dtype=np.float64,
+                             count=len(comp))
+        total = values.sum()
+        if total <= 0:
+            continue
+        values = values * quantity / total
+        columns = np.searchsorted(nuclides, keys)
+        columns[columns == len(nuclides)] = 0
+        found = (nuclides[columns] == keys) if len(nuclides) else \
+            np.zeros(len(keys), dtype=bool)
+        masses[row, columns[found]] = values[found]
+        other[row] = values[~found].sum()
+    return masses, other
+
+
+def transmute_columns(nuclides, agent_id, time, assembly_ids, steps, source,
+                      flux, power, quantities, burnups, solve_time,
+                      fresh_comps, spent_comps):
+    '''
+    Get the columns of the rows written for one transmute
+
+    Parameters:
+    -----------
+    nuclides: numpy.ndarray of ints
+        sorted nuclide ids of the mass columns
+    agent_id: int
+        id of the reactor
+    time: int
+        time step of the transmute
+    assembly_ids: list of ints
+        obj_id of each assembly
+    steps: int
+        number of time steps depleted
+    source: str
+        how the spent compositions were found, e.g. openmc, table or
+        equilibrium
+    flux: float
+        one-group flux (n/cm2s)
+    power: float
+        thermal power of the reactor (MW)
+    quantities: list of floats
+        mass of each assembly (kg)
+    burnups: list of floats
+        burnup of each assembly after the transmute (MWd/kgHM)
+    solve_time: float
+        wall time to find the spent compositions (s)
+    fresh_comps: list of dicts
+        composition of each assembly before the transmute
+    spent_comps: list of dicts
+        composition of each assembly after the transmute
+
+    Returns:
+    --------
+    dict
+        numpy array for each column, in schema order
+    '''
+    n_rows = len(assembly_ids)
+    fresh, fresh_other = nuclide_masses(fresh_comps, quantities, nuclides)
+    spent, spent_other = nuclide_masses(spent_comps, quantities, nuclides)
+    columns = {"AgentId": np.full(n_rows, agent_id, dtype=np.int64),
+               "Time": np.full(n_rows, time, dtype=np.int64),
+               "AssemblyId": np.asarray(assembly_ids, dtype=np.int64),
+               "Steps": np.full(n_rows, steps, dtype=np.int64),
+               "Source": np.full(n_rows, source, dtype=object),
+               "Flux": np.full(n_rows, flux, dtype=np.float64),
+               "Power": np.full(n_rows, power, dtype=np.float64),
+               "Mass": np.asarray(quantities, dtype=np.float64),
+               "Burnup": np.asarray(burnups, dtype=np.float64),
+               "SolveTime": np.full(n_rows, solve_time, dtype=np.float64),
+               "FreshOther": fresh_other,
+               "SpentOther": spent_other}
+    for ii, nuclide in enumerate(nuclides):
+        columns["Fresh_" + str(nuclide)] = fresh[:, ii]
+    for ii, nuclide in enumerate(nuclides):
+        columns["Spent_" + str(nuclide)] = spent[:, ii]
+    return columns
+
+
+class Exporter(object):
+    def __init__(self, filename, nuclides):
+        '''
+        Writer of transmute rows to a Parquet file, or to an Arrow IPC
+        stream if the file name ends in .arrow. Parquet files are only
+        readable after ``close``; Arrow streams can be read up to the
+        last row group written.
+
+        Parameters:
+        -----------
+        filename: str
+            name of the file to write. An existing file is replaced.
+        nuclides: array of ints
+            nuclide ids of the mass columns
+
+        Attributes:
+        -----------
+        filename: str
+            name of the file
+        nuclides: numpy.ndarray of ints
+            sorted nuclide ids of the mass columns
+        schema: pyarrow.Schema
+            columns of the file
+        rows: int
+            number of rows written
+        '''
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("pyarrow is needed to export the transmute "
+                              "results to " + filename)
+        self.filename = filename
+        self.nuclides = np.unique(np.asarray(nuclides, dtype=np.int64))
+        fields = [pa.field(name, getattr(pa, dtype)())
+                  for name, dtype in SCALAR_COLUMNS]
+        fields += [pa.field(prefix + str(nuclide), pa.float64())
+                   for prefix in ["Fresh_", "Spent_"]
+                   for nuclide in self.nuclides]
+        self.schema = pa.schema(fields)
+        self.rows = 0
+        if filename.endswith(".arrow"):
+            import pyarrow.ipc as ipc
+            self.sink = pa.OSFile(filename, "wb")
+            self.writer = ipc.new_stream(self.sink, self.schema)
+        else:
+            import pyarrow.parquet as pq
+            self.sink = None
+            self.writer = pq.ParquetWriter(filename, self.schema)
+
+    def write(self, columns):
+        '''
+        Write the rows of one transmute as a row group
+
+        Parameters:
+        -----------
+        columns: dict
+            numpy array for each column, from ``transmute_columns``
+        '''
+        import pyarrow as pa
+
+        batch = pa.RecordBatch.from_arrays(
+            [pa.array(columns[field.name], type=field.type)
+             for field in self.schema], schema=self.schema)
+        if self.sink is None:
+            self.writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            self.writer.write_batch(batch)
+            self.sink.flush()
+        self.rows += batch.num_rows
+
+    def close(self):
+        '''
+        Finish the file
+        '''
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            if self.sink is not None:
+                self.sink.close()
+
+
+def get_exporter(filename, nuclides):
+    '''
+    Get the exporter writing to a file, opening it the first time.
+    Reactors exporting to the same file share one exporter, and must
+    use the same nuclides.
+
+    Parameters:
+    -----------
+    filename: str
+        name of the file
+    nuclides: array of ints
+        nuclide ids of the mass columns
+
+    Returns:
+    --------
+    Exporter
+    '''
+    exporter = _exporters.get(filename)
+    if exporter is None:
+        exporter = Exporter(filename, nuclides)
+        _exporters[filename] = exporter
+    elif not np.array_equal(exporter.nuclides, np.unique(nuclides)):
+        raise ValueError("Reactors exporting to " + filename +
+                         " have different nuclides")
+    return exporter
+
+
+@atexit.register
+def close_all():
+    '''
+    Close all of the exporters of this process. This is called at
+    exit, and must be called by processes that end without running
+    the exit handlers, e.g. forked pool processes.
+    '''
+    while _exporters:
+        _exporters.popitem()[1].close()
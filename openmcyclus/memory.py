@@ -0,0 +1,107 @@
+'''
+Memory use of a Cyclus process with DepleteReactor agents. The
+resident set size and the largest Python allocations found by
+``tracemalloc`` are sampled by each reactor every ``memory_interval``
+time steps and written to the ReactorMemory and ReactorAllocations
+tables of the output database.
+'''
+import gc
+import os
+import sys
+import tracemalloc
+
+
+_sample = None
+
+
+def rss():
+    '''
+    Get the resident set size of this process. It is read from /proc
+    on Linux, from ``psutil`` if it is installed, and otherwise the
+    peak resident set size is used.
+
+    Returns:
+    --------
+    float: resident set size (MB)
+    '''
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kB elsewhere
+        return peak / 1024 ** (2 if sys.platform == "darwin" else 1)
+    return psutil.Process().memory_info().rss / 1024 ** 2
+
+
+def start_tracing(frames=1):
+    '''
+    Start tracing Python allocations with ``tracemalloc``, if it is
+    not already tracing. Only allocations made after this are traced.
+
+    Parameters:
+    -----------
+    frames: int
+        number of frames stored for each allocation
+    '''
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def sample(time, n_top=5):
+    '''
+    Sample the memory use of this process. The sample is cached for
+    the time step, so all reactors sampled at the same time step share
+    one ``tracemalloc`` snapshot.
+
+    Parameters:
+    -----------
+    time: int
+        current time step
+    n_top: int
+        number of allocation sites to report. If 0, no snapshot is
+        taken.
+
+    Returns:
+    --------
+    dict
+        rss: resident set size (MB), traced: memory traced by
+        tracemalloc (MB), peak: peak traced memory (MB), and top: list
+        of (location, size in MB, number of blocks) for the largest
+        allocation sites
+    '''
+    global _sample
+    if (_sample is not None) and (_sample[0] == (time, n_top)):
+        return _sample[1]
+    result = {"rss": rss(), "traced": 0.0, "peak": 0.0, "top": []}
+    if tracemalloc.is_tracing():
+        traced, peak = tracemalloc.get_traced_memory()
+        result["traced"] = traced / 1024 ** 2
+        result["peak"] = peak / 1024 ** 2
+        if n_top > 0:
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [tracemalloc.Filter(False, tracemalloc.__file__)])
+            result["top"] = [(str(stat.traceback[0]), stat.size / 1024 ** 2,
+                              stat.count)
+                             for stat in snapshot.statistics("lineno")[:n_top]]
+    _sample = ((time, n_top), result)
+    return result
+
+
+def release():
+    '''
+    Free the objects left from a depletion. The OpenMC operator,
+    integrator and results objects refer to each other, so they are
+    only freed by the garbage collector.
+
+    Returns:
+    --------
+    int: number of unreachable objects found
+    '''
+    return gc.collect()
@@ -0,0 +1,144 @@
+import atexit
+import multiprocessing
+import os
+
+
+# Environment variables that set the number of threads used by the
+# BLAS libraries that NumPy and SciPy may be linked against
+BLAS_VARIABLES = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+                  "MKL_NUM_THREADS", "BLIS_NUM_THREADS",
+                  "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+# Persistent pools by (processes, blas_threads), and the process that
+# created them
+_pools = {}
+_pools_pid = None
+
+
+class _SharedPool(object):
+    def __init__(self, pool):
+        '''
+        Context manager that gives the persistent pool to
+        ``openmc.deplete.pool``, which uses ``with Pool(n) as pool``,
+        without terminating it at the end of the block.
+
+        Parameters:
+        -----------
+        pool: multiprocessing.pool.Pool
+            persistent pool
+        '''
+        self.pool = pool
+
+    def __enter__(self):
+        return self.pool
+
+    def __exit__(self, *args):
+        return False
+
+
+def set_blas_threads(n_threads):
+    '''
+    Limit the number of threads used by the BLAS libraries in this
+    process. The environment variables are set for any libraries that
+    are loaded later and for new processes, and ``threadpoolctl`` is
+    used for libraries that are already loaded, if it is installed.
+
+    Parameters:
+    -----------
+    n_threads: int
+        number of threads. Nothing is changed if it is less than 1.
+    '''
+    if (n_threads is None) or (n_threads < 1):
+        return
+    for variable in BLAS_VARIABLES:
+        os.environ[variable] = str(n_threads)
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    threadpool_limits(limits=n_threads, user_api="blas")
+
+
+def get_pool(processes=None, blas_threads=None):
+    '''
+    Get the persistent pool of worker processes for a number of
+    processes and BLAS threads. One pool is kept for each of these
+    configurations, so reactors with different settings each reuse
+    their own pool. A pool is created the first time it is needed,
+    and again if it was created by another process (e.g. before a
+    fork). Workers are forked because Cyclus embeds the Python
+    interpreter.
+
+    Parameters:
+    -----------
+    processes: int
+        number of worker processes. Defaults to the number of CPUs.
+    blas_threads: int
+        number of BLAS threads in each worker. Not changed if None.
+
+    Returns:
+    --------
+    multiprocessing.pool.Pool
+    '''
+    global _pools_pid
+    if _pools_pid != os.getpid():
+        shutdown()
+        _pools_pid = os.getpid()
+    config = (processes, blas_threads)
+    if config not in _pools:
+        context = multiprocessing.get_context("fork")
+        _pools[config] = context.Pool(processes,
+                                      initializer=set_blas_threads,
+                                      initargs=(blas_threads,))
+    return _pools[config]
+
+
+def shutdown():
+    '''
+    Terminate the persistent pools, if they were created by this
+    process
+    '''
+    global _pools_pid
+    if _pools_pid == os.getpid():
+        for pool in _pools.values():
+            pool.terminate()
+            pool.join()
+    _pools.clear()
+    _pools_pid = None
+
+
+def configure(processes=0, blas_threads=0):
+    '''
+    Set how ``openmc.deplete`` runs the matrix exponentials of the
+    materials. By default OpenMC creates a new pool with one process
+    per CPU for each depletion step. Instead, the step uses a
+    persistent pool that is reused by every depletion in the process
+    with the same settings. The settings of ``openmc.deplete`` are
+    shared by the whole process, so this is called before each
+    depletion with the settings of its reactor.
+
+    Parameters:
+    -----------
+    processes: int
+        number of processes for the matrix exponentials. If 1, they
+        are run in this process, without a pool. If 0, the number of
+        CPUs is used.
+    blas_threads: int
+        number of BLAS threads in this process and in each worker.
+        If 0, the number of threads is not changed.
+    '''
+    from openmc.deplete import pool
+
+    set_blas_threads(blas_threads)
+    processes = processes if processes > 0 else None
+    blas_threads = blas_threads if blas_threads > 0 else None
+    pool.NUM_PROCESSES = processes
+    if processes == 1:
+        pool.USE_MULTIPROCESSING = False
+        return
+    pool.USE_MULTIPROCESSING = True
+    pool.Pool = lambda *args, **kwargs: _SharedPool(
+        get_pool(processes, blas_threads))
+
+
+atexit.register(shutdown)
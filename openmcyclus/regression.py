@@ -0,0 +1,318 @@
+'''
+Golden results for checking that faster depletion paths give the same
+spent compositions. Reference spent compositions are captured once
+from ``run_job`` for the DepleteReactor facilities in Cyclus input
+files (e.g. the ``examples/`` scenarios), and any other path is
+compared to them nuclide by nuclide, with absolute and relative
+tolerances. The worst offenders and the speed ratio of each case are
+reported in one table.
+
+Capture the golden results, then compare another path to them:
+
+    $ python -m openmcyclus.regression capture examples/simple.xml \\
+        examples/complex.xml --out golden.npz
+    $ python -m openmcyclus.regression compare golden.npz \\
+        --set processes=4 --rtol 1e-6 --out report.csv
+'''
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+import numpy as np
+import pandas as pd
+from openmcyclus.checkpoint import (comps_to_array, array_to_comps, save,
+                                    load)
+from openmcyclus.compositions import recipe_comp
+
+
+# Default Cyclus time step (s)
+CYCLUS_DT = 2629846
+
+REPORT_COLUMNS = ["case", "assembly", "nuclide", "reference", "candidate",
+                  "abs_error", "rel_error", "passed", "reference_s",
+                  "candidate_s", "speedup"]
+
+
+def read_cases(input_file, model_path=None):
+    '''
+    Get a depletion job for each DepleteReactor facility and fresh
+    fuel recipe in a Cyclus input file. The core is filled with
+    n_assem_core assemblies of the recipe and depleted for cycle_time
+    time steps, as in ``DepleteReactor.transmute``. The recipes are
+    read as mass fractions, see ``compositions.recipe_comp``.
+
+    Parameters:
+    -----------
+    input_file: str
+        Cyclus input file
+    model_path: str
+        model_path used instead of the one in the input file
+
+    Returns:
+    --------
+    cases: dict
+        depletion job for ``run_job`` for each case, with keys
+        <input file name>/<facility name>/<recipe name>
+    '''
+    root = ET.parse(input_file).getroot()
+    dt = float(root.findtext("control/dt", CYCLUS_DT))
+    recipes = {recipe.findtext("name"): recipe_comp(recipe)
+               for recipe in root.findall("recipe")}
+    stem = os.path.splitext(os.path.basename(input_file))[0]
+    cases = {}
+    for facility in root.findall("facility"):
+        config = facility.find("config/DepleteReactor")
+        if config is None:
+            continue
+        path = model_path or config.findtext("model_path")
+        for recipe in config.findall("fuel_inrecipes/val"):
+            name = "/".join([stem, facility.findtext("name"),
+                             recipe.text.strip()])
+            n_assem = int(config.findtext("n_assem_core"))
+            cases[name] = {
+                "comp_list": [recipes[recipe.text.strip()]] * n_assem,
+                "chain_file": config.findtext("chain_file"),
+                "path": os.path.join(path, ""),
+                "power": float(config.findtext("thermal_power")),
+                "flux": float(config.findtext("flux")),
+                "dt": dt,
+                "steps": int(config.findtext("cycle_time")),
+                "assembly_template": config.findtext("assembly_template",
+                                                     "")}
+    return cases
+
+
+def run_cases(cases, solve=None, overrides=None):
+    '''
+    Deplete each case and time it
+
+    Parameters:
+    -----------
+    cases: dict
+        depletion job for each case
+    solve: function
+        called with a job and returning the spent compositions.
+        Defaults to ``openmcyclus.depletion.run_job``.
+    overrides: dict
+        job values that replace those of every case
+
+    Returns:
+    --------
+    results: dict
+        (spent compositions, wall time in s) for each case
+    '''
+    if solve is None:
+        from openmcyclus.depletion import run_job as solve
+    results = {}
+    for name, job in cases.items():
+        job = dict(job, **(overrides or {}))
+        start = time.perf_counter()
+        spent_comps = solve(job)
+        results[name] = (list(spent_comps), time.perf_counter() - start)
+    return results
+
+
+def save_golden(filename, cases, results):
+    '''
+    Write the cases and their reference spent compositions to an npz
+    file
+
+    Parameters:
+    -----------
+    filename: str
+        name of the golden file
+    cases: dict
+        depletion job for each case
+    results: dict
+        (spent compositions, wall time in s) for each case, from
+        ``run_cases``
+    '''
+    arrays = {"cases": np.array(json.dumps(cases))}
+    for ii, name in enumerate(cases):
+        spent_comps, wall_time = results[name]
+        nuclides, masses = comps_to_array(spent_comps)
+        arrays["nuclides_" + str(ii)] = nuclides
+        arrays["masses_" + str(ii)] = masses
+        arrays["time_" + str(ii)] = np.array(wall_time)
+    save(filename, arrays)
+
+
+def load_golden(filename):
+    '''
+    Read a golden file written by ``save_golden``
+
+    Parameters:
+    -----------
+    filename: str
+        name of the golden file
+
+    Returns:
+    --------
+    cases: dict
+        depletion job for each case
+    results: dict
+        (reference spent compositions, wall time in s) for each case
+    '''
+    arrays = load(filename)
+    cases = json.loads(str(arrays["cases"]))
+    results = {}
+    for ii, name in enumerate(cases):
+        # JSON keys are strings
+        cases[name]["comp_list"] = [
+            {int(nuc): mass for nuc, mass in comp.items()}
+            for comp in cases[name]["comp_list"]]
+        results[name] = (array_to_comps(arrays["nuclides_" + str(ii)],
+                                        arrays["masses_" + str(ii)]),
+                         float(arrays["time_" + str(ii)]))
+    return cases, results
+
+
+def compare_comps(reference, candidate, atol=0.0, rtol=1e-6):
+    '''
+    Compare spent compositions nuclide by nuclide. A nuclide that is
+    only in one of the compositions has a mass of 0 in the other. A
+    nuclide passes if abs(candidate - reference) <= atol + rtol *
+    abs(reference).
+
+    Parameters:
+    -----------
+    reference: list of dicts
+        reference spent compositions
+    candidate: list of dicts
+        spent compositions to check, in the same order
+    atol: float
+        absolute tolerance
+    rtol: float
+        relative tolerance
+
+    Returns:
+    --------
+    pandas.DataFrame
+        assembly, nuclide, reference, candidate, abs_error, rel_error
+        and passed for each nuclide of each assembly
+    '''
+    if len(reference) != len(candidate):
+        raise ValueError(str(len(candidate)) + " compositions given, " +
+                         str(len(reference)) + " in the reference")
+    nuclides, masses = comps_to_array(list(reference) + list(candidate))
+    n_comps = len(reference)
+    ref, cand = masses[:n_comps], masses[n_comps:]
+    abs_error = np.abs(cand - ref)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rel_error = np.where(ref != 0, abs_error / np.abs(ref),
+                             np.where(abs_error > 0, np.inf, 0.0))
+    assembly, column = np.indices(ref.shape)
+    return pd.DataFrame({
+        "assembly": assembly.ravel(),
+        "nuclide": nuclides[column.ravel()],
+        "reference": ref.ravel(),
+        "candidate": cand.ravel(),
+        "abs_error": abs_error.ravel(),
+        "rel_error": rel_error.ravel(),
+        "passed": (abs_error <= atol + rtol * np.abs(ref)).ravel()})
+
+
+def report(reference, candidate, atol=0.0, rtol=1e-6, n_worst=10):
+    '''
+    Compare a path to the reference for each case, and get the worst
+    nuclides of each case with the speed ratio of the case
+
+    Parameters:
+    -----------
+    reference: dict
+        (reference spent compositions, wall time in s) for each case
+    candidate: dict
+        (spent compositions, wall time in s) for each case
+    atol: float
+        absolute tolerance
+    rtol: float
+        relative tolerance
+    n_worst: int
+        number of nuclides reported for each case, the failed nuclides
+        first, then by largest relative and absolute error
+
+    Returns:
+    --------
+    pandas.DataFrame
+        columns in ``REPORT_COLUMNS``. speedup is the reference time
+        over the candidate time.
+    '''
+    frames = []
+    for name, (ref_comps, ref_time) in reference.items():
+        cand_comps, cand_time = candidate[name]
+        errors = compare_comps(ref_comps, cand_comps, atol, rtol)
+        errors = errors.sort_values(["passed", "rel_error", "abs_error"],
+                                    ascending=[True, False, False])
+        errors = errors.head(n_worst).assign(
+            case=name, reference_s=ref_time, candidate_s=cand_time,
+            speedup=ref_time / cand_time if cand_time > 0 else np.inf)
+        frames.append(errors)
+    if len(frames) == 0:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+    return pd.concat(frames, ignore_index=True)[REPORT_COLUMNS]
+
+
+def import_solver(name):
+    '''
+    Import a function from a module:function string
+    '''
+    module, function = name.split(":")
+    return getattr(importlib.import_module(module), function)
+
+
+def parse_value(value):
+    '''
+    Parse a job value given on the command line as JSON, or keep it
+    as a string
+    '''
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Capture and compare golden depletion results")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    capture = subparsers.add_parser("capture")
+    capture.add_argument("inputs", nargs="+", help="Cyclus input files")
+    capture.add_argument("--model-path", default=None)
+    capture.add_argument("--out", default="golden.npz")
+    compare = subparsers.add_parser("compare")
+    compare.add_argument("golden")
+    compare.add_argument("--solver", default=None,
+                         help="module:function called with each job, "
+                         "defaults to openmcyclus.depletion:run_job")
+    compare.add_argument("--set", nargs="+", default=[],
+                         metavar="KEY=VALUE",
+                         help="job values to change, e.g. processes=4")
+    compare.add_argument("--atol", type=float, default=0.0)
+    compare.add_argument("--rtol", type=float, default=1e-6)
+    compare.add_argument("--n-worst", type=int, default=10)
+    compare.add_argument("--out", default=None, help="CSV report file")
+    args = parser.parse_args()
+
+    if args.command == "capture":
+        cases = {}
+        for input_file in args.inputs:
+            cases.update(read_cases(input_file, args.model_path))
+        save_golden(args.out, cases, run_cases(cases))
+        return 0
+    cases, reference = load_golden(args.golden)
+    overrides = dict(item.split("=", 1) for item in args.set)
+    overrides = {key: parse_value(value) for key, value in overrides.items()}
+    solve = import_solver(args.solver) if args.solver else None
+    candidate = run_cases(cases, solve, overrides)
+    table = report(reference, candidate, args.atol, args.rtol, args.n_worst)
+    if args.out:
+        table.to_csv(args.out, index=False)
+    print(table.to_string(index=False))
+    return 0 if table["passed"].all() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+import os
+import shutil
+import xml.etree.ElementTree as ET
+
+
+REACTOR_DEFAULTS = {
+    "assem_size": 10,
+    "cycle_time": 18,
+    "refuel_time": 1,
+    "n_assem_core": 3,
+    "n_assem_batch": 1,
+    "power_cap": 100,
+    "thermal_power": 100,
+    "flux": 10.4,
+}
+
+
+def write_materials(template_file, n_assem, out_file):
+    '''
+    Write an OpenMC materials file with one assembly material
+    per assembly in the core, by copying the first ``assembly_``
+    material of a template file. Any other materials in the
+    template are kept.
+
+    Parameters:
+    -----------
+    template_file: str
+        materials.xml file with at least one ``assembly_`` material
+    n_assem: int
+        number of assembly materials to write
+    out_file: str
+        name of the file to write
+
+    Returns:
+    --------
+    out_file: str
+        name of the file written
+    '''
+    tree = ET.parse(template_file)
+    root = tree.getroot()
+    assemblies = [material for material in root.findall('material')
+                  if 'assembly_' in material.get('name', '')]
+    if len(assemblies) == 0:
+        raise ValueError(
+            "No assembly_ material found in " + str(template_file))
+    others = [material for material in root.findall('material')
+              if material not in assemblies]
+    for material in root.findall('material'):
+        root.remove(material)
+
+    next_id = max(int(material.get('id'))
+                  for material in assemblies + others) + 1
+    for ii in range(n_assem):
+        material = ET.fromstring(ET.tostring(assemblies[0]))
+        material.set('id', str(next_id + ii))
+        material.set('name', 'assembly_' + str(ii + 1))
+        root.append(material)
+    for material in others:
+        root.append(material)
+    tree.write(out_file)
+    return out_file
+
+
+def write_model(model_source, model_dir, chain_file, n_assem):
+    '''
+    Create a directory with the files needed by a DepleteReactor:
+    a materials file sized for the core, the cross sections and
+    the depletion chain. The cross sections and chain are linked to
+    the originals where possible, because they are never modified.
+
+    Parameters:
+    -----------
+    model_source: str
+        directory holding materials.xml, micro_xs.csv and the chain file
+    model_dir: str
+        directory to create
+    chain_file: str
+        name of the depletion chain file
+    n_assem: int
+        number of assemblies in the core
+
+    Returns:
+    --------
+    model_dir: str
+        absolute path of the model directory, ending in a separator
+    '''
+    os.makedirs(model_dir, exist_ok=True)
+    write_materials(os.path.join(model_source, "materials.xml"), n_assem,
+                    os.path.join(model_dir, "materials.xml"))
+    for name in ["micro_xs.csv", chain_file]:
+        src = os.path.abspath(os.path.join(model_source, name))
+        dst = os.path.join(model_dir, name)
+        if os.path.lexists(dst):
+            os.remove(dst)
+        try:
+            os.symlink(src, dst)
+        except OSError:
+            shutil.copy(src, dst)
+    return os.path.join(os.path.abspath(model_dir), "")
+
+
+def _add_vals(parent, tag, vals):
+    element = ET.SubElement(parent, tag)
+    for val in vals:
+        ET.SubElement(element, "val").text = str(val)
+    return element
+
+
+def _add_spec(archetypes, lib, name):
+    spec = ET.SubElement(archetypes, "spec")
+    ET.SubElement(spec, "lib").text = lib
+    ET.SubElement(spec, "name").text = name
+
+
+def _add_recipe(root, name, comp):
+    recipe = ET.SubElement(root, "recipe")
+    ET.SubElement(recipe, "name").text = name
+    ET.SubElement(recipe, "basis").text = "mass"
+    for nuclide, frac in comp.items():
+        element = ET.SubElement(recipe, "nuclide")
+        ET.SubElement(element, "id").text = str(nuclide)
+        ET.SubElement(element, "comp").text = str(frac)
+
+
+def fleet_input(n_reactors, model_paths, chain_file="chain_endfb71_pwr.xml",
+                duration=120, dt=None, deploy_start=1, deploy_interval=1,
+                lifetime=-1, enrichment=0.0471, reactor_config=None):
+    '''
+    Build a Cyclus input with a fleet of DepleteReactor prototypes
+    supplied by a single uox source and discharging to a single sink.
+    Reactor ``ii`` is its own prototype, deployed by a cycamore
+    DeployInst at ``deploy_start + ii * deploy_interval``.
+
+    Parameters:
+    -----------
+    n_reactors: int
+        number of DepleteReactor prototypes
+    model_paths: str or list of strs
+        model_path for every reactor, or one model_path per reactor
+    chain_file: str
+        name of the depletion chain file
+    duration: int
+        number of time steps in the simulation
+    dt: int
+        length of a time step in seconds. The Cyclus default is used
+        if not given.
+    deploy_start: int
+        time step the first reactor is deployed
+    deploy_interval: int
+        time steps between consecutive deployments
+    lifetime: int
+        lifetime of each reactor in time steps, -1 for no retirement
+    enrichment: float
+        U235 mass fraction of the fresh fuel
+    reactor_config: dict
+        DepleteReactor input values that replace or add to
+        ``REACTOR_DEFAULTS``
+
+    Returns:
+    --------
+    tree: xml.etree.ElementTree.ElementTree
+        Cyclus input file
+    '''
+    if isinstance(model_paths, str):
+        model_paths = [model_paths] * n_reactors
+    if len(model_paths) != n_reactors:
+        raise ValueError("One model path is needed for each reactor")
+    config = dict(REACTOR_DEFAULTS)
+    config.update(reactor_config or {})
+
+    root = ET.Element("simulation")
+    control = ET.SubElement(root, "control")
+    ET.SubElement(control, "duration").text = str(duration)
+    ET.SubElement(control, "startmonth").text = "1"
+    ET.SubElement(control, "startyear").text = "2000"
+    if dt is not None:
+        ET.SubElement(control, "dt").text = str(dt)
+
+    archetypes = ET.SubElement(root, "archetypes")
+    _add_spec(archetypes, "cycamore", "Source")
+    _add_spec(archetypes, "cycamore", "Sink")
+    _add_spec(archetypes, "agents", "NullRegion")
+    _add_spec(archetypes, "cycamore", "DeployInst")
+    _add_spec(archetypes, "agents", "NullInst")
+    _add_spec(archetypes, "openmcyclus.DepleteReactor", "DepleteReactor")
+
+    facility = ET.SubElement(root, "facility")
+    ET.SubElement(facility, "name").text = "FuelSource"
+    source = ET.SubElement(ET.SubElement(facility, "config"), "Source")
+    ET.SubElement(source, "outcommod").text = "uox"
+    ET.SubElement(source, "outrecipe").text = "uox"
+
+    facility = ET.SubElement(root, "facility")
+    ET.SubElement(facility, "name").text = "FuelSink"
+    sink = ET.SubElement(ET.SubElement(facility, "config"), "Sink")
+    _add_vals(sink, "in_commods", ["spent_uox"])
+
+    prototypes = []
+    for ii in range(n_reactors):
+        name = "Reactor_" + str(ii + 1)
+        prototypes.append(name)
+        facility = ET.SubElement(root, "facility")
+        ET.SubElement(facility, "name").text = name
+        if lifetime != -1:
+            ET.SubElement(facility, "lifetime").text = str(lifetime)
+        reactor = ET.SubElement(
+            ET.SubElement(facility, "config"), "DepleteReactor")
+        _add_vals(reactor, "fuel_incommods", ["uox"])
+        _add_vals(reactor, "fuel_outcommods", ["spent_uox"])
+        _add_vals(reactor, "fuel_inrecipes", ["uox"])
+        _add_vals(reactor, "fuel_outrecipes", ["spent_uox"])
+        values = dict(config)
+        values["model_path"] = model_paths[ii]
+        values["chain_file"] = chain_file
+        for key, value in values.items():
+            if isinstance(value, (list, tuple)):
+                _add_vals(reactor, key, value)
+            else:
+                ET.SubElement(reactor, key).text = str(value)
+
+    region = ET.SubElement(root, "region")
+    ET.SubElement(ET.SubElement(region, "config"), "NullRegion")
+
+    institution = ET.SubElement(region, "institution")
+    deploy = ET.SubElement(ET.SubElement(institution, "config"), "DeployInst")
+    _add_vals(deploy, "prototypes", prototypes)
+    _add_vals(deploy, "build_times",
+              [deploy_start + ii * deploy_interval for ii in range(n_reactors)])
+    _add_vals(deploy, "n_build", [1] * n_reactors)
+    ET.SubElement(institution, "name").text = "FleetInst"
+
+    institution = ET.SubElement(region, "institution")
+    ET.SubElement(ET.SubElement(institution, "config"), "NullInst")
+    facilities = ET.SubElement(institution, "initialfacilitylist")
+    for prototype in ["FuelSource", "FuelSink"]:
+        entry = ET.SubElement(facilities, "entry")
+        ET.SubElement(entry, "number").text = "1"
+        ET.SubElement(entry, "prototype").text = prototype
+    ET.SubElement(institution, "name").text = "SupplyInst"
+    ET.SubElement(region, "name").text = "FleetRegion"
+
+    _add_recipe(root, "uox", {92235: enrichment, 92238: 1 - enrichment})
+    _add_recipe(root, "spent_uox", {92235: 0.01, 92238: 0.99})
+
+    tree = ET.ElementTree(root)
+    ET.indent(tree)
+    return tree
+
+
+def write_fleet(path, n_reactors, model_source="./examples/",
+                chain_file="chain_endfb71_pwr.xml", shared_model=True,
+                reactor_config=None, **kwargs):
+    '''
+    Write a fleet scenario to a directory: the Cyclus input file
+    ``fleet.xml`` and the OpenMC model files for the reactors.
+
+    Parameters:
+    -----------
+    path: str
+        directory to write the scenario to
+    n_reactors: int
+        number of DepleteReactor prototypes
+    model_source: str
+        directory with the materials.xml, micro_xs.csv and chain
+        files to build the models from
+    chain_file: str
+        name of the depletion chain file
+    shared_model: bool
+        if True, all reactors use one model directory. Otherwise,
+        each reactor gets its own model directory.
+    reactor_config: dict
+        DepleteReactor input values, see ``fleet_input``
+    kwargs:
+        other arguments passed to ``fleet_input``
+
+    Returns:
+    --------
+    input_file: str
+        path to the Cyclus input file
+    '''
+    os.makedirs(path, exist_ok=True)
+    config = dict(REACTOR_DEFAULTS)
+    config.update(reactor_config or {})
+    n_assem = int(config["n_assem_core"])
+    if shared_model:
+        model_paths = write_model(model_source, os.path.join(path, "model"),
+                                  chain_file, n_assem)
+    else:
+        model_paths = [
+            write_model(model_source,
+                        os.path.join(path, "models", "reactor_" + str(ii + 1)),
+                        chain_file, n_assem)
+            for ii in range(n_reactors)]
+    tree = fleet_input(n_reactors, model_paths, chain_file=chain_file,
+                       reactor_config=reactor_config, **kwargs)
+    input_file = os.path.join(path, "fleet.xml")
+    tree.write(input_file)
+    return input_file
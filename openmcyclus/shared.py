@@ -0,0 +1,116 @@
+'''
+Composition arrays in shared memory, so that depletion jobs run in
+other processes on the same node do not pickle the compositions. The
+compositions are stored as float64 mass arrays with one column per
+nuclide, in a fixed nuclide order (e.g. the nuclides of the depletion
+chain), and only the name of the shared memory block is sent with
+each job.
+'''
+import numpy as np
+from multiprocessing import shared_memory
+
+
+def _attach(name):
+    '''
+    Attach to an existing shared memory block without registering it
+    with the resource tracker of this process, where supported. The
+    block is unlinked by the process that created it.
+    '''
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedMasses(object):
+    def __init__(self, shape, name=None):
+        '''
+        Mass array in a shared memory block. A new, zero-filled block
+        is created if no name is given, otherwise the existing block
+        is attached.
+
+        Parameters:
+        -----------
+        shape: tuple of ints
+            shape of the mass array, the last dimension is the number
+            of nuclides
+        name: str
+            name of an existing block
+
+        Attributes:
+        -----------
+        name: str
+            name of the shared memory block
+        shape: tuple of ints
+            shape of the mass array
+        masses: numpy.ndarray
+            float64 view of the block
+        owner: bool
+            True if the block was created here, then ``unlink``
+            removes it
+        '''
+        self.shape = tuple(int(size) for size in shape)
+        self.owner = name is None
+        if self.owner:
+            size = max(int(np.prod(self.shape)), 1) * 8
+            self.block = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.block = _attach(name)
+        self.name = self.block.name
+        self.masses = np.ndarray(self.shape, dtype=np.float64,
+                                 buffer=self.block.buf)
+
+    def close(self):
+        '''
+        Release the view of the block in this process
+        '''
+        if self.masses is not None:
+            self.masses = None
+            self.block.close()
+
+    def unlink(self):
+        '''
+        Close and remove the block. The block stays mapped in the
+        processes that have it open.
+        '''
+        self.close()
+        if self.owner:
+            self.block.unlink()
+            self.owner = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.unlink()
+
+
+def fill_masses(comps, nuclides, masses):
+    '''
+    Write compositions to the rows of a mass array indexed by nuclide
+
+    Parameters:
+    -----------
+    comps: list of dicts
+        compositions, keys are nuclide ids (int) and values are masses
+    nuclides: numpy.ndarray of ints
+        sorted nuclide ids for the columns of masses
+    masses: numpy.ndarray
+        array with at least len(comps) rows and len(nuclides)
+        columns. The rows are overwritten.
+
+    Raises:
+    -------
+    ValueError if a composition has a nuclide that is not in nuclides
+    '''
+    for row, comp in enumerate(comps):
+        keys = np.fromiter(comp.keys(), dtype=np.int64, count=len(comp))
+        columns = np.searchsorted(nuclides, keys)
+        columns[columns == len(nuclides)] = 0
+        missing = keys[nuclides[columns] != keys] if len(nuclides) else keys
+        if len(missing) > 0:
+            raise ValueError("Nuclides not in the nuclide index: " +
+                             ", ".join(str(nuc) for nuc in missing))
+        masses[row] = 0.0
+        masses[row, columns] = np.fromiter(comp.values(), dtype=np.float64,
+                                           count=len(comp))
@@ -0,0 +1,462 @@
+'''
+Burnup lookup tables of spent fuel compositions. A table is built
+offline by depleting fresh uranium fuel with ``Depletion`` over a
+grid of U235 enrichment, flux, power and depletion time. The
+spent compositions are then interpolated, instead of running the
+depletion solver, by a ``DepleteReactor`` with
+``depletion_mode`` set to "table".
+
+Build a table and check it against the full depletion with:
+
+    $ python -m openmcyclus.table build --model-path ./examples/ \\
+        --enrichments 0.03 0.04 0.05 --fluxes 1e14 --powers 33.3 \\
+        --cycle-lengths 12 18 --out ./examples/burnup_table.npz
+    $ python -m openmcyclus.table validate \\
+        ./examples/burnup_table.npz --model-path ./examples/
+'''
+import argparse
+import itertools
+import time
+from functools import lru_cache
+import numpy as np
+from openmcyclus.checkpoint import array_to_comps, comps_to_array
+
+
+AXES = ("enrichment", "flux", "power", "time")
+DT = 2629846
+
+
+class BurnupTable(object):
+    def __init__(self, axes, nuclides, data):
+        '''
+        Table of spent fuel compositions, per unit mass of fresh fuel,
+        on a regular grid.
+
+        Parameters:
+        -----------
+        axes: dict
+            grid values for each of the names in ``AXES``: U235 mass
+            fraction of the uranium, flux (n/cm2s), power of a single
+            assembly (MWth) and depletion time (s). Each must be
+            increasing.
+        nuclides: array of ints
+            nuclide ids of the spent compositions
+        data: numpy.ndarray
+            spent compositions, with one dimension for each axis plus
+            one for the nuclides
+
+        Attributes:
+        -----------
+        axes: list of numpy.ndarrays
+            grid values, in the order of ``AXES``
+        nuclides: numpy.ndarray of ints
+            nuclide ids of the spent compositions
+        data: numpy.ndarray
+            spent compositions
+        '''
+        self.axes = [np.asarray(axes[name], dtype=float) for name in AXES]
+        self.nuclides = np.asarray(nuclides, dtype=np.int64)
+        self.data = np.asarray(data, dtype=float)
+        shape = tuple(len(axis) for axis in self.axes) + (len(nuclides),)
+        if self.data.shape != shape:
+            raise ValueError("Table data has shape " +
+                             str(self.data.shape) + ", expected " +
+                             str(shape))
+        for name, axis in zip(AXES, self.axes):
+            if np.any(np.diff(axis) <= 0):
+                raise ValueError("Table axis " + name + " is not increasing")
+
+    @classmethod
+    def from_file(cls, filename):
+        '''
+        Read a table from a file written by ``write``
+
+        Parameters:
+        -----------
+        filename: str
+            name of the table file
+
+        Returns:
+        --------
+        BurnupTable
+        '''
+        with np.load(filename, allow_pickle=False) as f:
+            return cls({name: f[name] for name in AXES},
+                       f["nuclides"], f["data"])
+
+    def write(self, filename):
+        '''
+        Write the table to a compressed npz file
+
+        Parameters:
+        -----------
+        filename: str
+            name of the table file
+        '''
+        np.savez_compressed(filename, nuclides=self.nuclides,
+                            data=self.data,
+                            **dict(zip(AXES, self.axes)))
+
+    def interpolate(self, enrichment, flux, power, time):
+        '''
+        Multilinear interpolation of the spent compositions. Values
+        outside of the grid are moved to the nearest grid edge, see
+        ``check``.
+
+        Parameters:
+        -----------
+        enrichment: float or array of floats
+            U235 mass fraction of the uranium in the fresh fuel
+        flux: float or array of floats
+            flux through the fuel (n/cm2s)
+        power: float or array of floats
+            power of a single assembly (MWth)
+        time: float or array of floats
+            depletion time (s)
+
+        Returns:
+        --------
+        numpy.ndarray
+            spent compositions per unit mass of fresh fuel, with shape
+            (number of points, number of nuclides)
+        '''
+        values = np.broadcast_arrays(*[np.atleast_1d(np.asarray(
+            value, dtype=float)) for value in (enrichment, flux, power,
+                                               time)])
+        lower, upper, weights = [], [], []
+        for axis, value in zip(self.axes, values):
+            lo, hi, weight = _bracket(axis, value)
+            lower.append(lo)
+            upper.append(hi)
+            weights.append(weight)
+
+        spent = np.zeros((len(values[0]), len(self.nuclides)))
+        for corner in itertools.product((0, 1), repeat=len(AXES)):
+            index = tuple(upper[ii] if side else lower[ii]
+                          for ii, side in enumerate(corner))
+            weight = np.prod([weights[ii] if side else 1 - weights[ii]
+                              for ii, side in enumerate(corner)], axis=0)
+            spent += weight[:, None] * self.data[index]
+        return spent
+
+    def check(self, comp_list, flux, power, time):
+        '''
+        Find the fresh fuel and depletion conditions that the table does
+        not cover: compositions without U235 or U238, which are looked
+        up at an enrichment of 0, and values outside of the grid, which
+        are moved to the nearest grid edge by ``interpolate``
+
+        Parameters:
+        -----------
+        comp_list: list of dicts
+            fresh fuel compositions
+        flux: float
+            flux through the fuel (n/cm2s)
+        power: float
+            power of a single assembly (MWth)
+        time: float
+            depletion time (s)
+
+        Returns:
+        --------
+        problems: list of strs
+            description of each problem, the same for each call with
+            the same problem
+        '''
+        problems = []
+        if not all(uranium(comp) > 0 for comp in comp_list):
+            problems.append("fresh fuel without U235 or U238 is looked up "
+                            "at an enrichment of 0")
+        values = [[enrichment(comp) for comp in comp_list], [flux],
+                  [power], [time]]
+        for name, axis, value in zip(AXES, self.axes, values):
+            value = np.asarray(value, dtype=float)
+            tolerance = 1e-9 * np.abs(axis).max()
+            if np.any(value < axis[0] - tolerance) or np.any(
+                    value > axis[-1] + tolerance):
+                problems.append(name + " outside of the table grid [" +
+                                str(axis[0]) + ", " + str(axis[-1]) +
+                                "] is moved to the nearest edge")
+        return problems
+
+    def spent_comps(self, comp_list, masses, flux, power, time):
+        '''
+        Get the spent compositions of fresh fuel compositions
+
+        Parameters:
+        -----------
+        comp_list: list of dicts
+            fresh fuel compositions, only the U235 and U238 content
+            is used
+        masses: list of floats
+            mass of each fresh fuel composition
+        flux: float
+            flux through the fuel (n/cm2s)
+        power: float
+            power of a single assembly (MWth)
+        time: float
+            depletion time (s)
+
+        Returns:
+        --------
+        spent_comps: list of dicts
+            spent compositions scaled to the fresh fuel masses
+        '''
+        enrichments = [enrichment(comp) for comp in comp_list]
+        spent = self.interpolate(enrichments, flux, power, time)
+        spent *= np.asarray(masses, dtype=float)[:, None]
+        return array_to_comps(self.nuclides, spent)
+
+
+def _bracket(axis, value):
+    '''
+    Find the grid points on either side of each value, and the
+    interpolation weight of the upper point.
+    '''
+    if len(axis) == 1:
+        zeros = np.zeros(len(value), dtype=int)
+        return zeros, zeros, np.zeros(len(value))
+    value = np.clip(value, axis[0], axis[-1])
+    upper = np.clip(np.searchsorted(axis, value, side='right'),
+                    1, len(axis) - 1)
+    lower = upper - 1
+    weight = (value - axis[lower]) / (axis[upper] - axis[lower])
+    return lower, upper, weight
+
+
+@lru_cache(maxsize=None)
+def read_table(filename):
+    '''
+    Read a burnup table. Tables are cached, so each file is only read
+    once per process.
+
+    Parameters:
+    -----------
+    filename: str
+        name of the table file
+
+    Returns:
+    --------
+    BurnupTable
+    '''
+    return BurnupTable.from_file(filename)
+
+
+def enrichment(comp):
+    '''
+    Get the U235 mass fraction of the uranium in a composition
+
+    Parameters:
+    -----------
+    comp: dict
+        composition, keys are nuclide ids and values are masses
+
+    Returns:
+    --------
+    float: U235 enrichment, 0 if there is no uranium
+    '''
+    total = uranium(comp)
+    if total == 0:
+        return 0.0
+    return comp.get(922350000, 0.0) / total
+
+
+def uranium(comp):
+    '''
+    Get the mass of U235 and U238 in a composition
+
+    Parameters:
+    -----------
+    comp: dict
+        composition, keys are nuclide ids and values are masses
+
+    Returns:
+    --------
+    float: mass of U235 and U238
+    '''
+    return comp.get(922350000, 0.0) + comp.get(922380000, 0.0)
+
+
+class _Solver(object):
+    def __init__(self, model_path, chain_file, dt):
+        '''
+        Run the full depletion of a single assembly, for building
+        and checking tables
+        '''
+        import openmc
+        from openmcyclus.depletion import read_micro_xs
+
+        self.model_path = model_path
+        self.chain_file = chain_file
+        self.dt = dt
+        materials = openmc.Materials.from_xml(model_path + "materials.xml")
+        self.template = [material for material in materials
+                         if 'assembly_' in material.name][0]
+        self.micro_xs = read_micro_xs(model_path + "micro_xs.csv")
+
+    def __call__(self, enrichment, flux, power, steps):
+        '''
+        Get the spent composition per unit mass of fresh fuel
+        '''
+        import openmc
+        from openmcyclus.depletion import Depletion
+
+        deplete = Depletion(self.chain_file, steps, power, self.model_path)
+        comp = {922350000: enrichment, 922380000: 1 - enrichment}
+        spent_comp = deplete.run([comp], openmc.Materials([self.template]),
+                                 self.micro_xs, flux, self.dt, steps)[0]
+        mass = self.template.get_mass()
+        return {nuc: value / mass for nuc, value in spent_comp.items()}
+
+
+def build_table(model_path, chain_file, enrichments, fluxes, powers,
+                cycle_lengths, dt=DT):
+    '''
+    Build a burnup table by depleting a single assembly at every
+    point of the grid with ``Depletion.run``. The assembly is the
+    first ``assembly_`` material in the materials.xml file in
+    model_path.
+
+    Parameters:
+    -----------
+    model_path: str
+        path to the materials, cross section and chain files
+    chain_file: str
+        name of the depletion chain file
+    enrichments: list of floats
+        U235 mass fractions of the fresh fuel
+    fluxes: list of floats
+        fluxes through the fuel (n/cm2s)
+    powers: list of floats
+        power of a single assembly (MWth)
+    cycle_lengths: list of ints
+        number of depletion steps
+    dt: float
+        length of a depletion step (s)
+
+    Returns:
+    --------
+    BurnupTable
+    '''
+    solver = _Solver(model_path, chain_file, dt)
+    grid = list(itertools.product(enrichments, fluxes, powers, cycle_lengths))
+    comps = [solver(*point) for point in grid]
+    nuclides, spent = comps_to_array(comps)
+    axes = {"enrichment": enrichments, "flux": fluxes, "power": powers,
+            "time": np.asarray(cycle_lengths, dtype=float) * dt}
+    shape = tuple(len(axis) for axis in axes.values()) + (len(nuclides),)
+    return BurnupTable(axes, nuclides, spent.reshape(shape))
+
+
+def interpolation_error(table, model_path, chain_file, points, dt=DT,
+                        threshold=1e-6):
+    '''
+    Compare the table against the full depletion at the given points
+
+    Parameters:
+    -----------
+    table: BurnupTable
+        table to check
+    model_path: str
+        path to the materials, cross section and chain files
+    chain_file: str
+        name of the depletion chain file
+    points: list of tuples
+        (enrichment, flux, power, number of steps) of each point
+    dt: float
+        length of a depletion step (s)
+    threshold: float
+        nuclides with a mass fraction below this in the full solution
+        are not included in the error
+
+    Returns:
+    --------
+    errors: list of dicts
+        for each point, the maximum relative error, the nuclide
+        it occurs for, and the time of the full solve and the
+        interpolation (s)
+    '''
+    solver = _Solver(model_path, chain_file, dt)
+    errors = []
+    for enrichment, flux, power, steps in points:
+        start = time.perf_counter()
+        full = solver(enrichment, flux, power, steps)
+        solve_time = time.perf_counter() - start
+        start = time.perf_counter()
+        interp = table.interpolate(enrichment, flux, power, steps * dt)[0]
+        interp_time = time.perf_counter() - start
+
+        index = {nuc: ii for ii, nuc in enumerate(table.nuclides)}
+        total = sum(full.values())
+        max_error, max_nuclide = 0.0, None
+        for nuc, mass in full.items():
+            if mass < threshold * total:
+                continue
+            value = interp[index[nuc]] if nuc in index else 0.0
+            error = abs(value - mass) / mass
+            if error > max_error:
+                max_error, max_nuclide = error, nuc
+        errors.append({"enrichment": enrichment, "flux": flux,
+                       "power": power, "steps": steps,
+                       "max_rel_error": max_error, "nuclide": max_nuclide,
+                       "solve_time": solve_time,
+                       "interp_time": interp_time})
+    return errors
+
+
+def midpoints(table, dt=DT):
+    '''
+    Get the points halfway between the enrichments of a table, at
+    the first flux, power and time of the table. These points are
+    not in the table, so they show the interpolation error.
+
+    Returns:
+    --------
+    points: list of tuples
+        (enrichment, flux, power, number of steps) of each point
+    '''
+    enrichments = table.axes[0]
+    return [((lo + hi) / 2, table.axes[1][0], table.axes[2][0],
+             int(round(table.axes[3][0] / dt)))
+            for lo, hi in zip(enrichments[:-1], enrichments[1:])]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build and check burnup tables for DepleteReactor")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build")
+    build.add_argument("--enrichments", type=float, nargs="+", required=True)
+    build.add_argument("--fluxes", type=float, nargs="+", required=True)
+    build.add_argument("--powers", type=float, nargs="+", required=True)
+    build.add_argument("--cycle-lengths", type=int, nargs="+", required=True)
+    build.add_argument("--out", required=True)
+    validate = subparsers.add_parser("validate")
+    validate.add_argument("table")
+    for subparser in (build, validate):
+        subparser.add_argument("--model-path", default="./")
+        subparser.add_argument("--chain-file",
+                               default="chain_endfb71_pwr.xml")
+        subparser.add_argument("--dt", type=float, default=DT)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        table = build_table(args.model_path, args.chain_file,
+                            args.enrichments, args.fluxes, args.powers,
+                            args.cycle_lengths, args.dt)
+        table.write(args.out)
+        return
+    table = BurnupTable.from_file(args.table)
+    errors = interpolation_error(table, args.model_path, args.chain_file,
+                                 midpoints(table, args.dt), args.dt)
+    print("{0:>10s} {1:>12s} {2:>10s} {3:>12s} {4:>12s}".format(
+        "enrichment", "max rel err", "nuclide", "solve (s)", "interp (s)"))
+    for error in errors:
+        print("{0:10.4f} {1:12.3e} {2:>10s} {3:12.3e} {4:12.3e}".format(
+            error["enrichment"], error["max_rel_error"],
+            str(error["nuclide"]), error["solve_time"],
+            error["interp_time"]))
+
+
+if __name__ == "__main__":
+    main()
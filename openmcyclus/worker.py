@@ -0,0 +1,565 @@
+'''
+Depletion worker service. A worker runs depletion jobs for
+``DepleteReactor`` agents in other processes or on other nodes, and
+is started with the ``openmcyclus-worker`` script.
+
+Jobs and results are sent over ``multiprocessing.connection``, on a
+local socket or TCP, and connections are authenticated with the key in
+the OPENMCYCLUS_WORKER_KEY environment variable. Messages are pickled,
+so anyone with the key can run code on a worker: the key must be set,
+and must be kept secret. The model files
+(chain, materials and cross sections) are identified by the hash of
+their contents, so each file is only sent to a worker once.
+'''
+import argparse
+import hashlib
+import multiprocessing
+import os
+import re
+import shutil
+import signal
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from multiprocessing.connection import Client, Listener
+
+from openmcyclus.checkpoint import array_to_comps, comps_to_array, file_hash
+
+
+KEY_VARIABLE = "OPENMCYCLUS_WORKER_KEY"
+MODEL_FILES = ("materials.xml", "micro_xs.csv")
+
+
+class WorkerError(Exception):
+    '''
+    A depletion job could not be run by any worker
+    '''
+
+
+def get_authkey():
+    '''
+    Get the key that authenticates connections between the reactors
+    and the workers
+
+    Returns:
+    --------
+    bytes: value of OPENMCYCLUS_WORKER_KEY
+
+    Raises:
+    -------
+    ValueError if OPENMCYCLUS_WORKER_KEY is not set
+    '''
+    key = os.environ.get(KEY_VARIABLE, "")
+    if len(key) == 0:
+        raise ValueError(KEY_VARIABLE + " must be set to the secret key "
+                         "shared by the depletion workers and Cyclus")
+    return key.encode()
+
+
+def check_file(name, digest):
+    '''
+    Check a model file name and hash sent to a worker, so that files
+    are only read and written in the worker cache
+
+    Parameters:
+    -----------
+    name: str
+        file name, without a directory
+    digest: str
+        SHA-1 hash of the file
+
+    Raises:
+    -------
+    ValueError if the name is not a plain file name or the hash is not
+    a SHA-1 hash
+    '''
+    if (not isinstance(name, str)) or (name in ("", ".", "..")) or (
+            os.path.basename(name) != name) or ("\\" in name):
+        raise ValueError("Invalid model file name " + repr(name))
+    if (not isinstance(digest, str)) or (
+            re.fullmatch("[0-9a-f]{40}", digest) is None):
+        raise ValueError("Invalid model file hash " + repr(digest))
+
+
+def parse_address(address):
+    '''
+    Convert a worker address to the form used by
+    ``multiprocessing.connection``
+
+    Parameters:
+    -----------
+    address: str
+        ``host:port`` for TCP, or the path of a local socket
+
+    Returns:
+    --------
+    tuple of (str, int) or str
+    '''
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit():
+        return (host, int(port))
+    return address
+
+
+@lru_cache(maxsize=None)
+def _hash(path):
+    '''
+    Get the hash of a model file. Model files do not change during a
+    simulation, so each file is only hashed once per process.
+    '''
+    return file_hash(path)
+
+
+def model_files(path, chain_file, xs_library=""):
+    '''
+    Get the model files used by a depletion job
+
+    Parameters:
+    -----------
+    path: str
+        path to the model files
+    chain_file: str
+        name of the depletion chain file
+    xs_library: str
+        name of the cross section library file, if one is used
+
+    Returns:
+    --------
+    files: dict
+        hash of each file, keys are the file names
+    '''
+    names = (chain_file,) + MODEL_FILES
+    if xs_library:
+        names += (xs_library,)
+    return {name: _hash(path + name) for name in names}
+
+
+def run_arrays(job):
+    '''
+    Run a depletion job received by a worker, with the compositions
+    as arrays
+
+    Parameters:
+    -----------
+    job: dict
+        depletion job for ``openmcyclus.depletion.run_job``, with
+        nuclides and masses arrays instead of comp_list
+
+    Returns:
+    --------
+    nuclides: numpy.ndarray of ints
+        nuclide ids of the spent compositions
+    masses: numpy.ndarray
+        spent masses, one row per composition
+    '''
+    from openmcyclus.depletion import run_job
+
+    job = dict(job)
+    job["comp_list"] = array_to_comps(job.pop("nuclides"),
+                                      job.pop("masses"))
+    return comps_to_array(run_job(job))
+
+
+class Worker(object):
+    def __init__(self, address, cache_dir, processes=1, solve=run_arrays,
+                 authkey=None):
+        '''
+        Server that runs depletion jobs sent by ``WorkerClient``.
+        Each connection is handled in its own thread, and the jobs
+        are run in a pool of processes. The processes are not
+        daemons, so that a job can start the pool of processes of
+        ``openmcyclus.pool``.
+
+        Parameters:
+        -----------
+        address: str
+            ``host:port`` or path of a local socket to listen on
+        cache_dir: str
+            directory for the model files sent to the worker
+        processes: int
+            number of jobs to run at the same time
+        solve: function
+            function that runs a job, see ``run_arrays``
+        authkey: bytes
+            authentication key. Defaults to ``get_authkey()``.
+        '''
+        self.address = parse_address(address)
+        self.cache_dir = cache_dir
+        self.solve = solve
+        self.authkey = authkey or get_authkey()
+        # The processes are forked when the first jobs arrive, after
+        # the worker may have set its own SIGTERM handler
+        self.pool = ProcessPoolExecutor(
+            processes, mp_context=multiprocessing.get_context("fork"),
+            initializer=signal.signal,
+            initargs=(signal.SIGTERM, signal.SIG_DFL))
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(cache_dir, "files"), exist_ok=True)
+        os.makedirs(os.path.join(cache_dir, "models"), exist_ok=True)
+
+    def file_path(self, digest):
+        return os.path.join(self.cache_dir, "files", digest)
+
+    def model_path(self, files):
+        '''
+        Get a model directory with the given files, creating it from
+        the stored files if needed
+
+        Parameters:
+        -----------
+        files: dict
+            hash of each file, keys are the file names
+
+        Returns:
+        --------
+        str: model directory, ending in a separator
+        '''
+        for name, digest in files.items():
+            check_file(name, digest)
+        key = hashlib.sha1(repr(sorted(files.items())).encode()).hexdigest()
+        path = os.path.join(self.cache_dir, "models", key)
+        with self.lock:
+            if not os.path.isdir(path):
+                tmp_path = path + ".tmp"
+                os.makedirs(tmp_path, exist_ok=True)
+                for name, digest in files.items():
+                    link = os.path.join(tmp_path, name)
+                    if not os.path.lexists(link):
+                        os.symlink(os.path.abspath(self.file_path(digest)),
+                                   link)
+                os.replace(tmp_path, path)
+        return path + os.sep
+
+    def handle(self, message):
+        '''
+        Handle a request
+
+        Parameters:
+        -----------
+        message: tuple
+            ("has", hash), ("put", hash, contents) or ("run", job, files)
+
+        Returns:
+        --------
+        result of the request
+        '''
+        if message[0] == "has":
+            check_file("has", message[1])
+            return os.path.isfile(self.file_path(message[1]))
+        if message[0] == "put":
+            digest, contents = message[1], message[2]
+            check_file("put", digest)
+            if hashlib.sha1(contents).hexdigest() != digest:
+                raise ValueError("File contents do not match hash " + digest)
+            tmp_file = (self.file_path(digest) + "." +
+                        str(threading.get_ident()))
+            with open(tmp_file, "wb") as f:
+                f.write(contents)
+            os.replace(tmp_file, self.file_path(digest))
+            return True
+        if message[0] == "run":
+            job, files = message[1], message[2]
+            for name, digest in files.items():
+                check_file(name, digest)
+            missing = [name for name, digest in files.items()
+                       if not os.path.isfile(self.file_path(digest))]
+            if len(missing) > 0:
+                raise ValueError("Missing model files: " + ", ".join(missing))
+            job = dict(job, path=self.model_path(files))
+            return self.pool.submit(self.solve, job).result()
+        raise ValueError("Unknown request " + str(message[0]))
+
+    def serve_connection(self, conn):
+        '''
+        Answer the requests on a connection until it is closed
+        '''
+        with conn:
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = ("ok", self.handle(message))
+                except Exception as error:
+                    reply = ("error", repr(error))
+                try:
+                    conn.send(reply)
+                except (EOFError, OSError):
+                    return
+
+    def close(self):
+        '''
+        Stop the processes that run the jobs, including the jobs that
+        are running
+        '''
+        processes = list((self.pool._processes or {}).values())
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+
+    def serve_forever(self, ready=None):
+        '''
+        Accept connections until the process is stopped
+
+        Parameters:
+        -----------
+        ready: multiprocessing.Event
+            set once the worker is listening
+        '''
+        with Listener(self.address, authkey=self.authkey) as listener:
+            if ready is not None:
+                ready.set()
+            while True:
+                try:
+                    conn = listener.accept()
+                except (EOFError, OSError):
+                    continue
+                threading.Thread(target=self.serve_connection, args=(conn,),
+                                 daemon=True).start()
+
+
+class WorkerClient(object):
+    def __init__(self, addresses, timeout=600.0, retries=2, authkey=None):
+        '''
+        Send depletion jobs to workers. Jobs are sent to the workers
+        in turn. If a worker can not be reached, fails, or does not
+        answer within the timeout, the job is sent to the next worker,
+        up to the given number of retries.
+
+        Parameters:
+        -----------
+        addresses: list of strs
+            worker addresses, ``host:port`` or local socket paths
+        timeout: float
+            time in seconds to wait for a job
+        retries: int
+            number of times a job is sent again after a failure
+        authkey: bytes
+            authentication key. Defaults to ``get_authkey()``.
+        '''
+        self.addresses = list(addresses)
+        self.timeout = timeout
+        self.retries = retries
+        self.authkey = authkey or get_authkey()
+        self.connections = {}
+        self.next_worker = 0
+
+    def connect(self, address):
+        if address not in self.connections:
+            self.connections[address] = Client(parse_address(address),
+                                               authkey=self.authkey)
+        return self.connections[address]
+
+    def close(self, address=None):
+        '''
+        Close the connection to a worker, or to all workers
+        '''
+        addresses = list(self.connections) if address is None else [address]
+        for address in addresses:
+            conn = self.connections.pop(address, None)
+            if conn is not None:
+                conn.close()
+
+    def request(self, address, message, timeout):
+        '''
+        Send a request to a worker and wait for the reply
+
+        Returns:
+        --------
+        value of the reply. An error reply raises RuntimeError and no
+        reply within the timeout raises TimeoutError.
+        '''
+        conn = self.connect(address)
+        conn.send(message)
+        if not conn.poll(timeout):
+            raise TimeoutError("No reply from worker " + address + " in " +
+                               str(timeout) + " s")
+        status, value = conn.recv()
+        if status != "ok":
+            raise RuntimeError("Worker " + address + ": " + value)
+        return value
+
+    def send_files(self, address, path, files):
+        '''
+        Send the model files that a worker does not have yet
+
+        Parameters:
+        -----------
+        address: str
+            worker address
+        path: str
+            path to the model files
+        files: dict
+            hash of each file, keys are the file names
+
+        Returns:
+        --------
+        int: number of files sent
+        '''
+        sent = 0
+        for name, digest in files.items():
+            if self.request(address, ("has", digest), self.timeout):
+                continue
+            with open(path + name, "rb") as f:
+                self.request(address, ("put", digest, f.read()),
+                             self.timeout)
+            sent += 1
+        return sent
+
+    def run(self, job):
+        '''
+        Run a depletion job on a worker
+
+        Parameters:
+        -----------
+        job: dict
+            depletion job, see ``openmcyclus.depletion.run_job``
+
+        Returns:
+        --------
+        spent_comps: list of dicts
+            spent compositions
+
+        Raises:
+        -------
+        WorkerError if the job failed on every attempt
+        '''
+        files = model_files(job["path"], job["chain_file"],
+                            job.get("xs_library", ""))
+        message = dict(job)
+        message["nuclides"], message["masses"] = comps_to_array(
+            message.pop("comp_list"))
+        message.pop("path")
+        errors = []
+        for attempt in range(self.retries + 1):
+            if len(self.addresses) == 0:
+                break
+            address = self.addresses[self.next_worker % len(self.addresses)]
+            self.next_worker += 1
+            try:
+                self.send_files(address, job["path"], files)
+                nuclides, masses = self.request(
+                    address, ("run", message, files), self.timeout)
+                return array_to_comps(nuclides, masses)
+            except (OSError, EOFError, RuntimeError,
+                    multiprocessing.AuthenticationError) as error:
+                self.close(address)
+                errors.append(address + ": " + str(error))
+        raise WorkerError("Depletion job failed on all attempts: " +
+                          "; ".join(errors))
+
+
+def _serve(address, cache_dir, processes, solve, ready, authkey):
+    worker = Worker(address, cache_dir, processes, solve, authkey)
+
+    def stop(signum, frame):
+        worker.close()
+        os._exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    worker.serve_forever(ready)
+
+
+class LocalWorkers(object):
+    def __init__(self, n_workers, processes=1, solve=run_arrays,
+                 directory=None, authkey=None):
+        '''
+        Start workers in local processes, listening on local sockets.
+        This stands in for workers on other nodes, e.g. for testing.
+        Use as a context manager, or call ``close``.
+
+        Parameters:
+        -----------
+        n_workers: int
+            number of workers
+        processes: int
+            number of jobs run at the same time by each worker
+        solve: function
+            function that runs a job, see ``run_arrays``
+        directory: str
+            directory for the sockets and the worker caches. A
+            temporary directory is used if not given.
+        authkey: bytes
+            authentication key. A random key is used if not given.
+
+        Attributes:
+        -----------
+        addresses: list of strs
+            socket paths of the workers
+        authkey: bytes
+            authentication key of the workers, for ``WorkerClient``
+        '''
+        self.tmp_dir = None
+        if directory is None:
+            self.tmp_dir = tempfile.mkdtemp(prefix="openmcyclus-workers-")
+            directory = self.tmp_dir
+        self.authkey = authkey or os.urandom(32).hex().encode()
+        context = multiprocessing.get_context("fork")
+        self.addresses = []
+        self.processes = []
+        for ii in range(n_workers):
+            address = os.path.join(directory, "worker" + str(ii) + ".sock")
+            ready = context.Event()
+            # Not a daemon, because the worker starts its own processes
+            process = context.Process(
+                target=_serve,
+                args=(address, os.path.join(directory, "cache" + str(ii)),
+                      processes, solve, ready, self.authkey))
+            process.start()
+            ready.wait(30)
+            self.addresses.append(address)
+            self.processes.append(process)
+
+    def stop(self, index):
+        '''
+        Stop one worker, e.g. to test retries
+        '''
+        self.processes[index].terminate()
+        self.processes[index].join()
+
+    def close(self):
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        if self.tmp_dir is not None:
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run depletion jobs for DepleteReactor agents")
+    parser.add_argument("address",
+                        help="host:port to listen on, or a local socket path")
+    parser.add_argument("--cache-dir", default="openmcyclus-worker-cache",
+                        help="directory for the model files")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(),
+                        help="number of jobs to run at the same time")
+    args = parser.parse_args()
+
+    try:
+        get_authkey()
+    except ValueError as error:
+        parser.error(str(error))
+    worker = Worker(args.address, args.cache_dir, args.processes)
+    print("openmcyclus-worker listening on " + args.address, flush=True)
+    try:
+        worker.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.close()
+
+
+if __name__ == "__main__":
+    main()
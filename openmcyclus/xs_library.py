@@ -0,0 +1,229 @@
+'''
+One-group cross section libraries tabulated over burnup. A library is
+built offline from ``micro_xs.csv`` files calculated at a few burnups,
+and is read once into a single contiguous array. ``Depletion.run``
+then interpolates the cross sections of all assemblies at their
+burnup in each depletion step, instead of using the same cross
+sections for every step.
+
+Build a library with:
+
+    $ python -m openmcyclus.xs_library build --burnups 0 20 40 \\
+        --files xs_0.csv xs_20.csv xs_40.csv --out ./examples/xs_library.npz
+'''
+import argparse
+from functools import lru_cache
+import numpy as np
+from openmcyclus.table import _bracket
+
+
+class XSLibrary(object):
+    def __init__(self, burnups, nuclides, reactions, data):
+        '''
+        One-group microscopic cross sections on a burnup grid
+
+        Parameters:
+        -----------
+        burnups: array of floats
+            burnup of each grid point (MWd/kgHM), increasing
+        nuclides: list of strs
+            names of the nuclides, e.g. U235
+        reactions: list of strs
+            names of the reactions, e.g. (n,gamma)
+        data: numpy.ndarray
+            cross sections (b), with shape (number of burnups, number
+            of nuclides, number of reactions)
+
+        Attributes:
+        -----------
+        burnups: numpy.ndarray
+            burnup of each grid point (MWd/kgHM)
+        nuclides: list of strs
+            names of the nuclides
+        reactions: list of strs
+            names of the reactions
+        data: numpy.ndarray
+            contiguous float64 array of the cross sections
+        '''
+        self.burnups = np.asarray(burnups, dtype=float)
+        self.nuclides = [str(nuclide) for nuclide in nuclides]
+        self.reactions = [str(reaction) for reaction in reactions]
+        self.data = np.ascontiguousarray(data, dtype=np.float64)
+        shape = (len(self.burnups), len(self.nuclides), len(self.reactions))
+        if self.data.shape != shape:
+            raise ValueError("Library data has shape " +
+                             str(self.data.shape) + ", expected " +
+                             str(shape))
+        if np.any(np.diff(self.burnups) <= 0):
+            raise ValueError("Library burnups are not increasing")
+
+    @classmethod
+    def from_micro_xs(cls, burnups, micro_xs_list):
+        '''
+        Create a library from one-group cross sections at each burnup
+
+        Parameters:
+        -----------
+        burnups: array of floats
+            burnup of each set of cross sections (MWd/kgHM)
+        micro_xs_list: list of openmc.deplete.MicroXS
+            one-group cross sections, with the same nuclides and
+            reactions
+
+        Returns:
+        --------
+        XSLibrary
+        '''
+        first = micro_xs_list[0]
+        data = []
+        for micro_xs in micro_xs_list:
+            if ((list(micro_xs.nuclides) != list(first.nuclides)) or
+                    (list(micro_xs.reactions) != list(first.reactions))):
+                raise ValueError("The cross sections do not have the same "
+                                 "nuclides and reactions")
+            xs = np.asarray(micro_xs.data, dtype=float)
+            if xs.shape[-1] != 1:
+                raise ValueError("Library cross sections must have one "
+                                 "group")
+            data.append(xs[..., 0])
+        return cls(burnups, first.nuclides, first.reactions, np.stack(data))
+
+    @classmethod
+    def from_file(cls, filename):
+        '''
+        Read a library from a file written by ``write``
+
+        Parameters:
+        -----------
+        filename: str
+            name of the library file
+
+        Returns:
+        --------
+        XSLibrary
+        '''
+        with np.load(filename, allow_pickle=False) as f:
+            return cls(f["burnups"], f["nuclides"], f["reactions"],
+                       f["data"])
+
+    def write(self, filename):
+        '''
+        Write the library to a compressed npz file
+
+        Parameters:
+        -----------
+        filename: str
+            name of the library file
+        '''
+        np.savez_compressed(filename, burnups=self.burnups,
+                            nuclides=np.array(self.nuclides),
+                            reactions=np.array(self.reactions),
+                            data=self.data)
+
+    def interpolate(self, burnups):
+        '''
+        Linear interpolation of the cross sections at each burnup, for
+        all points at once. Burnups outside of the grid are moved to
+        the nearest grid edge.
+
+        Parameters:
+        -----------
+        burnups: float or array of floats
+            burnup of each point (MWd/kgHM)
+
+        Returns:
+        --------
+        numpy.ndarray
+            cross sections with shape (number of points, number of
+            nuclides, number of reactions)
+        '''
+        burnups = np.atleast_1d(np.asarray(burnups, dtype=float))
+        lower, upper, weight = _bracket(self.burnups, burnups)
+        weight = weight[:, None, None]
+        return (1 - weight) * self.data[lower] + weight * self.data[upper]
+
+    def micro_xs(self, burnups):
+        '''
+        Get the interpolated cross sections at each burnup
+
+        Parameters:
+        -----------
+        burnups: array of floats
+            burnup of each point (MWd/kgHM)
+
+        Returns:
+        --------
+        list of openmc.deplete.MicroXS
+            one-group cross sections for each point
+        '''
+        import openmc.deplete as od
+
+        return [od.MicroXS(xs[..., np.newaxis], self.nuclides,
+                           self.reactions)
+                for xs in self.interpolate(burnups)]
+
+
+@lru_cache(maxsize=None)
+def read_library(filename):
+    '''
+    Read a cross section library. Libraries are cached, so each file
+    is only read once per process.
+
+    Parameters:
+    -----------
+    filename: str
+        name of the library file
+
+    Returns:
+    --------
+    XSLibrary
+    '''
+    return XSLibrary.from_file(filename)
+
+
+def burnup_step(power, dt, mass):
+    '''
+    Get the burnup added to the fuel in one depletion step, assuming
+    that the power is shared evenly by mass
+
+    Parameters:
+    -----------
+    power: float
+        thermal power of the fuel (MWth)
+    dt: float
+        length of the step (s)
+    mass: float
+        heavy metal mass of the fuel (kg)
+
+    Returns:
+    --------
+    float: burnup of one step (MWd/kgHM)
+    '''
+    if mass <= 0:
+        return 0.0
+    return power * dt / 86400 / mass
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build cross section libraries for DepleteReactor")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build")
+    build.add_argument("--burnups", type=float, nargs="+", required=True,
+                       help="burnup of each file (MWd/kgHM)")
+    build.add_argument("--files", nargs="+", required=True,
+                       help="one-group micro_xs.csv file for each burnup")
+    build.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    if len(args.burnups) != len(args.files):
+        parser.error("--burnups and --files must have the same length")
+    from openmcyclus.depletion import read_micro_xs
+
+    library = XSLibrary.from_micro_xs(
+        args.burnups, [read_micro_xs(name) for name in args.files])
+    library.write(args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,5 +13,7 @@ if __name__ == '__main__':
     setup(
         name='openmcyclus',
         packages=["openmcyclus"],
+        scripts=["scripts/openmcyclus-worker",
+                 "scripts/openmcyclus-ensemble"],
         **setup_kwargs
         )
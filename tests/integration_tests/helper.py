@@ -35,29 +35,21 @@ def find_ids(data, data_table, id_table):
     """Finds ids of the specified data located in the specified data_table,
     and extracts the corresponding id from the specified id_table.
     """
-    ids = []
-    for i, d in enumerate(data_table):
-        if isinstance(d, np.ndarray) and isinstance(data, np.ndarray):
-            if (d == data).all():
-                ids.append(id_table[i])
-        elif isinstance(d, np.ndarray) and not isinstance(data, np.ndarray):
-            if (d == sha1array(data)).all():
-                ids.append(id_table[i])
-        elif d == data:
-            ids.append(id_table[i])
-    return ids
+    data_table = np.asarray(data_table)
+    id_table = np.asarray(id_table)
+    if data_table.ndim == 2:
+        if not isinstance(data, np.ndarray):
+            data = sha1array(data)
+        mask = (data_table == data).all(axis=1)
+    else:
+        mask = data_table == data
+    return list(id_table[mask])
 
 def exit_times(agent_id, exit_table):
     """Finds exit times of the specified agent from the exit table.
     """
-    i = 0
-    exit_times = []
-    for index in exit_table["AgentId"]:
-        if index == agent_id:
-            exit_times.append(exit_table["ExitTime"][i])
-        i += 1
-
-    return exit_times
+    agent_ids = np.asarray(exit_table["AgentId"])
+    return list(np.asarray(exit_table["ExitTime"])[agent_ids == agent_id])
 
 
 def run_cyclus(cyclus, cwd, in_path, out_path):
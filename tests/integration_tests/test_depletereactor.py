@@ -1,5 +1,7 @@
 import os
+import tempfile
 import uuid
+import xml.etree.ElementTree as ET
 import sqlite3
 import platform
 
@@ -51,6 +53,11 @@ class TestDepleteReactor(unittest.TestCase):
     def tearDown(self):
         self.conn.close()
 
+    def events(self, event):
+        return self.cur.execute(
+            "SELECT * FROM ReactorEvents WHERE Event = ?", (event,)
+        ).fetchall()
+
     def find_ids(self, spec, a, spec_col="Spec", id_col="AgentId"):
         '''
         find the rows in a table that match the value in a column to 
@@ -171,3 +178,196 @@ class TestComplex(TestDepleteReactor):
         assert len(tbl) == 12
         assert all(times == [3,3,3,5,5,8,8,11,11,13,13,13])
         assert all(quantities == [10]*12)
+
+    def test_retired_event(self):
+        events = self.events("RETIRED")
+        assert self.to_array(events, "Time").tolist() == [13]
+
+    def test_retired_transmute(self):
+        '''
+        The reactor retires one time step into its fourth cycle, so the
+        core is depleted for that time step before it is discharged
+        '''
+        events = self.events("TRANSMUTE")
+        assert self.to_array(events, "Time").tolist() == [5, 8, 11, 13]
+        assert self.to_array(events, "Value").tolist() == [
+            "3 assemblies"] * 4
+        fresh = {942390000, 942410000, 922350000, 922380000}
+        discharged = [x for x in self.resources if x["TimeCreated"] == 13]
+        assert len(discharged) == 3
+        for resource in discharged:
+            assert resource["Quantity"] == 10
+            nuclides = {x["NucId"] for x in self.compositions
+                        if x["QualId"] == resource["QualId"]}
+            assert len(nuclides - fresh) > 0
+
+
+class TestRetireAtCycleEnd(TestDepleteReactor):
+    '''This class tests a reactor that retires after the end of a
+    cycle, while it is refueling. The complex simulation is run
+    with a lifetime of 9 time steps, so the reactor retires at time
+    step 12, after the cycle that ended at time step 11 was already
+    depleted. The retirement must not deplete the core again.
+    '''
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        root = ET.parse("examples/complex.xml").getroot()
+        for facility in root.findall("facility"):
+            if facility.findtext("name") == "OneReactor":
+                facility.find("lifetime").text = "9"
+        self.input_file = os.path.join(self.tmp_dir.name, "retire.xml")
+        ET.ElementTree(root).write(self.input_file)
+        self.output_file = "retire_integration.sqlite"
+        super(TestRetireAtCycleEnd, self).setUp()
+
+    def tearDown(self):
+        super(TestRetireAtCycleEnd, self).tearDown()
+        self.tmp_dir.cleanup()
+
+    def test_retired_transmute(self):
+        assert self.to_array(self.events("TRANSMUTE"),
+                             "Time").tolist() == [5, 8, 11]
+        assert self.to_array(self.events("RETIRED"), "Time").tolist() == [12]
+        assert len(self.events("CYCLE_END")) == 3
+
+
+class TestIncremental(TestDepleteReactor):
+    '''This class tests the simple simulation with the core depleted
+    at each time step of the cycle, and a checkpoint written at each
+    time step. The spent fuel must match the simple simulation, with
+    the core depleted once at the end of each cycle.
+    '''
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        root = ET.parse("examples/simple.xml").getroot()
+        for facility in root.findall("facility"):
+            if facility.findtext("name") == "OneReactor":
+                config = facility.find("config/DepleteReactor")
+        ET.SubElement(config, "incremental_depletion").text = "true"
+        ET.SubElement(config, "checkpoint_interval").text = "1"
+        ET.SubElement(config, "checkpoint_path").text = self.tmp_dir.name
+        self.input_file = os.path.join(self.tmp_dir.name, "incremental.xml")
+        ET.ElementTree(root).write(self.input_file)
+        self.output_file = "incremental_integration.sqlite"
+        self.one_shot_file = os.path.join(self.tmp_dir.name,
+                                          "one_shot.sqlite")
+        run_cyclus("cyclus", os.getcwd(), "examples/simple.xml",
+                   self.one_shot_file)
+        super(TestIncremental, self).setUp()
+
+    def tearDown(self):
+        super(TestIncremental, self).tearDown()
+        self.tmp_dir.cleanup()
+
+    def spent_comps(self, cur):
+        '''
+        Get the compositions of the spent fuel, in the order it was
+        discharged
+        '''
+        comps = []
+        for transaction in cur.execute(
+                "SELECT * FROM Transactions WHERE Commodity = 'spent_uox' "
+                "ORDER BY Time, ResourceId").fetchall():
+            resource = cur.execute(
+                "SELECT * FROM Resources WHERE ResourceId = ?",
+                (transaction["ResourceId"],)).fetchone()
+            comps.append({x["NucId"]: x["MassFrac"] for x in cur.execute(
+                "SELECT * FROM Compositions WHERE QualId = ?",
+                (resource["QualId"],)).fetchall()})
+        return comps
+
+    def test_transmute(self):
+        assert self.to_array(self.events("TRANSMUTE"),
+                             "Time").tolist() == [2, 5, 8]
+
+    def test_spent_comps(self):
+        from openmcyclus.regression import compare_comps
+
+        conn = sqlite3.connect(self.one_shot_file)
+        conn.row_factory = sqlite3.Row
+        reference = self.spent_comps(conn.cursor())
+        conn.close()
+        incremental = self.spent_comps(self.cur)
+        assert len(incremental) == 3
+        errors = compare_comps(reference, incremental, atol=1e-9, rtol=1e-4)
+        assert errors["passed"].all()
+
+    def test_checkpoint(self):
+        files = [x for x in os.listdir(self.tmp_dir.name)
+                 if x.startswith("checkpoint_")]
+        assert len(files) == 1
+        checkpoint = np.load(os.path.join(self.tmp_dir.name, files[0]))
+        assert int(checkpoint["time"]) == 9
+        assert checkpoint["incremental_steps"].shape == ()
+        assert checkpoint["incremental_active"].shape == ()
+        assert len(checkpoint["core_ids"]) == \
+            checkpoint["core_masses"].shape[0]
+
+
+class TestBudgetFallback(TestDepleteReactor):
+    '''This class tests the simple simulation with a transmute budget
+    that is always used up, by the depletion and by the coarse estimate
+    started with it. Both are stopped, and as no cycle has been
+    depleted, the fresh compositions are kept.
+    '''
+    budget = "1e-6"
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        root = ET.parse("examples/simple.xml").getroot()
+        for facility in root.findall("facility"):
+            if facility.findtext("name") == "OneReactor":
+                config = facility.find("config/DepleteReactor")
+        ET.SubElement(config, "transmute_budget").text = self.budget
+        ET.SubElement(config, "budget_fallback").text = "coarse"
+        self.input_file = os.path.join(self.tmp_dir.name, "budget.xml")
+        ET.ElementTree(root).write(self.input_file)
+        self.output_file = "budget_integration.sqlite"
+        super(TestBudgetFallback, self).setUp()
+
+    def tearDown(self):
+        super(TestBudgetFallback, self).tearDown()
+        self.tmp_dir.cleanup()
+
+    def budgets(self):
+        return self.cur.execute(
+            "SELECT * FROM TransmuteBudget ORDER BY Time").fetchall()
+
+    def test_approximated(self):
+        events = self.events("APPROXIMATED")
+        assert self.to_array(events, "Time").tolist() == [2, 5, 8]
+        assert self.to_array(events, "Value").tolist() == ["fresh"] * 3
+        events = self.events("COARSE_TIMEOUT")
+        assert self.to_array(events, "Time").tolist() == [2, 5, 8]
+
+    def test_transmute_budget(self):
+        budgets = self.budgets()
+        assert [x["Time"] for x in budgets] == [2, 5, 8]
+        assert [x["Source"] for x in budgets] == ["fresh"] * 3
+        for budget in budgets:
+            assert budget["Budget"] == float(self.budget)
+            # Neither solve is waited for past the budget
+            assert budget["Budget"] < budget["WallTime"] < 10.0
+
+    def test_resources(self):
+        quantities = self.to_array(self.resources, "Quantity")
+        assert len(self.resources) == 9
+        assert all(quantities == [10] * 9)
+
+
+class TestBudget(TestBudgetFallback):
+    '''This class tests the simple simulation with a transmute budget
+    that the depletion always finishes within.
+    '''
+    budget = "1000.0"
+
+    def test_approximated(self):
+        assert len(self.events("APPROXIMATED")) == 0
+        assert len(self.events("COARSE_TIMEOUT")) == 0
+
+    def test_transmute_budget(self):
+        budgets = self.budgets()
+        assert [x["Time"] for x in budgets] == [2, 5, 8]
+        assert [x["Source"] for x in budgets] == ["async"] * 3
+        for budget in budgets:
+            assert budget["WallTime"] < budget["Budget"]
@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+import sqlite3
+import unittest
+from openmcyclus import analysis
+
+
+def make_output(conn):
+    '''
+    Write a small Cyclus output database with two reactors and a sink
+    '''
+    sim = b'sim'
+    conn.executescript(
+        "CREATE TABLE AgentEntry (SimId BLOB, AgentId INTEGER, "
+        "Kind TEXT, Spec TEXT, Prototype TEXT, ParentId INTEGER, "
+        "Lifetime INTEGER, EnterTime INTEGER);"
+        "CREATE TABLE AgentExit (SimId BLOB, AgentId INTEGER, "
+        "ExitTime INTEGER);"
+        "CREATE TABLE Transactions (SimId BLOB, TransactionId INTEGER, "
+        "SenderId INTEGER, ReceiverId INTEGER, ResourceId INTEGER, "
+        "Commodity TEXT, Time INTEGER);"
+        "CREATE TABLE Resources (SimId BLOB, ResourceId INTEGER, "
+        "ObjId INTEGER, Type TEXT, TimeCreated INTEGER, "
+        "Quantity REAL, Units TEXT, QualId INTEGER, Parent1 INTEGER, "
+        "Parent2 INTEGER);"
+        "CREATE TABLE Compositions (SimId BLOB, QualId INTEGER, "
+        "NucId INTEGER, MassFrac REAL);"
+        "CREATE TABLE TimeSeriesPower (SimId BLOB, AgentId INTEGER, "
+        "Time INTEGER, Value REAL);"
+        "CREATE TABLE ReactorEvents (SimId BLOB, AgentId INTEGER, "
+        "Time INTEGER, Event TEXT, Value TEXT);")
+    conn.executemany(
+        "INSERT INTO AgentEntry VALUES (?, ?, 'Facility', ?, ?, 1, ?, ?)",
+        [(sim, 10, analysis.REACTOR_SPEC, "Reactor_1", -1, 0),
+         (sim, 11, analysis.REACTOR_SPEC, "Reactor_2", 5, 1),
+         (sim, 12, ":cycamore:Sink:Sink", "Sink", -1, 0)])
+    conn.execute("INSERT INTO AgentExit VALUES (?, 11, 6)", (sim,))
+    conn.executemany(
+        "INSERT INTO Compositions VALUES (?, ?, ?, ?)",
+        [(sim, 1, 922350000, 0.01), (sim, 1, 922380000, 0.98),
+         (sim, 1, 942390000, 0.01), (sim, 2, 922350000, 0.05),
+         (sim, 2, 922380000, 0.95)])
+    conn.executemany(
+        "INSERT INTO Resources VALUES (?, ?, ?, 'Material', 0, ?, 'kg', "
+        "?, 0, 0)",
+        [(sim, 100, 100, 10.0, 1), (sim, 101, 101, 20.0, 1),
+         (sim, 102, 102, 30.0, 1), (sim, 103, 103, 5.0, 2)])
+    conn.executemany(
+        "INSERT INTO Transactions VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(sim, 1, 10, 12, 100, "spent_uox", 4),
+         (sim, 2, 10, 12, 101, "spent_uox", 4),
+         (sim, 3, 11, 12, 102, "spent_uox", 5),
+         (sim, 4, 12, 10, 103, "uox", 5)])
+    conn.executemany(
+        "INSERT INTO TimeSeriesPower VALUES (?, ?, ?, ?)",
+        [(sim, 10, 0, 100.0), (sim, 10, 1, 100.0), (sim, 11, 1, 50.0)])
+    conn.executemany(
+        "INSERT INTO ReactorEvents VALUES (?, ?, ?, ?, '')",
+        [(sim, 10, 0, "CYCLE_START"), (sim, 10, 3, "CYCLE_END"),
+         (sim, 10, 4, "CYCLE_START"), (sim, 10, 4, "TRANSMUTE"),
+         (sim, 11, 1, "CYCLE_START")])
+    conn.commit()
+
+
+class TestAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        make_output(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_reactors(self):
+        '''
+        Test that only the reactors are found, with their exit times
+        '''
+        reactors = analysis.reactors(self.conn)
+        assert reactors["AgentId"].tolist() == [10, 11]
+        assert reactors["ExitTime"].tolist() == [-1, 6]
+
+    def test_find_ids(self):
+        '''
+        Test finding ids by value and by row
+        '''
+        assert analysis.find_ids(2, [1, 2, 2], [5, 6, 7]).tolist() == [6, 7]
+        rows = np.array([[1, 2], [3, 4], [1, 2]])
+        assert analysis.find_ids(np.array([1, 2]), rows,
+                                 [5, 6, 7]).tolist() == [5, 7]
+        assert analysis.exit_times(11, [10, 11], [3, 6]).tolist() == [6]
+
+    def test_discharged_masses(self):
+        '''
+        Test the nuclide masses sent by each reactor, with the
+        results summed over chunks
+        '''
+        for chunksize in [1, 100]:
+            masses = analysis.discharged_masses(self.conn,
+                                                chunksize=chunksize)
+            assert len(masses) == 6
+            pu = masses[masses["NucId"] == 942390000]
+            assert pu["AgentId"].tolist() == [10, 11]
+            assert pu["Time"].tolist() == [4, 5]
+            assert pu["Mass"].tolist() == pytest.approx([0.3, 0.3])
+        masses = analysis.discharged_masses(self.conn, [11], [922350000])
+        assert masses["Mass"].tolist() == pytest.approx([0.3])
+
+    def test_power_series(self):
+        '''
+        Test the power of each reactor, in long and pivoted form
+        '''
+        power = analysis.power_series(self.conn)
+        assert len(power) == 3
+        table = analysis.power_series(self.conn, pivot=True)
+        assert table.loc[0].tolist() == [100.0, 0.0]
+        assert table.loc[1].tolist() == [100.0, 50.0]
+
+    def test_cycles(self):
+        '''
+        Test the reactor events and the cycle lengths
+        '''
+        events = analysis.cycle_events(self.conn, events=["TRANSMUTE"])
+        assert events["Time"].tolist() == [4]
+        cycles = analysis.cycle_lengths(self.conn)
+        assert cycles["AgentId"].tolist() == [10, 10, 11]
+        assert cycles["Start"].tolist() == [0, 4, 1]
+        assert cycles["Length"].tolist() == [3, -1, -1]
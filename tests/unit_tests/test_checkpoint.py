@@ -0,0 +1,58 @@
+import numpy as np
+import unittest
+import openmc
+import openmc.deplete as od
+from openmcyclus import checkpoint
+import os
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        '''
+        Read in the example materials and cross sections
+        '''
+        self.materials = openmc.Materials.from_xml("./examples/materials.xml")
+        self.micro_xs = od.MicroXS.from_csv("./examples/micro_xs.csv")
+        self.filename = "./examples/test_checkpoint.npz"
+
+    def tearDown(self):
+        if os.path.isfile(self.filename):
+            os.remove(self.filename)
+
+    def test_comps_round_trip(self):
+        '''
+        Test that compositions are unchanged after converting to
+        an array and back
+        '''
+        comps = [{922350000: 0.05, 922380000: 0.95},
+                 {942390000: 0.10, 942410000: 0.9},
+                 {}]
+        nuclides, masses = checkpoint.comps_to_array(comps)
+        assert list(nuclides) == [922350000, 922380000,
+                                  942390000, 942410000]
+        assert masses.shape == (3, 4)
+        assert checkpoint.array_to_comps(nuclides, masses) == comps
+
+    def test_save_load(self):
+        '''
+        Test that the materials and cross sections are the same after
+        writing them to a checkpoint file and reading them back
+        '''
+        arrays = checkpoint.materials_to_arrays(self.materials)
+        arrays.update(checkpoint.micro_xs_to_arrays(self.micro_xs))
+        checkpoint.save(self.filename, arrays)
+        arrays = checkpoint.load(self.filename)
+
+        materials = checkpoint.arrays_to_materials(arrays)
+        assert [mat.id for mat in materials] == [5, 6, 7, 8]
+        assert [mat.name for mat in materials] == [
+            'assembly_1', 'assembly_2', 'assembly_3', 'water']
+        assert materials[0].nuclides == self.materials[0].nuclides
+        assert materials[0].depletable
+        assert not materials[3].depletable
+        assert materials[3].volume == self.materials[3].volume
+
+        micro_xs = checkpoint.arrays_to_micro_xs(arrays)
+        assert micro_xs.nuclides == self.micro_xs.nuclides
+        assert micro_xs.reactions == self.micro_xs.reactions
+        assert np.array_equal(micro_xs.data, self.micro_xs.data)
@@ -0,0 +1,154 @@
+import pytest
+import unittest
+import xml.etree.ElementTree as ET
+from openmcyclus.compositions import (truncate, RecipeRegistry, CoreMirror,
+                                      recipe_nuclide_id, recipe_comp)
+
+
+class FakeContext(object):
+    def __init__(self):
+        self.added = []
+
+    def add_recipe(self, name, comp, basis):
+        self.added.append((name, comp, basis))
+
+
+class TestCompositions(unittest.TestCase):
+    def setUp(self):
+        self.comp = {922380000: 90.0, 922350000: 5.0, 942390000: 3.0,
+                     551370000: 1.5, 541350000: 0.5}
+
+    def test_truncate_max_nuclides(self):
+        '''
+        Test that the nuclides with the largest masses are kept, and
+        that the total mass is not changed
+        '''
+        comp = truncate(self.comp, max_nuclides=2)
+        assert set(comp) == {922380000, 922350000}
+        assert sum(comp.values()) == pytest.approx(100.0)
+        assert comp[922350000] / comp[922380000] == pytest.approx(5 / 90)
+
+    def test_truncate_cutoff(self):
+        '''
+        Test that the smallest nuclides are removed up to the cutoff
+        '''
+        comp = truncate(self.comp, cutoff=0.02)
+        assert set(comp) == {922380000, 922350000, 942390000}
+        assert sum(comp.values()) == pytest.approx(100.0)
+        comp = truncate(self.comp, cutoff=0.019)
+        assert set(comp) == {922380000, 922350000, 942390000, 551370000}
+        comp = truncate(self.comp, max_nuclides=4, cutoff=0.02)
+        assert set(comp) == {922380000, 922350000, 942390000}
+
+    def test_truncate_unchanged(self):
+        '''
+        Test that the composition is not copied if nothing is removed
+        '''
+        assert truncate(self.comp) is self.comp
+        assert truncate(self.comp, max_nuclides=10) is self.comp
+        assert truncate(self.comp, cutoff=1e-3) is self.comp
+        assert len(truncate(self.comp, cutoff=1.0)) == 1
+
+    def test_recipe_registry(self):
+        '''
+        Test that a recipe is only added when its composition changes
+        '''
+        context = FakeContext()
+        recipes = RecipeRegistry(context)
+        assert recipes.add("spent", {922350000: 0.1, 922380000: 0.9})
+        assert not recipes.add("spent", {922380000: 0.9, 922350000: 0.1})
+        assert recipes.add("other", {922350000: 0.1, 922380000: 0.9})
+        assert recipes.add("spent", {922350000: 0.2, 922380000: 0.8})
+        assert len(context.added) == 3
+        assert recipes.added == 3
+        assert recipes.skipped == 1
+
+
+class FakeMaterial(object):
+    def __init__(self, obj_id, comp):
+        self.obj_id = obj_id
+        self._comp = comp
+
+    def comp(self):
+        return dict(self._comp)
+
+
+class TestRecipes(unittest.TestCase):
+    def recipe(self, basis, comps):
+        recipe = ET.Element("recipe")
+        ET.SubElement(recipe, "name").text = "fuel"
+        ET.SubElement(recipe, "basis").text = basis
+        for nuclide, comp in comps:
+            element = ET.SubElement(recipe, "nuclide")
+            ET.SubElement(element, "id").text = nuclide
+            ET.SubElement(element, "comp").text = str(comp)
+        return recipe
+
+    def test_recipe_nuclide_id(self):
+        '''
+        Test that recipe nuclide ids are converted to zzaaammmm ids
+        '''
+        assert recipe_nuclide_id("92235") == 922350000
+        assert recipe_nuclide_id(" 922350000 ") == 922350000
+
+    def test_recipe_comp(self):
+        '''
+        Test that mass recipes are normalized, and that other bases
+        raise an error
+        '''
+        comp = recipe_comp(self.recipe("mass", [("92235", 0.1),
+                                                ("922380000", 0.9),
+                                                ("92238", 1.0)]))
+        assert comp == pytest.approx({922350000: 0.05, 922380000: 0.95})
+        with pytest.raises(ValueError):
+            recipe_comp(self.recipe("volume", [("92235", 1.0)]))
+
+    def test_recipe_comp_atom(self):
+        '''
+        Test that atom recipes are converted to mass fractions
+        '''
+        data = pytest.importorskip("openmc.data")
+        comp = recipe_comp(self.recipe("atom", [("92235", 0.05),
+                                                ("92238", 0.95)]))
+        u235 = 0.05 * data.atomic_mass("U235")
+        u238 = 0.95 * data.atomic_mass("U238")
+        assert comp[922350000] == pytest.approx(u235 / (u235 + u238))
+        assert sum(comp.values()) == pytest.approx(1.0)
+
+
+class TestCoreMirror(unittest.TestCase):
+    def test_push_remove(self):
+        '''
+        Test that assemblies are added in order with their compositions,
+        with columns added for new nuclides, and removed by obj_id
+        '''
+        mirror = CoreMirror()
+        uox = FakeMaterial(1, {922350000: 0.05, 922380000: 0.95})
+        mox = FakeMaterial(2, {942390000: 0.1, 922380000: 0.9})
+        mirror.push([uox])
+        mirror.push([mox, FakeMaterial(3, {922380000: 1.0})])
+        assert len(mirror) == 3
+        assert mirror.nuclides.tolist() == [922350000, 922380000,
+                                            942390000]
+        assert mirror.comps() == [uox.comp(), mox.comp(), {922380000: 1.0}]
+        mirror.remove([uox, FakeMaterial(3, {})])
+        assert [material.obj_id for material in mirror.materials] == [2]
+        assert mirror.comps() == [mox.comp()]
+        mirror.clear()
+        assert len(mirror) == 0
+        assert mirror.comps() == []
+
+    def test_update(self):
+        '''
+        Test that all compositions are replaced and normalized
+        '''
+        mirror = CoreMirror()
+        mirror.push([FakeMaterial(1, {922350000: 0.05, 922380000: 0.95}),
+                     FakeMaterial(2, {922380000: 1.0})])
+        mirror.update([{922380000: 90.0, 942390000: 10.0},
+                       {922380000: 4.0, 551370000: 1.0}])
+        comps = mirror.comps()
+        assert comps[0] == pytest.approx({922380000: 0.9, 942390000: 0.1})
+        assert comps[1] == pytest.approx({922380000: 0.8, 551370000: 0.2})
+        with pytest.raises(ValueError):
+            mirror.update([{922380000: 1.0}])
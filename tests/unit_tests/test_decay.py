@@ -0,0 +1,58 @@
+import math
+import numpy as np
+import pytest
+import unittest
+from openmcyclus.decay import decay_matrix, DecayOperator
+
+
+class TestDecay(unittest.TestCase):
+    def setUp(self):
+        '''
+        Set up the decay matrix for the example chain, with 30 day
+        time steps
+        '''
+        self.chain_file = "./examples/chain_endfb71_pwr.xml"
+        self.dt = 30 * 24 * 3600
+        self.names, self.kept, self.projection, self.exponential = \
+            decay_matrix(self.chain_file, self.dt)
+        self.index = {name: ii for ii, name in enumerate(self.kept)}
+
+    def test_decay_matrix(self):
+        '''
+        Test that a single nuclide decays as expected in one time step
+        '''
+        atoms = np.zeros(len(self.kept))
+        atoms[self.index['H3']] = 1
+        decayed = self.exponential @ atoms
+        expected = math.exp(-math.log(2) / 388789600.0 * self.dt)
+        assert decayed[self.index['H3']] == pytest.approx(expected)
+        assert decayed[self.index['He3']] == pytest.approx(1 - expected)
+
+    def test_short_lived(self):
+        '''
+        Test that short lived nuclides are not in the matrix, and are
+        moved to their long lived daughters
+        '''
+        assert 'Kr90' in self.names
+        assert 'Kr90' not in self.kept
+        atoms = np.zeros(len(self.names))
+        atoms[self.names.index('Kr90')] = 1
+        projected = self.projection @ atoms
+        assert projected[self.index['Sr90']] == pytest.approx(1)
+
+    def test_decay_operator(self):
+        '''
+        Test decaying compositions by mass, for one step and for
+        several steps at once
+        '''
+        operator = DecayOperator(self.chain_file, self.dt)
+        comps = [{942410000: 1.0}, {922380000: 1.0, 10010000: 0.5}]
+        decayed = operator.decay(comps, 1)
+        assert decayed[0][942410000] < 1.0
+        assert 952410000 in decayed[0]
+        assert sum(decayed[0].values()) == pytest.approx(1.0, rel=1e-6)
+        assert decayed[1][922380000] == pytest.approx(1.0)
+        two_steps = operator.decay(operator.decay(comps, 1), 1)
+        assert operator.decay(comps, 2)[0][952410000] == pytest.approx(
+            two_steps[0][952410000])
+        assert operator.decay(comps, 0) == comps
@@ -5,7 +5,17 @@ import unittest
 import openmc
 import openmc.deplete as od
 import pandas as pd
-from openmcyclus.depletion import Depletion
+import time
+from openmcyclus.depletion import (Depletion, run_job, clone_template,
+                                   homogenize, split_batches,
+                                   chain_nuclides, run_shared,
+                                   collapse_micro_xs, load_micro_xs,
+                                   get_executor, select_spent,
+                                   budget_executor, kill_executor)
+from openmcyclus.checkpoint import array_to_comps
+from openmcyclus.regression import compare_comps
+from openmcyclus.shared import SharedMasses, fill_masses
+from openmcyclus.xs_library import XSLibrary
 import os
 
 
@@ -56,7 +66,7 @@ class TestDepletion(unittest.TestCase):
     def test_update_materials(self):
         '''
         Test that the provided compositions get written to the
-        materials.xml file correctly.
+        materials.xml file correctly, with the nuclides sorted by id.
         '''
         comps = [{922350000: 0.05, 922380000: 0.95},
                  {551370000: 0.1, 360850000: 0.8, 541350000: 0.1},
@@ -67,14 +77,68 @@ class TestDepletion(unittest.TestCase):
             openmc.material.NuclideTuple('U235', 0.05, 'wo'),
             openmc.material.NuclideTuple('U238', 0.95, 'wo')]
         assert materials[1].nuclides == [
-            openmc.material.NuclideTuple('Cs137', 0.1, 'wo'),
             openmc.material.NuclideTuple('Kr85', 0.80, 'wo'),
+            openmc.material.NuclideTuple('Cs137', 0.1, 'wo'),
             openmc.material.NuclideTuple('Xe135', 0.10, 'wo')]
         assert materials[2].nuclides == [
             openmc.material.NuclideTuple('Pu239', 0.10, 'wo'),
             openmc.material.NuclideTuple('Pu241', 0.90, 'wo')]
         assert material_ids == [5, 6, 7]
 
+    def test_update_materials_arrays(self):
+        '''
+        Test that compositions given as the mass array of a core mirror
+        are written as they are given as dicts
+        '''
+        from openmcyclus.compositions import CoreMirror
+
+        comps = [{922350000: 0.05, 922380000: 0.95},
+                 {942390000: 0.10, 942410000: 0.9}]
+        mirror = CoreMirror()
+        mirror.push([None, None], comps)
+        material_ids, materials = self.deplete.update_materials(
+            (mirror.nuclides, mirror.masses), self.materials)
+        assert material_ids == [5, 6]
+        assert materials[0].nuclides == [
+            openmc.material.NuclideTuple('U235', 0.05, 'wo'),
+            openmc.material.NuclideTuple('U238', 0.95, 'wo')]
+        assert materials[1].nuclides == [
+            openmc.material.NuclideTuple('Pu239', 0.10, 'wo'),
+            openmc.material.NuclideTuple('Pu241', 0.90, 'wo')]
+
+    def test_update_materials_partial(self):
+        '''
+        Test that assembly materials without a composition are not
+        changed, and that too many compositions raise an error
+        '''
+        material_ids, materials = self.deplete.update_materials(
+            [{942390000: 1.0}], self.materials)
+        assert material_ids == [5]
+        assert materials[1].nuclides[0].name == 'U238'
+        with pytest.raises(ValueError):
+            self.deplete.update_materials([{942390000: 1.0}] * 4,
+                                          self.materials)
+
+    def test_clone_template(self):
+        '''
+        Test that the template material is cloned once for each
+        assembly, keeping its properties, and that it and the other
+        assembly materials are removed from the materials
+        '''
+        self.materials[1].volume = 1.0
+        materials = clone_template(self.materials, "assembly_1", 5)
+        names = [material.name for material in materials]
+        assert names == ['water', 'assembly_1', 'assembly_2', 'assembly_3',
+                         'assembly_4', 'assembly_5']
+        assert len({material.id for material in materials}) == 6
+        for material in materials[1:]:
+            assert material.volume == pytest.approx(78.53981633974483)
+        assert materials[-1].volume == pytest.approx(78.53981633974483)
+        assert materials[-1].temperature == 900
+        assert materials[-1].get_mass_density() == pytest.approx(19.1)
+        with pytest.raises(ValueError):
+            clone_template(self.materials, "fuel", 5)
+
     def test_run_depletion(self):
         '''
         Test the run_depletion method, which is only used in the test suite.
@@ -101,3 +165,229 @@ class TestDepletion(unittest.TestCase):
             10.650004036820036, rel=1e-5)
         assert spent_comps[0][942390000] == pytest.approx(
             0.22663550016678385, rel=1e-5)
+
+    def test_get_chain_comps(self):
+        '''
+        Test that the chain compositions have the masses of the spent
+        compositions, and also the nuclides without cross sections
+        '''
+        self.run_depletion(10.3)
+        spent_comps = self.deplete.get_spent_comps(
+            ['5', '6', '7'], self.micro_xs)
+        chain_comps = self.deplete.get_chain_comps(['5', '6', '7'])
+        assert len(chain_comps) == 3
+        for spent_comp, chain_comp in zip(spent_comps, chain_comps):
+            for nuclide, mass in spent_comp.items():
+                assert chain_comp[nuclide] == pytest.approx(mass, rel=1e-8)
+            assert len(set(chain_comp) - set(spent_comp)) > 0
+        assert set(chain_comps[0]) <= set(
+            chain_nuclides("./examples/chain_endfb71_pwr.xml"))
+        os.system('rm examples/depletion_results.h5')
+
+    def test_run_job(self):
+        '''
+        Test that a depletion job gives one spent composition for each
+        fresh composition, and does not write results to the model path
+        '''
+        job = {"comp_list": [{922350000: 0.05, 922380000: 0.95}] * 3,
+               "chain_file": "chain_endfb71_pwr.xml",
+               "path": "./examples/",
+               "power": 100e-6,
+               "flux": 10.3,
+               "dt": 2629846,
+               "steps": 2}
+        spent_comps = run_job(job)
+        assert len(spent_comps) == 3
+        assert 551370000 in spent_comps[0].keys()
+        assert not os.path.isfile('examples/depletion_results.h5')
+
+    def test_run_job_incremental(self):
+        '''
+        Test that depleting one step at a time, with the chain
+        compositions carried between the steps, gives the spent
+        compositions of depleting all of the steps at once
+        '''
+        job = {"comp_list": [{922350000: 0.03, 922380000: 0.97},
+                             {922350000: 0.05, 922380000: 0.95}],
+               "chain_file": "chain_endfb71_pwr.xml",
+               "path": "./examples/",
+               "power": 100e-6,
+               "flux": 10.3,
+               "dt": 2629846,
+               "steps": 3}
+        one_shot = run_job(job)
+        comp_list = job["comp_list"]
+        for step in range(job["steps"]):
+            comp_list = run_job(dict(job, comp_list=comp_list, steps=1,
+                                     chain_comps=True))
+        incremental = select_spent(comp_list, self.micro_xs)
+        errors = compare_comps(one_shot, incremental, atol=1e-9,
+                               rtol=1e-4)
+        assert errors["passed"].all()
+        assert set(comp_list[0]) > set(incremental[0])
+
+    def test_run_shared(self):
+        '''
+        Test that a depletion job with the compositions in shared
+        memory gives the same spent compositions as ``run_job``
+        '''
+        job = {"comp_list": [{922350000: 0.05, 922380000: 0.95}] * 2,
+               "chain_file": "chain_endfb71_pwr.xml",
+               "path": "./examples/",
+               "power": 100e-6,
+               "flux": 10.3,
+               "dt": 2629846,
+               "steps": 2}
+        nuclides = chain_nuclides("./examples/chain_endfb71_pwr.xml")
+        assert np.all(np.diff(nuclides) > 0)
+        assert not nuclides.flags.writeable
+        with SharedMasses((2, 2, len(nuclides))) as shared:
+            fill_masses(job["comp_list"], nuclides, shared.masses[0])
+            shared_job = dict(job, shared=shared.name, n_comps=2)
+            del shared_job["comp_list"]
+            assert run_shared(shared_job) == 2
+            spent_comps = array_to_comps(nuclides, shared.masses[1])
+        for spent_comp, expected in zip(spent_comps, run_job(job)):
+            assert spent_comp.keys() == expected.keys()
+            for nuclide, mass in expected.items():
+                assert spent_comp[nuclide] == pytest.approx(mass)
+
+    def test_get_executor(self):
+        '''
+        Test that the background pool has no more workers than the
+        CPUs divided by the processes of each job, and is shared
+        '''
+        from openmcyclus import depletion
+
+        depletion._executor = None
+        executor = get_executor(os.cpu_count())
+        try:
+            assert executor._max_workers == 1
+            assert get_executor() is executor
+        finally:
+            executor.shutdown()
+            depletion._executor = None
+
+    def test_kill_executor(self):
+        '''
+        Test that the jobs running in the pool of a depletion with a
+        time budget are stopped
+        '''
+        executor = budget_executor()
+        futures = [executor.submit(time.sleep, 60) for _ in range(2)]
+        time.sleep(1)
+        processes = list(executor._processes.values())
+        assert len(processes) == 2
+        start = time.perf_counter()
+        kill_executor(executor)
+        assert time.perf_counter() - start < 10
+        assert not any(process.is_alive() for process in processes)
+        assert not any(future.done() and not future.cancelled() and
+                       future.exception() is None for future in futures)
+
+    def test_collapse_micro_xs(self):
+        '''
+        Test that multigroup cross sections are weighted by the flux
+        spectrum, and that the collapsed cross sections are cached by
+        file and spectrum
+        '''
+        data = np.asarray(self.micro_xs.data)
+        two_group = od.MicroXS(np.concatenate([data, 3 * data], axis=2),
+                               self.micro_xs.nuclides,
+                               self.micro_xs.reactions)
+        collapsed = collapse_micro_xs(two_group, [1.0, 1.0])
+        assert np.asarray(collapsed.data).shape == data.shape
+        assert np.asarray(collapsed.data) == pytest.approx(2 * data)
+        collapsed = collapse_micro_xs(two_group, [3.0, 1.0])
+        assert np.asarray(collapsed.data) == pytest.approx(1.5 * data)
+        with pytest.raises(ValueError):
+            collapse_micro_xs(two_group, [1.0, 1.0, 1.0])
+
+        micro_xs = load_micro_xs("./examples/micro_xs.csv", [10.3])
+        assert np.asarray(micro_xs.data) == pytest.approx(data)
+        assert load_micro_xs("./examples/micro_xs.csv", [10.3]) is micro_xs
+        assert load_micro_xs("./examples/micro_xs.csv", [5.0]) is not \
+            micro_xs
+
+    def test_run_xs_library(self):
+        '''
+        Test that a library with the same cross sections at each burnup
+        gives the same spent compositions as the constant cross
+        sections, and that the cross sections change with burnup
+        '''
+        comps = [{922350000: 0.05, 922380000: 0.95}] * 2
+        expected = self.deplete.run(comps, self.materials, self.micro_xs,
+                                    10.3, 2629846, 3)
+        library = XSLibrary.from_micro_xs([0.0, 50.0], [self.micro_xs] * 2)
+        spent_comps = self.deplete.run(
+            comps, self.materials, self.micro_xs, 10.3, 2629846, 3,
+            xs_library=library, burnups=[0.0, 10.0], burnup_step=1.0)
+        for spent_comp, expected_comp in zip(spent_comps, expected):
+            for nuclide, mass in expected_comp.items():
+                if mass > 1e-8:
+                    assert spent_comp[nuclide] == pytest.approx(mass,
+                                                                rel=1e-5)
+
+        data = np.asarray(self.micro_xs.data)[..., 0]
+        library = XSLibrary([0.0, 50.0], self.micro_xs.nuclides,
+                            self.micro_xs.reactions,
+                            np.stack([data, 0.5 * data]))
+        spent_comps = self.deplete.run(
+            comps, self.materials, self.micro_xs, 10.3, 2629846, 3,
+            xs_library=library, burnups=[0.0, 40.0], burnup_step=1.0)
+        assert spent_comps[0][551370000] > spent_comps[1][551370000]
+        os.system('rm examples/depletion_results.h5')
+
+    def test_homogenize(self):
+        '''
+        Test that the compositions of each group are mixed by mass,
+        and that the spent compositions are split back by mass
+        '''
+        comps = [{922350000: 0.05, 922380000: 0.95},
+                 {922350000: 0.03, 922380000: 0.97},
+                 {942390000: 1.0}]
+        batch_comps, multiplicity = homogenize(comps, [1.0, 3.0, 2.0],
+                                               [[0, 1], [2]])
+        assert multiplicity == [2, 1]
+        assert batch_comps[0][922350000] == pytest.approx(0.035)
+        assert batch_comps[0][922380000] == pytest.approx(0.965)
+        assert batch_comps[1] == {942390000: 1.0}
+
+        spent_comps = split_batches([{922350000: 8.0}, {942390000: 2.0}],
+                                    [1.0, 3.0, 2.0], [[0, 1], [2]])
+        assert spent_comps == [{922350000: 2.0}, {922350000: 6.0},
+                               {942390000: 2.0}]
+
+    def test_run_homogenized(self):
+        '''
+        Test that depleting one homogenized material for a batch of
+        assemblies with different enrichments gives the same total
+        spent masses as depleting each assembly, and that the masses
+        are split back onto the assemblies by mass
+        '''
+        comps = [{922350000: enrichment, 922380000: 1 - enrichment}
+                 for enrichment in [0.03, 0.04, 0.05]]
+        assembly_comps = self.deplete.run(comps, self.materials,
+                                          self.micro_xs, 10.3, 2629846, 2)
+        assert assembly_comps[0][922350000] < assembly_comps[2][922350000]
+        batch_comps, multiplicity = homogenize(comps, [1.0] * 3, [[0, 1, 2]])
+        assert batch_comps[0][922350000] == pytest.approx(0.04)
+        spent_comps = split_batches(
+            self.deplete.run(batch_comps, self.materials, self.micro_xs,
+                             10.3, 2629846, 2, multiplicity=multiplicity),
+            [1.0] * 3, [[0, 1, 2]])
+        assert self.materials[0].volume == pytest.approx(78.53981633974483)
+        total = {}
+        for assembly_comp in assembly_comps:
+            for nuclide, mass in assembly_comp.items():
+                total[nuclide] = total.get(nuclide, 0.0) + mass
+        heavy_metal = sum(total.values())
+        for nuclide, mass in total.items():
+            if mass < 1e-9 * heavy_metal:
+                continue
+            assert sum(spent_comp.get(nuclide, 0.0)
+                       for spent_comp in spent_comps) == pytest.approx(
+                mass, rel=1e-3)
+        for spent_comp in spent_comps:
+            assert spent_comp == pytest.approx(spent_comps[0])
+        os.system('rm examples/depletion_results.h5')
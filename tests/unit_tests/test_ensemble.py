@@ -0,0 +1,151 @@
+import json
+import os
+import tempfile
+import xml.etree.ElementTree as ET
+import pytest
+import unittest
+from unittest import mock
+from openmcyclus.ensemble import (parse_grid, grid_points, apply_params,
+                                  set_enrichment, write_variants, model_keys,
+                                  run_variant, run_ensemble)
+
+
+def pool_variant(variant, mode, cyclus):
+    '''
+    Stand in for a run whose depletion uses the persistent pool, as
+    the runs with depletion_processes 0 do
+    '''
+    from openmcyclus import pool
+
+    if variant["name"] == "variant_2":
+        os._exit(3)
+    row = {"name": variant["name"], "status": 0, "error": ""}
+    row.update(variant["params"])
+    row["children"] = sum(pool.get_pool(2).map(abs, [-1, 1]))
+    return row
+
+
+class TestEnsemble(unittest.TestCase):
+    def test_parse_grid(self):
+        '''
+        Test that the parameters are read from the command line and a
+        JSON file, and that every combination is made
+        '''
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            grid_file = os.path.join(tmp_dir, "grid.json")
+            with open(grid_file, "w") as f:
+                json.dump({"flux": [10.4, 20.8]}, f)
+            grid = parse_grid(["cycle_time=12,18", "chain_file=a.xml"],
+                              grid_file)
+        assert grid == {"flux": [10.4, 20.8], "cycle_time": [12, 18],
+                        "chain_file": ["a.xml"]}
+        points = grid_points(grid)
+        assert len(points) == 4
+        assert points[0] == {"flux": 10.4, "cycle_time": 12,
+                             "chain_file": "a.xml"}
+        with pytest.raises(ValueError):
+            parse_grid(["cycle_time"])
+
+    def test_apply_params(self):
+        '''
+        Test that inputs are set for all reactors or one facility, and
+        that the enrichment changes the fresh fuel recipes
+        '''
+        root = ET.parse("./examples/complex.xml").getroot()
+        apply_params(root, {"cycle_time": 18, "OneReactor/flux": 20.0,
+                            "flux_spectrum": [1.0, 2.0],
+                            "enrichment": 0.05})
+        config = root.find("facility/config/DepleteReactor")
+        assert config.findtext("cycle_time") == "18"
+        assert config.findtext("flux") == "20.0"
+        assert [val.text for val in
+                config.findall("flux_spectrum/val")] == ["1.0", "2.0"]
+        recipes = {recipe.findtext("name"): {
+            nuclide.findtext("id"): float(nuclide.findtext("comp"))
+            for nuclide in recipe.findall("nuclide")}
+            for recipe in root.findall("recipe")}
+        assert recipes["uox"]["92235"] == pytest.approx(0.05)
+        assert recipes["uox"]["92238"] == pytest.approx(0.95)
+        apply_params(root, {"OtherReactor/cycle_time": 6})
+        assert config.findtext("cycle_time") == "18"
+
+    def test_set_enrichment(self):
+        '''
+        Test that the enrichment is set for recipes with nuclide ids in
+        the zzaaammmm form, that an error is raised if no recipe has
+        uranium, and that the enrichment of one facility warns about
+        the other reactors using its recipes
+        '''
+        root = ET.parse("./examples/complex.xml").getroot()
+        for nuclide in root.findall("recipe/nuclide"):
+            nuclide.find("id").text = nuclide.findtext("id") + "0000"
+        assert set_enrichment(root, ["uox", "mox"], 0.04) == ["uox"]
+        comps = {nuclide.findtext("id"): float(nuclide.findtext("comp"))
+                 for nuclide in root.findall("recipe")[0].findall("nuclide")}
+        assert comps["922350000"] == pytest.approx(0.04)
+        assert comps["922380000"] == pytest.approx(0.96)
+        with pytest.raises(ValueError):
+            set_enrichment(root, ["mox"], 0.04)
+        mox_root = ET.fromstring(ET.tostring(root))
+        apply_params(mox_root, {"fuel_inrecipes": ["mox"]})
+        with pytest.raises(ValueError):
+            apply_params(mox_root, {"OneReactor/enrichment": 0.04})
+        facility = [x for x in root.findall("facility")
+                    if x.findtext("name") == "OneReactor"][0]
+        other = ET.fromstring(ET.tostring(facility))
+        other.find("name").text = "OtherReactor"
+        root.append(other)
+        with pytest.warns(UserWarning, match="OtherReactor"):
+            apply_params(root, {"OneReactor/enrichment": 0.05})
+
+    def test_write_variants(self):
+        '''
+        Test that an input is written for each point, and that the
+        models used by the inputs are found
+        '''
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            variants = write_variants(
+                "./examples/simple.xml",
+                grid_points({"thermal_power": [100, 200],
+                             "assembly_template": ["assembly_1"]}),
+                tmp_dir)
+            assert [variant["name"] for variant in variants] == [
+                "variant_0", "variant_1"]
+            root = ET.parse(variants[1]["input_file"]).getroot()
+            assert root.findtext(
+                "facility/config/DepleteReactor/thermal_power") == "200"
+            keys = model_keys([variant["input_file"]
+                               for variant in variants])
+        assert keys == {("./examples/", "chain_endfb71_pwr.xml", (),
+                         "assembly_1", 3, "", "openmc", "")}
+
+    def test_run_variant_error(self):
+        '''
+        Test that a failed run is reported in its summary row
+        '''
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            variant = {"name": "variant_0", "params": {"flux": 1.0},
+                       "input_file": os.path.join(tmp_dir, "missing.xml"),
+                       "output_file": os.path.join(tmp_dir, "out.sqlite")}
+            row = run_variant(variant, mode="subprocess",
+                              cyclus=os.path.join(tmp_dir, "no-cyclus"))
+        assert row["name"] == "variant_0"
+        assert row["flux"] == 1.0
+        assert row["status"] == 1
+        assert "FileNotFoundError" in row["error"]
+        assert row["wall_time_s"] >= 0
+
+    def test_run_ensemble(self):
+        '''
+        Test that the runs can start processes of their own, and that
+        a run whose process exits without a row is reported
+        '''
+        variants = [{"name": "variant_" + str(ii), "params": {"flux": ii}}
+                    for ii in range(3)]
+        with mock.patch("openmcyclus.ensemble.run_variant", pool_variant):
+            summary = run_ensemble(variants, processes=2)
+        assert summary["name"].tolist() == ["variant_0", "variant_1",
+                                            "variant_2"]
+        assert summary["status"].tolist() == [0, 0, 1]
+        assert summary["children"].tolist()[:2] == [2, 2]
+        assert summary["error"].tolist()[2] == "exited with code 3"
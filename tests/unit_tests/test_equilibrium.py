@@ -0,0 +1,94 @@
+import pytest
+import unittest
+from openmcyclus.equilibrium import (Equilibrium, mix, relative_difference,
+                                    scale_depletion)
+
+
+class TestEquilibrium(unittest.TestCase):
+    def setUp(self):
+        '''
+        Set up batches of a two batch core and their spent compositions
+        '''
+        self.batches = [(0, {922350000: 0.03, 922380000: 0.97}),
+                        (0, {922350000: 0.05, 922380000: 0.95})]
+        self.outputs = [{922350000: 1.0, 942390000: 0.5},
+                        {922350000: 3.0, 942390000: 0.2}]
+
+    def test_mix(self):
+        '''
+        Test that compositions are normalized and mixed by mass
+        '''
+        mixed = mix([{922350000: 2.0, 922380000: 8.0}, {922380000: 1.0}],
+                    [1.0, 3.0])
+        assert mixed[922350000] == pytest.approx(0.05)
+        assert mixed[922380000] == pytest.approx(0.95)
+
+    def test_relative_difference(self):
+        '''
+        Test the relative difference between compositions
+        '''
+        assert relative_difference({1: 1.0, 2: 1.0}, {1: 1.0, 2: 1.0}) == 0
+        assert relative_difference({1: 1.1}, {1: 1.0, 2: 1.0}) == \
+            pytest.approx(0.55)
+        assert relative_difference({}, {}) == 0
+
+    def test_converge(self):
+        '''
+        Test that the equilibrium is detected after two cycles with the
+        same compositions, and that the spent compositions are reused
+        until the check interval
+        '''
+        equilibrium = Equilibrium(1e-3, 2)
+        assert not equilibrium.update(self.batches, self.outputs)
+        assert equilibrium.lookup(self.batches) is None
+        outputs = [{nuc: mass * (1 + 1e-4) for nuc, mass in output.items()}
+                   for output in self.outputs]
+        assert equilibrium.update(self.batches, outputs)
+        assert equilibrium.lookup(self.batches) == outputs
+        equilibrium.reuse()
+        assert equilibrium.lookup(self.batches) == outputs
+        equilibrium.reuse()
+        assert equilibrium.lookup(self.batches) is None
+        assert equilibrium.update(self.batches, outputs)
+        assert equilibrium.lookup(self.batches) == outputs
+
+    def test_change(self):
+        '''
+        Test that the spent compositions are not reused if the fresh
+        compositions or recipes change, or if the spent compositions
+        change when the depletion is run again
+        '''
+        equilibrium = Equilibrium(1e-3, 0)
+        equilibrium.update(self.batches, self.outputs)
+        equilibrium.update(self.batches, self.outputs)
+        changed = [self.batches[0], (0, {922350000: 0.04,
+                                         922380000: 0.96})]
+        assert equilibrium.lookup(changed) is None
+        recipe = [self.batches[0], (1, self.batches[1][1])]
+        assert equilibrium.lookup(recipe) is None
+        assert equilibrium.lookup(self.batches[:1]) is None
+        assert equilibrium.lookup(self.batches) == self.outputs
+        assert not equilibrium.update(
+            self.batches, [self.outputs[0], {922350000: 2.0}])
+        assert equilibrium.lookup(self.batches) is None
+
+    def test_scale_depletion(self):
+        '''
+        Test that the change of the most similar earlier composition is
+        added, scaled, and that negative fractions are removed
+        '''
+        fresh = [{922350000: 0.03, 922380000: 0.97},
+                 {922350000: 0.05, 922380000: 0.95}]
+        spent = [{922350000: 0.01, 922380000: 0.97, 942390000: 0.02},
+                 {922350000: 0.02, 922380000: 0.95, 942390000: 0.03}]
+        estimates = scale_depletion(
+            [{922350000: 4.9, 922380000: 95.1}, {922350000: 3.0,
+                                                 922380000: 97.0}],
+            fresh, spent, 0.5)
+        assert estimates[0] == pytest.approx(
+            {922350000: 0.034, 922380000: 0.951, 942390000: 0.015})
+        assert estimates[1] == pytest.approx(
+            {922350000: 0.02, 922380000: 0.97, 942390000: 0.01})
+        estimates = scale_depletion([fresh[0]], fresh, spent, 2.0)
+        assert estimates[0] == pytest.approx(
+            {922380000: 0.97, 942390000: 0.04})
@@ -0,0 +1,98 @@
+import os
+import tempfile
+import xml.etree.ElementTree as ET
+import pytest
+import unittest
+from openmcyclus.ensemble import apply_params
+from openmcyclus.estimate import (read_reactors, read_deployments,
+                                  transmute_times, reactor_solves, estimate,
+                                  REACTOR_COLUMNS, TIMELINE_COLUMNS)
+
+
+class TestEstimate(unittest.TestCase):
+    def test_transmute_times(self):
+        '''
+        Test the transmute times of the reactors in the examples, which
+        match the trades of the integration tests, and of a reactor
+        without refueling time
+        '''
+        assert transmute_times(0, -1, 2, 1, 10) == [(2, 2), (5, 2), (8, 2)]
+        assert transmute_times(3, 10, 2, 1, 20) == [
+            (5, 2), (8, 2), (11, 2), (13, 1)]
+        assert transmute_times(3, 10, 2, 1, 13) == [(5, 2), (8, 2), (11, 2)]
+        assert transmute_times(0, -1, 3, 0, 10) == [(3, 3), (6, 3), (9, 3)]
+        assert transmute_times(12, -1, 2, 1, 10) == []
+
+    def test_read_deployments(self):
+        '''
+        Test that the reactors are found in the initial facility lists
+        and in the DeployInst build lists, with their lifetimes
+        '''
+        root = ET.parse("./examples/complex.xml").getroot()
+        reactors = read_reactors(root)
+        assert list(reactors) == ["OneReactor"]
+        assert reactors["OneReactor"]["lifetime"] == 10
+        assert reactors["OneReactor"]["n_assem_core"] == 3
+        assert read_deployments(root, {"OneReactor": 10}) == [
+            ("OneReactor", 3, 10)]
+        config = root.find("region/institution/config/DeployInst")
+        ET.SubElement(ET.SubElement(config, "lifetimes"), "val").text = "4"
+        config.find("n_build/val").text = "2"
+        assert read_deployments(root, {"OneReactor": 10}) == [
+            ("OneReactor", 3, 4)] * 2
+        root = ET.parse("./examples/simple.xml").getroot()
+        assert read_deployments(root, {"OneReactor": -1}) == [
+            ("OneReactor", 0, -1)]
+
+    def test_reactor_solves(self):
+        '''
+        Test the solves of the depletion modes, with a calibrated cost
+        and a time budget
+        '''
+        root = ET.parse("./examples/simple.xml").getroot()
+        reactor = read_reactors(root)["OneReactor"]
+        cost = {"overhead": 1.0, "per_unit": 0.5}
+        transmutes = [(2, 2), (5, 2)]
+        assert reactor_solves(reactor, transmutes, cost) == [
+            (2, 2, 2, 4.0), (5, 5, 2, 4.0)]
+        assert reactor_solves(dict(reactor, async_depletion=True),
+                              transmutes, cost)[1] == (3, 5, 2, 4.0)
+        assert reactor_solves(dict(reactor, incremental_depletion=True),
+                              transmutes, cost)[:2] == [
+            (0, 0, 1, 2.5), (1, 1, 1, 2.5)]
+        assert reactor_solves(dict(reactor, transmute_budget=3.0),
+                              transmutes, cost)[0][3] == 3.0
+        assert reactor_solves(dict(reactor, homogenize_batches=True),
+                              transmutes, cost)[0][3] == 4.0
+        assert reactor_solves(dict(reactor, depletion_mode="table"),
+                              transmutes, cost) == []
+
+    def test_estimate(self):
+        '''
+        Test the estimate of a fleet of reactors, with solves that
+        block the run and solves that run in the background
+        '''
+        root = ET.parse("./examples/simple.xml").getroot()
+        root.find("region/institution/initialfacilitylist/entry[3]/"
+                  "number").text = "2"
+        cost = {"overhead": 1.0, "per_unit": 0.5}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_file = os.path.join(tmp_dir, "fleet.xml")
+            ET.ElementTree(root).write(input_file)
+            reactors, timeline = estimate(input_file, {"OneReactor": cost})
+            apply_params(root, {"async_depletion": "true"})
+            ET.ElementTree(root).write(input_file)
+            _, async_timeline = estimate(input_file, {"OneReactor": cost})
+        assert list(reactors.columns) == REACTOR_COLUMNS
+        assert list(timeline.columns) == TIMELINE_COLUMNS
+        assert len(reactors) == 2
+        assert reactors["transmutes"].tolist() == [3, 3]
+        assert reactors["assemblies"].tolist() == [6, 6]
+        assert reactors["solve_s"].tolist() == pytest.approx([12.0, 12.0])
+        assert len(timeline) == 10
+        assert timeline.loc[2, "solves"] == 2
+        assert timeline["in_flight"].max() == 2
+        assert timeline["wall_s"].sum() == pytest.approx(24.0)
+        assert async_timeline.loc[1, "in_flight"] == 2
+        assert async_timeline["solve_s"].sum() == pytest.approx(24.0)
+        assert async_timeline["wall_s"].sum() == pytest.approx(12.0)
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import numpy as np
+import pytest
+import unittest
+from openmcyclus.export import (nuclide_masses, transmute_columns,
+                                get_exporter, close_all, SCALAR_COLUMNS)
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.nuclides = np.array([922350000, 922380000, 942390000])
+        self.fresh = [{922350000: 0.05, 922380000: 0.95},
+                      {922350000: 0.04, 922380000: 0.96}]
+        self.spent = [{922350000: 0.01, 922380000: 0.94, 942390000: 0.01,
+                       551370000: 0.04},
+                      {922350000: 0.02, 922380000: 0.98}]
+
+    def columns(self):
+        return transmute_columns(self.nuclides, 7, 12, [101, 102], 18,
+                                 "openmc", 1e14, 100.0, [10.0, 20.0],
+                                 [30.0, 15.0], 2.5, self.fresh, self.spent)
+
+    def test_nuclide_masses(self):
+        '''
+        Test that the compositions are scaled to the assembly masses,
+        and that nuclides that are not columns are added up
+        '''
+        masses, other = nuclide_masses(self.spent, [10.0, 20.0],
+                                       self.nuclides)
+        assert masses[0] == pytest.approx([0.1, 9.4, 0.1])
+        assert masses[1] == pytest.approx([0.4, 19.6, 0.0])
+        assert other == pytest.approx([0.4, 0.0])
+
+    def test_transmute_columns(self):
+        '''
+        Test that there is one row for each assembly, with the scalar
+        columns first and a fresh and spent column for each nuclide
+        '''
+        columns = self.columns()
+        names = [name for name, _ in SCALAR_COLUMNS]
+        assert list(columns)[:len(names)] == names
+        assert list(columns)[len(names):] == [
+            "Fresh_922350000", "Fresh_922380000", "Fresh_942390000",
+            "Spent_922350000", "Spent_922380000", "Spent_942390000"]
+        assert columns["AssemblyId"].tolist() == [101, 102]
+        assert columns["Time"].tolist() == [12, 12]
+        assert columns["Source"].tolist() == ["openmc", "openmc"]
+        assert columns["Fresh_922350000"] == pytest.approx([0.5, 0.8])
+        assert columns["SpentOther"] == pytest.approx([0.4, 0.0])
+
+    def test_exporter(self):
+        '''
+        Test that each transmute is written as a row group, to Parquet
+        files and Arrow streams
+        '''
+        pa = pytest.importorskip("pyarrow")
+        import pyarrow.parquet as pq
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for name in ["transmutes.parquet", "transmutes.arrow"]:
+                filename = os.path.join(tmp_dir, name)
+                exporter = get_exporter(filename, self.nuclides)
+                assert get_exporter(filename, self.nuclides) is exporter
+                with pytest.raises(ValueError):
+                    get_exporter(filename, self.nuclides[:2])
+                exporter.write(self.columns())
+                exporter.write(self.columns())
+                assert exporter.rows == 4
+                close_all()
+                if name.endswith(".parquet"):
+                    assert pq.ParquetFile(filename).num_row_groups == 2
+                    table = pq.read_table(filename)
+                else:
+                    with pa.OSFile(filename) as f:
+                        table = pa.ipc.open_stream(f).read_all()
+                assert table.num_rows == 4
+                assert table.column("Spent_942390000").to_pylist() == \
+                    pytest.approx([0.1, 0.0, 0.1, 0.0])
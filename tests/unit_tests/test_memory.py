@@ -0,0 +1,46 @@
+import tracemalloc
+import unittest
+from openmcyclus import memory
+
+
+class TestMemory(unittest.TestCase):
+    def tearDown(self):
+        tracemalloc.stop()
+
+    def test_rss(self):
+        assert memory.rss() > 0
+
+    def test_sample(self):
+        '''
+        Test that the samples include the largest allocation sites
+        once tracing is started, and that they are cached for each
+        time step
+        '''
+        untraced = memory.sample(-1, 3)
+        assert untraced["top"] == []
+        memory.start_tracing()
+        blocks = [bytearray(1024) for ii in range(1000)]
+        first = memory.sample(0, 3)
+        assert first["rss"] > 0
+        assert first["traced"] >= 1
+        assert first["peak"] >= first["traced"]
+        assert len(first["top"]) == 3
+        location, size, count = first["top"][0]
+        assert "test_memory.py" in location
+        assert count >= 1000
+        assert memory.sample(0, 3) is first
+        assert memory.sample(1, 3) is not first
+        assert len(memory.sample(2, 0)["top"]) == 0
+        del blocks
+
+    def test_release(self):
+        '''
+        Test that reference cycles are freed
+        '''
+        class Node(object):
+            pass
+
+        node = Node()
+        node.self = node
+        del node
+        assert memory.release() >= 1
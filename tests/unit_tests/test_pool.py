@@ -0,0 +1,62 @@
+import os
+import unittest
+from unittest import mock
+from openmcyclus import pool
+
+
+class TestPool(unittest.TestCase):
+    def setUp(self):
+        try:
+            from threadpoolctl import threadpool_limits
+        except ImportError:
+            self.blas_limits = None
+        else:
+            self.blas_limits = threadpool_limits(limits=None)
+
+    def tearDown(self):
+        pool.shutdown()
+        if self.blas_limits is not None:
+            self.blas_limits.restore_original_limits()
+
+    def test_get_pool(self):
+        '''
+        Test that a pool is kept and reused for each configuration
+        '''
+        first = pool.get_pool(2)
+        assert pool.get_pool(2) is first
+        assert first.map(abs, [-1, -2, 3]) == [1, 2, 3]
+        second = pool.get_pool(1)
+        assert second is not first
+        assert pool.get_pool(2) is first
+        assert first.map(abs, [-1]) == [1]
+        pool.shutdown()
+        assert pool.get_pool(1) is not second
+
+    def test_set_blas_threads(self):
+        '''
+        Test that the BLAS environment variables are set, and are
+        not changed for less than one thread
+        '''
+        with mock.patch.dict(os.environ, {}, clear=True):
+            pool.set_blas_threads(0)
+            assert len(os.environ) == 0
+            pool.set_blas_threads(2)
+            for variable in pool.BLAS_VARIABLES:
+                assert os.environ[variable] == "2"
+
+    def test_configure(self):
+        '''
+        Test that OpenMC uses the persistent pool, or no pool
+        for one process
+        '''
+        from openmc.deplete import pool as openmc_pool
+
+        pool.configure(2)
+        assert openmc_pool.USE_MULTIPROCESSING
+        with openmc_pool.Pool(openmc_pool.NUM_PROCESSES) as first:
+            pass
+        with openmc_pool.Pool(openmc_pool.NUM_PROCESSES) as second:
+            assert second is first
+        assert first.map(abs, [-1]) == [1]
+        pool.configure(1)
+        assert not openmc_pool.USE_MULTIPROCESSING
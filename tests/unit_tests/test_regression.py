@@ -0,0 +1,82 @@
+import os
+import tempfile
+import numpy as np
+import pytest
+import unittest
+from openmcyclus.regression import (read_cases, run_cases,
+                                    save_golden, load_golden, compare_comps,
+                                    report, REPORT_COLUMNS)
+
+
+def scale_solve(job):
+    '''
+    Fake depletion that halves U235 and scales the other nuclides
+    by a factor from the job
+    '''
+    factor = job.get("factor", 1.0)
+    return [{nuc: mass * (0.5 if nuc == 922350000 else factor)
+             for nuc, mass in comp.items()}
+            for comp in job["comp_list"]]
+
+
+class TestRegression(unittest.TestCase):
+    def test_read_cases(self):
+        '''
+        Test that a case is made for each fresh fuel recipe of each
+        DepleteReactor in the examples
+        '''
+        cases = read_cases("./examples/simple.xml")
+        assert list(cases) == ["simple/OneReactor/uox"]
+        job = cases["simple/OneReactor/uox"]
+        assert len(job["comp_list"]) == 3
+        assert job["comp_list"][0] == pytest.approx(
+            {922350000: 0.00711, 922380000: 0.99289})
+        assert job["steps"] == 2
+        assert job["power"] == 100
+        assert job["flux"] == 10.4
+        assert job["path"] == "./examples/"
+        cases = read_cases("./examples/complex.xml", model_path="model")
+        assert len(cases) == 2
+        assert all(job["path"] == "model" + os.sep for job in cases.values())
+
+    def test_compare_comps(self):
+        '''
+        Test the nuclide by nuclide comparison, with nuclides missing
+        from one of the compositions
+        '''
+        reference = [{922350000: 1.0, 922380000: 100.0}]
+        candidate = [{922350000: 1.0 + 1e-3, 942390000: 1e-6}]
+        errors = compare_comps(reference, candidate, atol=1e-5, rtol=1e-2)
+        errors = errors.set_index("nuclide")
+        assert errors.loc[922350000, "abs_error"] == pytest.approx(1e-3)
+        assert errors.loc[922350000, "passed"]
+        assert errors.loc[922380000, "rel_error"] == pytest.approx(1.0)
+        assert not errors.loc[922380000, "passed"]
+        assert errors.loc[942390000, "rel_error"] == np.inf
+        assert errors.loc[942390000, "passed"]
+        with pytest.raises(ValueError):
+            compare_comps(reference, candidate * 2)
+
+    def test_golden(self):
+        '''
+        Test that golden results are written and read back, and that a
+        changed path is reported with the worst nuclides first
+        '''
+        cases = read_cases("./examples/complex.xml")
+        reference = run_cases(cases, scale_solve)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "golden.npz")
+            save_golden(filename, cases, reference)
+            golden_cases, golden = load_golden(filename)
+        assert golden_cases == cases
+        for name in cases:
+            assert golden[name][0] == pytest.approx(reference[name][0])
+
+        same = report(golden, run_cases(cases, scale_solve))
+        assert list(same.columns) == REPORT_COLUMNS
+        assert same["passed"].all()
+        changed = report(golden, run_cases(cases, scale_solve,
+                                           {"factor": 1.1}), n_worst=1)
+        assert len(changed) == len(cases)
+        assert not changed["passed"].any()
+        assert changed["rel_error"].values == pytest.approx(0.1)
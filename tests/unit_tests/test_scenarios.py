@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+from openmcyclus.scenarios import write_fleet, write_materials
+
+
+class TestScenarios(unittest.TestCase):
+    def setUp(self):
+        '''
+        Create a temporary directory for the generated scenarios
+        '''
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = self.tmpdir.name
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_write_materials(self):
+        '''
+        Test that the materials file has one assembly material for
+        each assembly in the core, with unique ids, and that the other
+        materials are kept.
+        '''
+        out_file = write_materials("./examples/materials.xml", 5,
+                                   os.path.join(self.path, "materials.xml"))
+        materials = ET.parse(out_file).getroot().findall('material')
+        names = [material.get('name') for material in materials]
+        ids = [material.get('id') for material in materials]
+        assert names == ['assembly_1', 'assembly_2', 'assembly_3',
+                         'assembly_4', 'assembly_5', 'water']
+        assert len(set(ids)) == 6
+
+    def test_write_fleet_shared(self):
+        '''
+        Test the number of prototypes, deployment times, and model
+        path of a fleet sharing a single model
+        '''
+        input_file = write_fleet(self.path, 4,
+                                 reactor_config={"cycle_time": 3,
+                                                 "n_assem_core": 6},
+                                 deploy_start=2, deploy_interval=3)
+        root = ET.parse(input_file).getroot()
+        reactors = root.findall('facility/config/DepleteReactor')
+        assert len(reactors) == 4
+        assert all(reactor.find('cycle_time').text == '3'
+                   for reactor in reactors)
+        assert len({reactor.find('model_path').text
+                    for reactor in reactors}) == 1
+        build_times = [val.text for val in root.findall(
+            'region/institution/config/DeployInst/build_times/val')]
+        assert build_times == ['2', '5', '8', '11']
+        materials = ET.parse(os.path.join(self.path, "model",
+                                          "materials.xml")).getroot()
+        assert len(materials.findall('material')) == 7
+
+    def test_write_fleet_distinct(self):
+        '''
+        Test that each reactor gets its own model directory
+        '''
+        input_file = write_fleet(self.path, 3, shared_model=False)
+        root = ET.parse(input_file).getroot()
+        paths = [reactor.find('model_path').text for reactor in
+                 root.findall('facility/config/DepleteReactor')]
+        assert len(set(paths)) == 3
+        for path in paths:
+            assert os.path.isfile(os.path.join(path, "micro_xs.csv"))
+            assert os.path.isfile(os.path.join(path,
+                                               "chain_endfb71_pwr.xml"))
@@ -0,0 +1,58 @@
+import multiprocessing
+import numpy as np
+import pytest
+import unittest
+from openmcyclus.checkpoint import array_to_comps
+from openmcyclus.shared import SharedMasses, fill_masses
+
+
+def double_masses(name, shape):
+    '''
+    Double the fresh masses into the spent masses in another process
+    '''
+    shared = SharedMasses(shape, name)
+    shared.masses[1] = shared.masses[0] * 2
+    shared.close()
+
+
+class TestShared(unittest.TestCase):
+    def setUp(self):
+        self.nuclides = np.array([551370000, 922350000, 922380000,
+                                  942390000])
+        self.comps = [{922350000: 0.05, 922380000: 0.95},
+                      {942390000: 1.0, 551370000: 0.5}]
+
+    def test_fill_masses(self):
+        '''
+        Test that compositions are written to the nuclide columns and
+        that rows are overwritten
+        '''
+        masses = np.ones((2, 4))
+        fill_masses(self.comps, self.nuclides, masses)
+        assert masses.tolist() == [[0.0, 0.05, 0.95, 0.0],
+                                   [0.5, 0.0, 0.0, 1.0]]
+        assert array_to_comps(self.nuclides, masses) == self.comps
+        with pytest.raises(ValueError):
+            fill_masses([{10010000: 1.0}], self.nuclides, masses)
+        with pytest.raises(ValueError):
+            fill_masses([{952410000: 1.0}], self.nuclides, masses)
+
+    def test_shared_masses(self):
+        '''
+        Test that another process reads and writes the same block,
+        and that the block is removed by its owner
+        '''
+        shape = (2, len(self.comps), len(self.nuclides))
+        with SharedMasses(shape) as shared:
+            assert not shared.masses.any()
+            fill_masses(self.comps, self.nuclides, shared.masses[0])
+            process = multiprocessing.get_context("fork").Process(
+                target=double_masses, args=(shared.name, shape))
+            process.start()
+            process.join()
+            spent_comps = array_to_comps(self.nuclides, shared.masses[1])
+            name = shared.name
+        assert spent_comps[1] == {942390000: 2.0, 551370000: 1.0}
+        assert shared.masses is None
+        with pytest.raises(FileNotFoundError):
+            SharedMasses(shape, name)
@@ -0,0 +1,86 @@
+import numpy as np
+import os
+import pytest
+import unittest
+from openmcyclus.table import BurnupTable, enrichment, uranium, build_table
+from openmcyclus.table import interpolation_error, midpoints
+
+
+class TestBurnupTable(unittest.TestCase):
+    def setUp(self):
+        '''
+        Set up a table that is linear in enrichment and time, so that
+        the interpolation is exact
+        '''
+        axes = {"enrichment": [0.02, 0.04, 0.06], "flux": [1e14],
+                "power": [10, 20], "time": [1e7, 2e7]}
+        e, f, p, t = np.meshgrid(*axes.values(), indexing='ij')
+        data = np.stack([1 - e - t * 1e-9, e, t * 1e-9], axis=-1)
+        self.table = BurnupTable(axes, [922380000, 922350000, 551370000],
+                                 data)
+
+    def test_interpolate(self):
+        '''
+        Test interpolation inside the grid and clamping outside
+        '''
+        spent = self.table.interpolate([0.03, 0.05, 0.10], 1e14, 15, 1.5e7)
+        assert spent.shape == (3, 3)
+        assert spent[0] == pytest.approx([1 - 0.03 - 0.015, 0.03, 0.015])
+        assert spent[1] == pytest.approx([1 - 0.05 - 0.015, 0.05, 0.015])
+        assert spent[2] == pytest.approx([1 - 0.06 - 0.015, 0.06, 0.015])
+
+    def test_spent_comps(self):
+        '''
+        Test that the spent compositions are scaled by mass
+        '''
+        comps = [{922350000: 0.04, 922380000: 0.96},
+                 {922350000: 0.02, 922380000: 0.98, 942390000: 0.01}]
+        spent_comps = self.table.spent_comps(comps, [10, 5], 1e14, 10, 1e7)
+        assert spent_comps[0][922350000] == pytest.approx(0.4)
+        assert spent_comps[0][551370000] == pytest.approx(0.1)
+        assert spent_comps[1][922350000] == pytest.approx(0.1)
+
+    def test_check(self):
+        '''
+        Test that fuel without uranium and values outside of the grid
+        are found, and that the grid edges are inside
+        '''
+        uox = {922350000: 0.04, 922380000: 0.96}
+        assert self.table.check([uox], 1e14, 20, 1e7) == []
+        assert self.table.check([{922350000: 0.06, 922380000: 0.94}],
+                                1e14, 10, 2e7) == []
+        problems = self.table.check([uox, {942390000: 1.0}], 1e14, 15,
+                                    1.5e7)
+        assert len(problems) == 2
+        assert "U235" in problems[0]
+        assert problems[1].startswith("enrichment")
+        problems = self.table.check([uox], 2e14, 30, 1.5e7)
+        assert [problem.split()[0] for problem in problems] == [
+            "flux", "power"]
+        assert uranium({942390000: 1.0}) == 0
+
+    def test_enrichment(self):
+        assert enrichment({922350000: 1, 922380000: 3}) == 0.25
+        assert enrichment({942390000: 1}) == 0
+
+    def test_write_read(self):
+        self.table.write("./examples/test_table.npz")
+        table = BurnupTable.from_file("./examples/test_table.npz")
+        assert np.array_equal(table.data, self.table.data)
+        assert np.array_equal(table.nuclides, self.table.nuclides)
+        os.remove("./examples/test_table.npz")
+
+    def test_build_table(self):
+        '''
+        Test building a small table with the OpenMC depletion and
+        the interpolation error at the midpoint
+        '''
+        table = build_table("./examples/", "chain_endfb71_pwr.xml",
+                            [0.03, 0.05], [10.3], [1e-4], [2], dt=2629846)
+        assert table.data.shape == (2, 1, 1, 1, len(table.nuclides))
+        errors = interpolation_error(table, "./examples/",
+                                     "chain_endfb71_pwr.xml",
+                                     midpoints(table))
+        assert len(errors) == 1
+        assert errors[0]["enrichment"] == pytest.approx(0.04)
+        assert errors[0]["max_rel_error"] < 0.1
@@ -0,0 +1,165 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+import pytest
+from openmcyclus.checkpoint import file_hash
+from openmcyclus.worker import (LocalWorkers, Worker, WorkerClient,
+                                WorkerError, parse_address, get_authkey,
+                                KEY_VARIABLE)
+
+
+def double_solve(job):
+    '''
+    Stand in for a depletion, which doubles the masses and checks that
+    the model files were received
+    '''
+    for name in [job["chain_file"], "materials.xml", "micro_xs.csv"]:
+        assert os.path.isfile(job["path"] + name)
+    return job["nuclides"], job["masses"] * 2
+
+
+def slow_solve(job):
+    time.sleep(5)
+    return job["nuclides"], job["masses"]
+
+
+def pool_solve(job):
+    '''
+    Stand in for a depletion that runs its matrix exponentials in the
+    persistent pool, as ``Depletion.run`` does with more than one
+    process
+    '''
+    from openmcyclus import pool
+
+    scale = sum(pool.get_pool(2).map(abs, [-1, 1]))
+    return job["nuclides"], job["masses"] * scale
+
+
+class TestWorker(unittest.TestCase):
+    def setUp(self):
+        '''
+        Write model files and a depletion job
+        '''
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = self.tmp_dir.name + os.sep
+        for name in ["chain.xml", "materials.xml", "micro_xs.csv"]:
+            with open(self.path + name, "w") as f:
+                f.write(name)
+        self.job = {"comp_list": [{922350000: 0.05, 922380000: 0.95},
+                                  {942390000: 1.0}],
+                    "chain_file": "chain.xml",
+                    "path": self.path,
+                    "power": 100e-6,
+                    "flux": 10.3,
+                    "dt": 2629846,
+                    "steps": 2}
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_parse_address(self):
+        '''
+        Test TCP and local socket addresses
+        '''
+        assert parse_address("node1:5000") == ("node1", 5000)
+        assert parse_address("/tmp/worker.sock") == "/tmp/worker.sock"
+
+    def test_run(self):
+        '''
+        Test that jobs are run by the workers, and that the model files
+        are only sent once
+        '''
+        with LocalWorkers(2, solve=double_solve) as workers:
+            client = WorkerClient(workers.addresses, timeout=10,
+                                  authkey=workers.authkey)
+            for ii in range(3):
+                spent_comps = client.run(self.job)
+                assert spent_comps[0][922350000] == pytest.approx(0.1)
+                assert spent_comps[1] == {942390000: 2.0}
+            assert client.send_files(
+                workers.addresses[0], self.path,
+                {"chain.xml": file_hash(self.path + "chain.xml")}) == 0
+            client.close()
+
+    def test_retry(self):
+        '''
+        Test that a job is sent to another worker if one is stopped,
+        and that an error is raised if all are stopped
+        '''
+        with LocalWorkers(2, solve=double_solve) as workers:
+            client = WorkerClient(workers.addresses, timeout=10, retries=1,
+                                  authkey=workers.authkey)
+            workers.stop(0)
+            for ii in range(2):
+                assert len(client.run(self.job)) == 2
+            workers.stop(1)
+            with pytest.raises(WorkerError):
+                client.run(self.job)
+
+    def test_timeout(self):
+        '''
+        Test that a job that takes too long raises an error
+        '''
+        with LocalWorkers(1, solve=slow_solve) as workers:
+            client = WorkerClient(workers.addresses, timeout=0.5, retries=0,
+                                  authkey=workers.authkey)
+            start = time.perf_counter()
+            with pytest.raises(WorkerError):
+                client.run(self.job)
+            assert time.perf_counter() - start < 4
+
+    def test_pool_job(self):
+        '''
+        Test that a job can start a pool of processes in a worker,
+        instead of failing and falling back to the Cyclus process
+        '''
+        with LocalWorkers(1, solve=pool_solve) as workers:
+            client = WorkerClient(workers.addresses, timeout=30, retries=0,
+                                  authkey=workers.authkey)
+            spent_comps = client.run(self.job)
+            assert spent_comps[1] == {942390000: 2.0}
+            client.close()
+
+    def test_authkey(self):
+        '''
+        Test that workers and clients are not started without a key,
+        and that a client with the wrong key is refused
+        '''
+        with mock.patch.dict(os.environ, {KEY_VARIABLE: ""}):
+            with pytest.raises(ValueError):
+                get_authkey()
+            with pytest.raises(ValueError):
+                Worker(self.path + "worker.sock", self.path + "cache")
+            with pytest.raises(ValueError):
+                WorkerClient([self.path + "worker.sock"])
+        with mock.patch.dict(os.environ, {KEY_VARIABLE: "secret"}):
+            assert get_authkey() == b"secret"
+        with LocalWorkers(1, solve=double_solve) as workers:
+            client = WorkerClient(workers.addresses, timeout=10, retries=0,
+                                  authkey=b"wrong")
+            with pytest.raises(WorkerError):
+                client.run(self.job)
+
+    def test_model_files(self):
+        '''
+        Test that model file names with a directory and invalid hashes
+        are refused, so files stay in the worker cache
+        '''
+        worker = Worker(self.path + "worker.sock", self.path + "cache",
+                        authkey=b"secret")
+        digest = file_hash(self.path + "chain.xml")
+        try:
+            assert worker.model_path({"chain.xml": digest}).startswith(
+                self.path + "cache")
+            for name in ["../chain.xml", "models/chain.xml", "..", ""]:
+                with pytest.raises(ValueError):
+                    worker.model_path({name: digest})
+            with pytest.raises(ValueError):
+                worker.model_path({"chain.xml": "../" + digest[3:]})
+            with pytest.raises(ValueError):
+                worker.handle(("has", "../files"))
+            assert not os.path.exists(self.path + "cache/models/chain.xml")
+        finally:
+            worker.close()
@@ -0,0 +1,53 @@
+import numpy as np
+import os
+import pytest
+import unittest
+from openmcyclus.xs_library import XSLibrary, burnup_step
+
+
+class TestXSLibrary(unittest.TestCase):
+    def setUp(self):
+        '''
+        Set up a library with cross sections that are linear in
+        burnup
+        '''
+        burnups = np.array([0.0, 20.0, 50.0])
+        base = np.array([[10.0, 1.0], [2.0, 0.0]])
+        data = base * (1 - burnups[:, None, None] / 100)
+        self.library = XSLibrary(burnups, ["U235", "U238"],
+                                 ["fission", "(n,gamma)"], data)
+
+    def test_interpolate(self):
+        '''
+        Test interpolation of all points at once, with clamping
+        outside of the grid
+        '''
+        xs = self.library.interpolate([0.0, 10.0, 35.0, 80.0])
+        assert xs.shape == (4, 2, 2)
+        assert xs[:, 0, 0] == pytest.approx([10.0, 9.0, 6.5, 5.0])
+        assert xs[:, 1, 0] == pytest.approx([2.0, 1.8, 1.3, 1.0])
+        assert xs[1, 1, 1] == 0
+        assert self.library.interpolate(20.0)[0] == pytest.approx(
+            self.library.data[1])
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            XSLibrary([0.0, 10.0], ["U235"], ["fission"], np.ones((3, 1, 1)))
+        with pytest.raises(ValueError):
+            XSLibrary([10.0, 0.0], ["U235"], ["fission"], np.ones((2, 1, 1)))
+
+    def test_write_read(self):
+        self.library.write("./examples/test_xs_library.npz")
+        library = XSLibrary.from_file("./examples/test_xs_library.npz")
+        assert np.array_equal(library.data, self.library.data)
+        assert library.data.flags.c_contiguous
+        assert library.nuclides == ["U235", "U238"]
+        assert library.reactions == ["fission", "(n,gamma)"]
+        os.remove("./examples/test_xs_library.npz")
+
+    def test_burnup_step(self):
+        '''
+        Test the burnup of one 30 day step
+        '''
+        assert burnup_step(100.0, 30 * 86400, 1000.0) == pytest.approx(3.0)
+        assert burnup_step(100.0, 86400, 0.0) == 0